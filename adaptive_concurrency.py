@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+import logging
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+
+class SlotOutcome:
+    """Filled in by the code holding a slot: whether the call went well and how many bytes it moved"""
+
+    __slots__ = ('ok', 'bytes')
+
+    def __init__(self):
+        self.ok = True
+        self.bytes = None
+
+    def failed(self):
+        self.ok = False
+
+
+############################################################
+# AIMD LIMITER
+############################################################
+
+class AdaptiveLimiter:
+    """Concurrency limit that adapts to how the remote side copes (additive increase, multiplicative decrease).
+
+    Every `window` completed calls are evaluated. The window is congested when
+    its error rate exceeds error_threshold, its median latency exceeds the best
+    median seen so far by latency_tolerance times, or its median per-call
+    throughput falls below throughput_drop times the best seen. A congested
+    window multiplies the limit by backoff; otherwise, if the limit was
+    actually reached during the window, it grows by one. Signals set to 0 are
+    not used. With min_limit == max_limit the limit is fixed.
+    """
+
+    def __init__(self, name, initial=2, min_limit=1, max_limit=8, window=10, backoff=0.5, latency_tolerance=2.0,
+                 error_threshold=0.2, throughput_drop=0.0, clock=time.monotonic):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self.window = max(1, window)
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.error_threshold = error_threshold
+        self.throughput_drop = throughput_drop
+        self.clock = clock
+
+        self._cond = threading.Condition()
+        self._samples = []
+        self._saturated = False
+        self.in_flight = 0
+        self.completed = 0
+        self.errors = 0
+        self.increases = 0
+        self.decreases = 0
+        self.best_latency = None
+        self.best_throughput = None
+        self.last_latency = None
+        self.last_throughput = None
+
+    @property
+    def adaptive(self):
+        return self.min_limit < self.max_limit
+
+    @contextmanager
+    def slot(self):
+        """Hold one unit of concurrency, yields a SlotOutcome; an exception counts as an error"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            if self.in_flight >= int(self.limit):
+                self._saturated = True
+
+        outcome = SlotOutcome()
+        started = self.clock()
+        try:
+            yield outcome
+        except BaseException:
+            outcome.ok = False
+            raise
+        finally:
+            self._record(outcome, self.clock() - started)
+
+    def _record(self, outcome, elapsed):
+        with self._cond:
+            self.in_flight -= 1
+            self.completed += 1
+            if not outcome.ok:
+                self.errors += 1
+            throughput = outcome.bytes / elapsed if outcome.ok and outcome.bytes and elapsed > 0 else None
+            self._samples.append((outcome.ok, elapsed, throughput))
+            if len(self._samples) >= self.window:
+                self._adjust()
+            self._cond.notify_all()
+
+    def _adjust(self):
+        samples, self._samples = self._samples, []
+        saturated, self._saturated = self._saturated, False
+
+        error_rate = sum(1 for ok, _, _ in samples if not ok) / len(samples)
+        latencies = [elapsed for ok, elapsed, _ in samples if ok]
+        throughputs = [throughput for _, _, throughput in samples if throughput]
+        self.last_latency = statistics.median(latencies) if latencies else None
+        self.last_throughput = statistics.median(throughputs) if throughputs else None
+
+        reasons = []
+        if self.error_threshold and error_rate > self.error_threshold:
+            reasons.append(f"{error_rate:.0%} errors")
+        if self.latency_tolerance and self.last_latency is not None:
+            if self.best_latency is not None and self.last_latency > self.best_latency * self.latency_tolerance:
+                reasons.append(f"latency {self.last_latency:.2f}s vs best {self.best_latency:.2f}s")
+            self.best_latency = min(self.best_latency or self.last_latency, self.last_latency)
+        if self.throughput_drop and self.last_throughput is not None:
+            if self.best_throughput is not None and self.last_throughput < self.best_throughput * self.throughput_drop:
+                reasons.append(f"throughput {self.last_throughput / 125000:.1f} Mbit/s "
+                               f"vs best {self.best_throughput / 125000:.1f} Mbit/s")
+            self.best_throughput = max(self.best_throughput or 0, self.last_throughput)
+
+        if not self.adaptive:
+            return
+        previous = int(self.limit)
+        if reasons:
+            self.limit = max(float(self.min_limit), self.limit * self.backoff)
+            self.decreases += 1
+        elif saturated:
+            self.limit = min(float(self.max_limit), self.limit + 1)
+            self.increases += 1
+        if int(self.limit) != previous:
+            log.info(f"{self.name} concurrency {previous} -> {int(self.limit)}"
+                     + (f" ({', '.join(reasons)})" if reasons else ""))
+
+    def metrics(self):
+        with self._cond:
+            return {
+                'limit': int(self.limit),
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'errors': self.errors,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'median_latency_seconds': self.last_latency,
+                'median_throughput_bytes': self.last_throughput,
+            }
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+# External programs whose runs are captured; everything else (VPN, sudo, ...) runs normally
+RECORDED_COMMANDS = frozenset({'yt-dlp', 'ffprobe', 'ffmpeg', 'ssh'})
+
+# Credentials never written to a cassette and ignored when matching requests
+SENSITIVE_PARAMS = frozenset({'x-plex-token', 'api_key', 'apikey', 'token'})
+
+# Response headers worth keeping; the rest only bloats the cassette
+KEPT_HEADERS = ('content-type', 'content-encoding', 'retry-after')
+
+
+def request_key(method, url, body=None):
+    """Match key for an HTTP request: method, URL without credentials (sorted query) and body hash"""
+    parts = urlsplit(url)
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if name.lower() not in SENSITIVE_PARAMS)
+    key = f"{method} {urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))}"
+    if body:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        key += ' ' + hashlib.sha1(body).hexdigest()[:16]
+    return key
+
+
+def _encode_output(output):
+    if output is None or isinstance(output, str):
+        return output
+    return {'b64': base64.b64encode(output).decode('ascii')}
+
+
+def _decode_output(output, text):
+    if isinstance(output, dict):
+        output = base64.b64decode(output['b64'])
+        return output.decode('utf-8', 'replace') if text else output
+    if output is not None and not text:
+        return output.encode('utf-8')
+    return output
+
+
+def _output_dirs(argv):
+    """Existing directories named by (or containing) absolute path arguments, where outputs can appear"""
+    dirs = set()
+    for arg in argv:
+        if not os.path.isabs(arg):
+            continue
+        if os.path.isdir(arg):
+            dirs.add(arg)
+        elif os.path.isdir(os.path.dirname(arg)):
+            dirs.add(os.path.dirname(arg))
+    return dirs
+
+
+def _snapshot(dirs):
+    files = {}
+    for directory in dirs:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            continue
+    return files
+
+
+############################################################
+# CASSETTE
+############################################################
+
+class Cassette:
+    """Record or replay the run's HTTP exchanges and external program runs.
+
+    Recording wraps every requests transport call (Plex, KinoCheck, TMDB, IP
+    checks) and subprocess.run for RECORDED_COMMANDS, appending each exchange
+    with its duration to a gzip'd JSON-lines file. Files a recorded program
+    creates are noted by path and size.
+
+    Replaying serves the same calls from the file instead: requests are matched
+    by request_key, program runs by their argument list, repeated calls in
+    recorded order. Each answer is delayed by its recorded duration times
+    latency_scale (0 answers immediately), and recorded output files are created
+    as sparse files of the recorded size. Calls missing from the cassette fail
+    like an unreachable server or a failed program.
+
+    A replay never writes outside its sandbox directory (a temporary directory
+    unless given): recorded output files are created at sandbox_path() of their
+    recorded path, and program arguments pointing into the sandbox are matched
+    as the original paths. The caller sends its own writes there with
+    sandbox_path() as well. A temporary sandbox is removed on close().
+    """
+
+    def __init__(self, path, mode, latency_scale=1.0, sleep=time.sleep, sandbox=None):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._file = None
+        self._entries = defaultdict(deque)
+        self._last = {}
+        self._originals = None
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self.sandbox = None
+        self._own_sandbox = False
+        self._closed = False
+
+        if mode == 'record':
+            self._file = gzip.open(path, 'wt', encoding='utf-8')
+        else:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._entries[(entry['type'], entry['key'])].append(entry)
+            log.info(f"Loaded {sum(len(entries) for entries in self._entries.values())} exchange(s) from {path}")
+            self._own_sandbox = sandbox is None
+            self.sandbox = os.path.realpath(sandbox or tempfile.mkdtemp(prefix='cassette-replay-'))
+
+    def sandbox_path(self, path):
+        """Where a replay writes the file meant for path (the path itself when recording)"""
+        if not self.sandbox:
+            return path
+        path = os.path.abspath(path)
+        if path == self.sandbox or path.startswith(self.sandbox + os.sep):
+            return path
+        return os.path.join(self.sandbox, path.lstrip(os.sep))
+
+    def _original_path(self, arg):
+        if self.sandbox and arg.startswith(self.sandbox + os.sep):
+            return arg[len(self.sandbox):]
+        return arg
+
+    def install(self):
+        """Patch the requests transport and subprocess.run for the rest of the process"""
+        self._originals = (HTTPAdapter.send, subprocess.run)
+        original_send, original_run = self._originals
+        cassette = self
+
+        def send(adapter, request, *args, **kwargs):
+            return cassette.send(original_send, adapter, request, *args, **kwargs)
+
+        def run(*popenargs, **kwargs):
+            argv = popenargs[0] if popenargs else kwargs.get('args')
+            if isinstance(argv, (list, tuple)) and argv and os.path.basename(str(argv[0])) in RECORDED_COMMANDS:
+                return cassette.run(original_run, [str(arg) for arg in argv], *popenargs[1:], **kwargs)
+            return original_run(*popenargs, **kwargs)
+
+        HTTPAdapter.send = send
+        subprocess.run = run
+        log.info(f"Cassette {self.mode} mode: {self.path}")
+        return self
+
+    def close(self):
+        """Stop recording or replaying: restore the patches, flush the cassette, drop a temporary sandbox"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._originals:
+            HTTPAdapter.send, subprocess.run = self._originals
+            self._originals = None
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+        if self.mode == 'record':
+            print(f"Recorded {self.recorded} exchange(s) to {self.path}")
+        else:
+            print(f"Replayed {self.replayed} exchange(s) from {self.path} ({self.misses} not in cassette)")
+            if self._own_sandbox:
+                shutil.rmtree(self.sandbox, ignore_errors=True)
+
+    def _write(self, entry):
+        line = json.dumps(entry, separators=(',', ':'))
+        with self._lock:
+            if self._file:
+                self._file.write(line + '\n')
+                self.recorded += 1
+
+    def _take(self, kind, key):
+        """Next recorded entry for a call; once used up, repeated calls get the last one again"""
+        with self._lock:
+            entries = self._entries.get((kind, key))
+            if entries:
+                entry = self._last[(kind, key)] = entries.popleft()
+            else:
+                entry = self._last.get((kind, key))
+            if entry is None:
+                self.misses += 1
+            else:
+                self.replayed += 1
+        if entry is not None and self.latency_scale:
+            self.sleep(entry['elapsed'] * self.latency_scale)
+        return entry
+
+    # HTTP
+
+    def send(self, original_send, adapter, request, *args, **kwargs):
+        key = request_key(request.method, request.url, request.body)
+        if self.mode == 'replay':
+            entry = self._take('http', key)
+            if entry is None:
+                log.warning(f"Cassette has no response for {key}")
+                raise requests.exceptions.ConnectionError(f"Not in cassette: {key}", request=request)
+            if 'error' in entry:
+                raise getattr(requests.exceptions, entry['error'], requests.exceptions.ConnectionError)(
+                    entry['message'], request=request)
+            return self._build_response(request, entry)
+
+        started = time.monotonic()
+        try:
+            response = original_send(adapter, request, *args, **kwargs)
+            body = response.content
+        except requests.exceptions.RequestException as e:
+            self._write({'type': 'http', 'key': key, 'elapsed': round(time.monotonic() - started, 4),
+                         'error': type(e).__name__, 'message': str(e)})
+            raise
+        self._write({'type': 'http', 'key': key, 'elapsed': round(time.monotonic() - started, 4),
+                     'status': response.status_code, 'reason': response.reason,
+                     'headers': {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+                     'body': base64.b64encode(body).decode('ascii')})
+        return response
+
+    @staticmethod
+    def _build_response(request, entry):
+        response = requests.models.Response()
+        response.status_code = entry['status']
+        response.reason = entry.get('reason')
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        # The recorded body is already decoded by requests
+        response.headers.pop('content-encoding', None)
+        response._content = base64.b64decode(entry['body'])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=entry['elapsed'])
+        return response
+
+    # Programs
+
+    def run(self, original_run, argv, *args, **kwargs):
+        key = json.dumps([self._original_path(arg) for arg in argv])
+        text = bool(kwargs.get('text') or kwargs.get('universal_newlines') or kwargs.get('encoding'))
+        if self.mode == 'replay':
+            entry = self._take('command', key)
+            if entry is None:
+                log.warning(f"Cassette has no run of {' '.join(argv)[:200]}")
+                entry = {'returncode': 1, 'stdout': '', 'stderr': 'Not in cassette', 'files': []}
+            if entry.get('timeout'):
+                raise subprocess.TimeoutExpired(argv, kwargs.get('timeout'))
+            for path, size in entry.get('files', []):
+                path = self.sandbox_path(path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.truncate(size)
+            result = subprocess.CompletedProcess(argv, entry['returncode'],
+                                                 _decode_output(entry.get('stdout'), text),
+                                                 _decode_output(entry.get('stderr'), text))
+            if kwargs.get('check'):
+                result.check_returncode()
+            return result
+
+        dirs = _output_dirs(argv)
+        before = _snapshot(dirs)
+        started = time.monotonic()
+        entry = {'type': 'command', 'key': key}
+        try:
+            result = original_run(argv, *args, **kwargs)
+            entry.update(returncode=result.returncode, stdout=_encode_output(result.stdout),
+                         stderr=_encode_output(result.stderr))
+            return result
+        except subprocess.TimeoutExpired:
+            entry['timeout'] = True
+            raise
+        except subprocess.CalledProcessError as e:
+            entry.update(returncode=e.returncode, stdout=_encode_output(e.stdout), stderr=_encode_output(e.stderr))
+            raise
+        finally:
+            entry['elapsed'] = round(time.monotonic() - started, 4)
+            after = _snapshot(dirs)
+            entry['files'] = sorted([path, size] for path, (size, mtime) in after.items()
+                                    if before.get(path) != (size, mtime))
+            if 'returncode' in entry or entry.get('timeout'):
+                self._write(entry)
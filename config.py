@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import copy
 import json
 import os
 import sys
@@ -8,7 +9,8 @@ from plexapi.myplex import MyPlexAccount
 from plexapi.server import PlexServer
 from getpass import getpass
 
-config_path = os.path.join(os.path.dirname(os.path.realpath(sys.argv[0])), 'config.json')
+config_path = os.environ.get('TRAILER_CHECKER_CONFIG',
+                             os.path.join(os.path.dirname(os.path.realpath(sys.argv[0])), 'config.json'))
 base_config = {
     'PLEX_SERVER': 'https://plex.your-server.com',
     'PLEX_TOKEN': '',
@@ -30,23 +32,132 @@ base_config = {
         'api_key': '',  # Optional: for higher rate limits
         'language': 'de',  # 'de' or 'en'
         'fallback_language': 'en',  # Try this language if primary fails
-        'max_requests_per_day': 1000
+        'max_requests_per_day': 1000,
+        'cache_ttl_hours': 168  # Reuse API responses for this long (0 = no cache)
+    },
+    
+    # Trailer sources queried in parallel (KinoCheck is configured above)
+    'TRAILER_PROVIDERS': {
+        'max_parallel': 3,  # Provider lookups in flight at once, shared by all shows (raised to fit ADAPTIVE_CONCURRENCY.kinocheck.max shows)
+        'cache_ttl_hours': 168,  # Reuse provider answers for this long (0 = no cache)
+        'miss_ttl_hours': 24,  # Reuse "no trailers" answers for this long
+        'tmdb': {
+            'enabled': False,
+            'api_key': '',  # TMDB v3 API key
+            'language': 'de',
+            'fallback_language': 'en',
+            'max_requests_per_day': 5000  # Daily lookup quota (0 = unlimited)
+        },
+        'file': {
+            'enabled': False,
+            'path': 'trailers.json'  # {"imdb:tt0903747": [{"youtube_video_id": "...", "title": "..."}]}
+        }
+    },
+    
+    'PLEX_PAGE_SIZE': 200,  # Items per Plex container request when paging through shows and episodes
+    
+    # AIMD concurrency for KinoCheck lookups and downloads: the limit grows by one while
+    # calls go well and halves on errors, rising latency or collapsing download throughput
+    'ADAPTIVE_CONCURRENCY': {
+        'enabled': True,  # false = fixed limits (kinocheck.max, DOWNLOAD_SCHEDULE.max_concurrent_downloads)
+        'kinocheck': {
+            'initial': 2,
+            'min': 1,
+            'max': 8,  # Also the number of shows looked up ahead of the scan
+            'window': 10,  # Calls per evaluation
+            'latency_tolerance': 3.0,  # Back off when median latency exceeds the best by this factor (0 = off)
+            'error_threshold': 0.2  # Back off above this share of errors/429/5xx
+        },
+        'downloads': {
+            'initial': 1,
+            'min': 1,  # The maximum is DOWNLOAD_SCHEDULE.max_concurrent_downloads
+            'window': 3,
+            'error_threshold': 0.5,
+            'throughput_drop': 0.5  # Back off when per-download throughput falls below half the best (0 = off)
+        }
+    },
+    
+    # Local HTTP endpoint with live progress: /status (JSON) and /metrics (Prometheus)
+    'STATUS_SERVER': {
+        'enabled': False,
+        'host': '127.0.0.1',
+        'port': 8765
+    },
+    
+    # Connection handling for the Plex API
+    'PLEX_HTTP': {
+        'timeout': 60,
+        'pool_size': 16,  # Pooled keep-alive connections to the server
+        'retries': 3,  # Retries per GET on connection errors, timeouts and 429/5xx (jittered backoff)
+        'backoff_factor': 0.5,
+        'circuit_failure_threshold': 5,  # Consecutive failures before Plex requests are paused
+        'circuit_reset_seconds': 30,  # Pause before the next probe request
+        'retry_rounds': 2,  # Extra passes over libraries/shows that failed
+        'retry_delay_seconds': 30  # Wait before a retry pass (grows per pass)
+    },
+    
+    # Find shows by walking the media folders instead of the Plex API (no Plex connection needed).
+    # Show folders carry their IDs: "1923 (2022) {imdb-tt18335752}/Season 01"
+    'FILESYSTEM_SCAN': {
+        'enabled': False,  # Same as --filesystem
+        'roots': {'TV Shows': []},  # Library name -> folders containing the show folders
+        'workers': 16  # Show folders listed in parallel (network mounts are latency-bound)
+    },
+    
+    # Plex partial scans for folders that received new trailers
+    'PLEX_REFRESH': {
+        'enabled': True,
+        'batch_window_seconds': 60,  # Collect folders this long before scanning them together
+        'min_interval_seconds': 2,  # Minimum gap between two partial scan requests
+        'coalesce_threshold': 3  # This many season folders of one show become a single show scan
     },
     
     # Trailer Download Configuration
     'DOWNLOAD_TRAILERS': True,
     'DOWNLOAD_METHOD': 'subdirectory',  # 'inline' or 'subdirectory'
+    'TRAILER_GRANULARITY': 'season',  # 'show' (one trailer per show), 'season' or 'episode'
     'TRAILER_QUALITY': 'bestvideo[height<=2160]+bestaudio/bestvideo[height<=1080]+bestaudio/best',  # Best video+audio combo
     'TRAILER_FORMAT': 'mp4',
     'MAX_TRAILER_DURATION': 600,  # Maximum trailer length in seconds (10 minutes)
     'TRIM_START_SECONDS': 3,  # Skip first N seconds of each trailer (removes intro branding)
+    'POSTPROCESS_WORKERS': 0,  # ffmpeg/ffprobe workers for trimming and verification (0 = half the CPU cores)
+    
+    # Post-download verification (ffprobe)
+    'VERIFICATION': {
+        'enabled': True,
+        'min_duration': 10,  # Shorter files are treated as broken (seconds)
+        'require_audio': True,  # Reject trailers without an audio stream
+        'quarantine_dir': 'quarantine'  # Where files failing verification are moved
+    },
+    'STAGING_DIR': 'staging',  # Local scratch directory for in-progress downloads (resumed on retry)
+    'STATE_DB': 'trailer_state.db',  # SQLite state store (relative paths are next to the script)
     'OVERWRITE_EXISTING': False,
     
+    # Format planning (pick formats against a size budget and the episodes' resolution)
+    'FORMAT_PLANNER': {
+        'enabled': True,
+        'max_trailer_mb': 150,  # Per-trailer size budget in MB (0 = no budget)
+        'match_episode_resolution': True,  # Never download trailers above the season's episode resolution
+        'min_height': 480  # Lowest resolution cap applied when matching episode resolution
+    },
+    
+    # Download scheduling (bandwidth budget and time windows)
+    'DOWNLOAD_SCHEDULE': {
+        'max_concurrent_downloads': 2,  # Downloads running at the same time
+        'max_rate_mbit': 0,  # Global bandwidth budget in Mbit/s shared by all downloads (0 = unlimited)
+        'quiet_hours': [],  # e.g. [{'start': '17:00', 'end': '23:30', 'max_rate_mbit': 5}] - 0 pauses downloads
+        'full_speed_windows': [],  # e.g. [{'start': '01:00', 'end': '07:00'}] - no cap inside these windows
+        'sleep_requests': 1,  # yt-dlp --sleep-requests seconds between requests
+        'download_timeout': 300,  # Seconds before a single download is abandoned
+        'assumed_throughput_mbit': 50  # Throughput used for --plan time estimates when max_rate_mbit is 0
+    },
+    
 
     
     # VPN Configuration (Private Internet Access)
     'VPN': {
         'enabled': False,  # Set to True to use VPN for downloads
+        'routing': 'always',  # 'always' (every download via VPN) or 'geo_fallback' (VPN only for geo-blocked videos)
         'provider': 'pia',  # Currently only 'pia' supported
         'pia_username': '',  # Your PIA username (p1234567)
         'pia_password': '',  # Your PIA password
@@ -55,6 +166,8 @@ base_config = {
         'preferred_region': '',  # Specific region (e.g., 'us_california', 'de_berlin')
         'connect_timeout': 60,  # Seconds to wait for connection
         'disconnect_after_downloads': True,  # Disconnect VPN when done
+        'health_check_interval': 30,  # Seconds between tunnel health probes during downloads
+        'max_reconnect_attempts': 3,  # Reconnect attempts before continuing without VPN
         'setup_path': './pia-manual'  # Where to install PIA scripts
     },
     
@@ -68,6 +181,23 @@ base_config = {
         'delete_local_after_transfer': True  # Delete local files after successful transfer
     },
     
+    # Where existing trailers are detected: 'filesystem' (list the folders) or
+    # 'plex_extras' (ask Plex for the trailer extras it indexed, no disk access)
+    'TRAILER_DETECTION': {
+        'source': 'filesystem',
+        'bulk': True,  # plex_extras: one includeExtras request per section where supported (show granularity only)
+        'confirm_on_disk': False  # plex_extras: only count trailers whose files still exist
+    },
+    
+    # Check trailers on the Plex host over SSH when the library isn't mounted locally
+    # (uses REMOTE_TRANSFER.server and ssh_key)
+    'REMOTE_FILESYSTEM': {
+        'enabled': False,
+        'roots': [],  # Remote library folders (empty = the Plex libraries' locations)
+        'max_depth': 4,  # root/show/season/Trailers
+        'timeout': 300  # Seconds for the remote listing
+    },
+    
     # Show/Episode Matching
     'MATCHING': {
         'use_tmdb_ids': True,
@@ -283,7 +413,7 @@ def build_config():
 
 def dump_config():
     with open(config_path, 'w') as fp:
-        json.dump(cfg, fp, indent=4, sort_keys=True)
+        json.dump(dict(cfg), fp, indent=4, sort_keys=True)
 
 
 def load_config():
@@ -304,9 +434,9 @@ def upgrade_settings(defaults, currents):
                     res[k] = v
                     upgraded = True
                     if key:
-                        print(f"Added new config option: {key}.{k} = {v}")
+                        print(f"Added new config option: {key}.{k} = {v}", file=sys.stderr)
                     else:
-                        print(f"Added new config option: {k} = {v}")
+                        print(f"Added new config option: {k} = {v}", file=sys.stderr)
                 else:
                     res[k] = inner_upgrade(default[k], res[k], key=k if not key else f"{key}.{k}")
         return res
@@ -315,13 +445,154 @@ def upgrade_settings(defaults, currents):
     return upgraded_settings, upgraded
 
 
+############################################################
+# VALIDATION AND OVERRIDES
+############################################################
+
+# Environment variables TRAILER_CHECKER_<KEY>[__<SUBKEY>] override config values,
+# e.g. TRAILER_CHECKER_VPN__ENABLED=false or TRAILER_CHECKER_PLEX_LIBRARIES='["TV"]'
+ENV_PREFIX = 'TRAILER_CHECKER_'
+
+# Options that only accept a fixed set of values
+ALLOWED_VALUES = {
+    'DOWNLOAD_METHOD': ('inline', 'subdirectory'),
+    'TRAILER_GRANULARITY': ('show', 'season', 'episode'),
+    'REPORT_FORMAT': ('detailed', 'summary'),
+    'VPN.routing': ('always', 'geo_fallback'),
+    'VPN.protocol': ('wireguard', 'openvpn'),
+    'TRAILER_DETECTION.source': ('filesystem', 'plex_extras'),
+}
+
+
+class ConfigError(Exception):
+    pass
+
+
+def parse_override_value(raw):
+    """Override values are JSON (true, 3, ["a"]) with plain strings as fallback"""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def validate_config(defaults, current, path=''):
+    """Check every option against the type of its default; returns a list of problems"""
+    errors = []
+    for key, default in defaults.items():
+        name = f"{path}{key}"
+        if key not in current:
+            continue
+        value = current[key]
+        if isinstance(default, dict):
+            if isinstance(value, dict):
+                errors.extend(validate_config(default, value, f"{name}."))
+            else:
+                errors.append(f"{name} must be an object")
+        elif isinstance(default, bool):
+            if not isinstance(value, bool):
+                errors.append(f"{name} must be true or false, got {value!r}")
+        elif isinstance(default, (int, float)):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                errors.append(f"{name} must be a number, got {value!r}")
+            elif value < 0:
+                errors.append(f"{name} must not be negative, got {value!r}")
+        elif isinstance(default, str):
+            if not isinstance(value, str):
+                errors.append(f"{name} must be a string, got {value!r}")
+        elif isinstance(default, list):
+            if not isinstance(value, list):
+                errors.append(f"{name} must be a list, got {value!r}")
+        
+        if name in ALLOWED_VALUES and value not in ALLOWED_VALUES[name]:
+            errors.append(f"{name} must be one of {', '.join(ALLOWED_VALUES[name])}, got {value!r}")
+    return errors
+
+
+class Config(dict):
+    """Validated configuration with lookups the scan needs per file precomputed.
+    
+    Still a dict, so cfg['A']['B'] keeps working; derived values are attributes:
+      video_extensions - frozenset of lowercase SUPPORTED_VIDEO_EXTENSIONS
+      inline_suffix    - lowercase TRAILER_NAMING_PATTERNS.inline_suffix
+      subdirectory_name
+    """
+    
+    def __init__(self, values, environ=None):
+        super().__init__(values)
+        if environ is not None:
+            self.apply_environment(environ)
+        self.validate()
+    
+    def validate(self):
+        errors = validate_config(base_config, self)
+        if errors:
+            raise ConfigError('Invalid configuration:\n  ' + '\n  '.join(errors))
+        self.video_extensions = frozenset(ext.lower() for ext in self['SUPPORTED_VIDEO_EXTENSIONS'])
+        self.inline_suffix = self['TRAILER_NAMING_PATTERNS']['inline_suffix'].lower()
+        self.subdirectory_name = self['TRAILER_NAMING_PATTERNS']['subdirectory_name']
+    
+    def set_option(self, dotted_key, value):
+        """Set KEY or KEY.SUBKEY, matching names case-insensitively (environment
+        variables are upper case). Call validate() after a batch of changes."""
+        keys = dotted_key.split('.')
+        target = self
+        for i, key in enumerate(keys):
+            match = key if key in target else next((k for k in target if k.lower() == key.lower()), None)
+            if match is None or (i < len(keys) - 1 and not isinstance(target[match], dict)):
+                raise ConfigError(f"Unknown config option: {dotted_key}")
+            if i == len(keys) - 1:
+                target[match] = value
+            else:
+                target = target[match]
+    
+    def apply_overrides(self, assignments):
+        """Apply KEY.SUBKEY=VALUE overrides (from --set) and re-validate"""
+        for assignment in assignments or []:
+            if '=' not in assignment:
+                raise ConfigError(f"Config override must be KEY=VALUE: {assignment}")
+            key, raw = assignment.split('=', 1)
+            self.set_option(key.strip(), parse_override_value(raw))
+        self.validate()
+    
+    def apply_environment(self, environ):
+        for name, raw in environ.items():
+            if name.startswith(ENV_PREFIX) and name != f"{ENV_PREFIX}CONFIG":
+                self.set_option(name[len(ENV_PREFIX):].replace('__', '.'), parse_override_value(raw))
+
+
+def is_interactive():
+    return sys.stdin.isatty() and sys.stdout.isatty()
+
+
+def build_cfg():
+    """Load config.json once: upgrade with new defaults, apply env overrides, validate.
+    
+    The file is only written in interactive runs (first-run setup and upgrades);
+    cron/container runs merge new defaults in memory and leave it untouched.
+    Notices go to stderr: config is imported before stdout is set aside for `--plan -`.
+    """
+    if not os.path.exists(config_path):
+        if is_interactive():
+            build_config()
+        print(f"No config file at {config_path} - using defaults and {ENV_PREFIX}* environment overrides",
+              file=sys.stderr)
+        values = copy.deepcopy(base_config)
+    else:
+        values, upgraded = upgrade_settings(base_config, load_config())
+        if upgraded and is_interactive():
+            with open(config_path, 'w') as fp:
+                json.dump(values, fp, indent=4, sort_keys=True)
+            print("Configuration has been upgraded with new options")
+        # Options added by the upgrade must not share dicts with base_config
+        values = copy.deepcopy(values)
+    
+    try:
+        return Config(values, environ=os.environ)
+    except ConfigError as e:
+        print(e, file=sys.stderr)
+        exit(1)
+
+
 # Load config
-if os.path.exists(config_path):
-    cfg = load_config()
-    upgraded_cfg, upgraded = upgrade_settings(base_config, cfg)
-    if upgraded:
-        cfg = upgraded_cfg
-        dump_config()
-        print("Configuration has been upgraded with new options")
-else:
-    build_config() 
\ No newline at end of file
+cfg = build_cfg()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+
+############################################################
+# BANDWIDTH-AWARE DOWNLOAD SCHEDULER
+############################################################
+
+def parse_clock(value):
+    """Parse 'HH:MM' into minutes after midnight"""
+    hours, minutes = value.strip().split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def in_window(window, minute_of_day):
+    """Check whether a {'start': 'HH:MM', 'end': 'HH:MM'} window contains the given minute.
+    Windows whose end is before their start wrap around midnight."""
+    start = parse_clock(window['start'])
+    end = parse_clock(window['end'])
+    if start <= end:
+        return start <= minute_of_day < end
+    return minute_of_day >= start or minute_of_day < end
+
+
+def mbit_to_bytes(mbit):
+    """Convert megabits per second into bytes per second"""
+    return int(float(mbit) * 125000)
+
+
+class BandwidthScheduler:
+    """Enforce a global bandwidth budget across concurrent downloads.
+
+    The budget comes from DOWNLOAD_SCHEDULE: full-speed windows lift the cap,
+    quiet hours replace it with their own (0 pauses downloads), otherwise the
+    global max_rate_mbit applies. The budget is split evenly over the download
+    slots so the sum of all running downloads never exceeds it.
+    """
+
+    def __init__(self, schedule_cfg, clock=datetime.now):
+        self.max_concurrent = max(1, int(schedule_cfg.get('max_concurrent_downloads', 1)))
+        self.max_rate_mbit = schedule_cfg.get('max_rate_mbit', 0)
+        self.quiet_hours = schedule_cfg.get('quiet_hours', [])
+        self.full_speed_windows = schedule_cfg.get('full_speed_windows', [])
+        self._clock = clock
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self._paused_notice = False
+        self.active_downloads = 0
+
+    def current_rate(self, now=None):
+        """Global budget in bytes/sec at the given time: None = unlimited, 0 = paused"""
+        now = now or self._clock()
+        minute_of_day = now.hour * 60 + now.minute
+
+        for window in self.full_speed_windows:
+            if in_window(window, minute_of_day):
+                return None
+
+        for window in self.quiet_hours:
+            if in_window(window, minute_of_day):
+                return mbit_to_bytes(window.get('max_rate_mbit', 0))
+
+        if self.max_rate_mbit:
+            return mbit_to_bytes(self.max_rate_mbit)
+        return None
+
+    def per_download_rate(self, now=None):
+        """Share of the global budget for one download slot (bytes/sec, None = unlimited)"""
+        rate = self.current_rate(now)
+        if not rate:
+            return rate
+        return max(1024, rate // self.max_concurrent)
+
+    def next_open_time(self, now=None):
+        """Next time (minute resolution, within 24h) at which downloads are allowed"""
+        now = now or self._clock()
+        candidate = now.replace(second=0, microsecond=0)
+        for _ in range(24 * 60):
+            candidate += timedelta(minutes=1)
+            if self.current_rate(candidate) != 0:
+                return candidate
+        return None
+
+    def wait_for_window(self, stop_event=None):
+        """Block until the current schedule allows downloads"""
+        while self.current_rate() == 0:
+            opens_at = self.next_open_time()
+            if opens_at is None:
+                log.error("DOWNLOAD_SCHEDULE pauses downloads around the clock - not waiting")
+                return False
+
+            with self._lock:
+                if not self._paused_notice:
+                    print(f"    ⏸️ Quiet hours - downloads deferred until {opens_at.strftime('%H:%M')}")
+                    log.info(f"Downloads deferred until {opens_at.strftime('%H:%M')}")
+                    self._paused_notice = True
+
+            wait_seconds = min(60, max(1, (opens_at - self._clock()).total_seconds()))
+            if stop_event is not None:
+                if stop_event.wait(wait_seconds):
+                    return False
+            else:
+                time.sleep(wait_seconds)
+
+        with self._lock:
+            self._paused_notice = False
+        return True
+
+    @contextmanager
+    def slot(self):
+        """Hold one download slot inside an open window, yields the rate limit (bytes/sec or None)"""
+        with self._slots:
+            self.wait_for_window()
+            with self._lock:
+                self.active_downloads += 1
+            try:
+                yield self.per_download_rate()
+            finally:
+                with self._lock:
+                    self.active_downloads -= 1
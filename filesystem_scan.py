@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from season_resolver import parse_season_folder
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+# IDs embedded in show folder names: "1923 (2022) {imdb-tt18335752}", "Dark {tmdb-70523} {tvdb-334824}"
+SHOW_ID_PATTERN = re.compile(r'\{(imdb|tmdb|tvdb)-([^}\s]+)\}', re.IGNORECASE)
+SHOW_YEAR_PATTERN = re.compile(r'\((\d{4})\)')
+EPISODE_PATTERN = re.compile(r'S(\d{1,4})E(\d{1,4})', re.IGNORECASE)
+
+
+def parse_show_folder(name):
+    """Split a show folder name into (title, year, {'imdb': ..., 'tmdb': ..., 'tvdb': ...})"""
+    ids = {source.lower(): value for source, value in SHOW_ID_PATTERN.findall(name)}
+    year_match = SHOW_YEAR_PATTERN.search(name)
+    title = SHOW_ID_PATTERN.sub('', name)
+    title = SHOW_YEAR_PATTERN.sub('', title).strip()
+    return title or name, int(year_match.group(1)) if year_match else None, ids
+
+
+############################################################
+# PLEX-LIKE OBJECTS
+############################################################
+
+# The filesystem scan builds objects with the attributes the scan pipeline reads
+# from plexapi (title, ratingKey, guids, locations, seasons(), episodes(), media),
+# so everything after show discovery is shared with Plex mode.
+
+class FilesystemGuid:
+    def __init__(self, guid_id):
+        self.id = guid_id
+
+
+class FilesystemPart:
+    def __init__(self, file):
+        self.file = file
+
+
+class FilesystemMedia:
+    def __init__(self, file):
+        self.parts = [FilesystemPart(file)]
+        self.videoResolution = None
+
+
+class FilesystemEpisode:
+    def __init__(self, file, index):
+        self.index = index
+        self.title = os.path.splitext(os.path.basename(file))[0]
+        self.media = [FilesystemMedia(file)]
+
+
+class FilesystemSeason:
+    def __init__(self, index, directories, episode_files):
+        self.index = index
+        self.directories = directories
+        self._episode_files = episode_files
+        self.leafCount = len(episode_files)
+
+    def episodes(self):
+        episodes = []
+        for position, file in enumerate(self._episode_files, 1):
+            match = EPISODE_PATTERN.search(os.path.basename(file))
+            episodes.append(FilesystemEpisode(file, int(match.group(2)) if match else position))
+        return episodes
+
+
+class FilesystemShow:
+    def __init__(self, path, seasons, updated_at):
+        self.title, self.year, self.ids = parse_show_folder(os.path.basename(path))
+        self.locations = [path]
+        self.updatedAt = updated_at
+        self.guids = [FilesystemGuid(f"{source}://{value}") for source, value in self.ids.items()]
+        self.guid = self.guids[0].id if self.guids else ''
+        # Stable key for the coverage index; Plex ratingKeys are numeric, so these never collide
+        self.ratingKey = 'fs-' + hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]
+        self._seasons = seasons
+        self.leafCount = sum(season.leafCount for season in seasons)
+
+    def seasons(self):
+        return list(self._seasons)
+
+
+############################################################
+# FILESYSTEM SCAN
+############################################################
+
+class FilesystemScanner:
+    """Discover shows by walking media roots instead of asking Plex.
+
+    Each show folder is listed on a thread pool (listing is latency-bound on
+    network mounts), collecting its season folders and episode files.
+    Inline trailer files are not counted as episodes (trailer subdirectories
+    are never listed).
+    """
+
+    def __init__(self, video_extensions, inline_suffix='-trailer', workers=16):
+        self.video_extensions = frozenset(ext.lower() for ext in video_extensions)
+        self.inline_suffix = inline_suffix.lower()
+        self.workers = workers
+
+    def scan(self, roots):
+        """Return FilesystemShow objects for every show folder below the given roots"""
+        show_paths = []
+        for root in roots:
+            try:
+                with os.scandir(root) as entries:
+                    show_paths.extend(entry.path for entry in entries
+                                      if entry.is_dir() and not entry.name.startswith('.'))
+            except OSError as e:
+                log.error(f"Cannot list media root {root}: {e}")
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='fs-scan') as pool:
+            shows = [show for show in pool.map(self.scan_show, sorted(show_paths)) if show]
+        log.info(f"Filesystem scan found {len(shows)} show(s) in {len(roots)} root(s)")
+        return shows
+
+    def scan_show(self, show_path):
+        try:
+            seasons = {}
+            loose_episodes = []
+            with os.scandir(show_path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        season_index = parse_season_folder(entry.name)
+                        if season_index is not None:
+                            directories, files = seasons.setdefault(season_index, ([], []))
+                            directories.append(entry.path)
+                            files.extend(self._episode_files(entry.path))
+                    elif self._is_episode(entry.name):
+                        loose_episodes.append(entry.path)
+            updated_at = int(os.stat(show_path).st_mtime)
+        except OSError as e:
+            log.error(f"Cannot scan show folder {show_path}: {e}")
+            return None
+
+        # Episodes directly in the show folder belong to the season in their name;
+        # a season without its own folder uses the show folder
+        for file in loose_episodes:
+            match = EPISODE_PATTERN.search(os.path.basename(file))
+            if match:
+                directories, files = seasons.setdefault(int(match.group(1)), ([], []))
+                files.append(file)
+                if not directories:
+                    directories.append(show_path)
+
+        season_objects = [FilesystemSeason(index, directories, sorted(files))
+                          for index, (directories, files) in sorted(seasons.items())]
+        return FilesystemShow(show_path, season_objects, updated_at)
+
+    def _episode_files(self, season_path):
+        files = []
+        with os.scandir(season_path) as entries:
+            for entry in entries:
+                if entry.is_file() and self._is_episode(entry.name):
+                    files.append(entry.path)
+        return files
+
+    def _is_episode(self, name):
+        root, ext = os.path.splitext(name)
+        return (ext.lower() in self.video_extensions and not name.startswith('.')
+                and not root.lower().endswith(self.inline_suffix))
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+import json
+import logging
+import subprocess
+import threading
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+# Plex media.videoResolution values that aren't a plain height
+PLEX_RESOLUTION_HEIGHTS = {
+    '4k': 2160,
+    '2k': 1440,
+    'hd': 720,
+    'sd': 480,
+}
+
+_probe_cache = {}
+_probe_cache_lock = threading.Lock()
+
+
+############################################################
+# FORMAT PLANNING
+############################################################
+
+def resolution_to_height(video_resolution):
+    """Convert a Plex videoResolution ('720', '1080', '4k', 'sd') to a pixel height"""
+    if not video_resolution:
+        return None
+    value = str(video_resolution).lower().rstrip('p')
+    if value in PLEX_RESOLUTION_HEIGHTS:
+        return PLEX_RESOLUTION_HEIGHTS[value]
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def get_episodes_video_height(episodes):
+    """Highest video height among the episodes' media, or None if unknown"""
+    heights = []
+    for episode in episodes:
+        for media in getattr(episode, 'media', None) or []:
+            height = resolution_to_height(getattr(media, 'videoResolution', None))
+            if height:
+                heights.append(height)
+    return max(heights) if heights else None
+
+
+# Format fields the planner needs; everything else in yt-dlp's metadata is dropped
+# before caching to keep the probe cache compact
+PROBE_FORMAT_FIELDS = ('format_id', 'ext', 'height', 'vcodec', 'acodec', 'filesize', 'filesize_approx', 'tbr', 'abr')
+
+
+def compact_video_info(info):
+    """Reduce yt-dlp metadata to what format planning and size estimates need"""
+    return {
+        'duration': info.get('duration'),
+        'formats': [{field: fmt.get(field) for field in PROBE_FORMAT_FIELDS} for fmt in info.get('formats', [])],
+    }
+
+
+def probe_video_info(youtube_video_id, timeout=60, store=None, max_age=7 * 24 * 3600):
+    """Fetch yt-dlp metadata (formats, duration) for a video without downloading it.
+
+    Results are cached in memory and, when a state store is given, persistently.
+    """
+    with _probe_cache_lock:
+        if youtube_video_id in _probe_cache:
+            return _probe_cache[youtube_video_id]
+
+    if store is not None:
+        info = store.get_video_probe(youtube_video_id, max_age)
+        if info is not None:
+            with _probe_cache_lock:
+                _probe_cache[youtube_video_id] = info
+            return info
+
+    cmd = ['yt-dlp', '--dump-json', '--no-playlist', '--skip-download',
+           f"https://www.youtube.com/watch?v={youtube_video_id}"]
+    info = None
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        if result.returncode == 0 and result.stdout.strip():
+            info = compact_video_info(json.loads(result.stdout))
+        else:
+            log.debug(f"Format probe failed for {youtube_video_id}: {result.stderr.strip()[:200]}")
+    except (subprocess.TimeoutExpired, ValueError) as e:
+        log.debug(f"Format probe failed for {youtube_video_id}: {e}")
+
+    if info is not None and store is not None:
+        store.store_video_probe(youtube_video_id, info)
+    with _probe_cache_lock:
+        _probe_cache[youtube_video_id] = info
+    return info
+
+
+def estimate_format_size(fmt, duration):
+    """Best guess of a format's size in bytes (exact, approximate, or from its bitrate)"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return int(size)
+    if fmt.get('tbr') and duration:
+        return int(fmt['tbr'] * 1000 / 8 * duration)
+    return None
+
+
+def plan_format(info, max_height=None, max_bytes=None):
+    """Pick the best video+audio pair that fits the height cap and size budget.
+
+    Returns {'format', 'height', 'estimated_bytes'} or None when the metadata
+    doesn't allow a decision (the caller then falls back to a height filter).
+    The planned format ids come first in the selector, followed by the height
+    filter (or plain best), so yt-dlp still finds something when YouTube no
+    longer offers the probed formats.
+    """
+    if not info or not info.get('formats'):
+        return None
+
+    duration = info.get('duration')
+    formats = info['formats']
+
+    audio_formats = [f for f in formats if f.get('vcodec') == 'none' and f.get('acodec') not in (None, 'none')]
+    best_audio = None
+    if audio_formats:
+        best_audio = max(audio_formats, key=lambda f: (f.get('abr') or 0, f.get('ext') == 'm4a'))
+    audio_size = (estimate_format_size(best_audio, duration) or 0) if best_audio else 0
+
+    candidates = []
+    for fmt in formats:
+        height = fmt.get('height')
+        if not height or fmt.get('vcodec') in (None, 'none'):
+            continue
+        if max_height and height > max_height:
+            continue
+
+        video_only = fmt.get('acodec') in (None, 'none')
+        if video_only and not best_audio:
+            continue
+        video_size = estimate_format_size(fmt, duration)
+        if video_size is None:
+            continue
+
+        total = video_size + (audio_size if video_only else 0)
+        selector = f"{fmt['format_id']}+{best_audio['format_id']}" if video_only else fmt['format_id']
+        candidates.append({
+            'format': selector,
+            'height': height,
+            'estimated_bytes': total,
+            'tbr': fmt.get('tbr') or 0,
+        })
+
+    if not candidates:
+        return None
+
+    fitting = [c for c in candidates if not max_bytes or c['estimated_bytes'] <= max_bytes]
+    if fitting:
+        chosen = max(fitting, key=lambda c: (c['height'], c['tbr']))
+    else:
+        # Nothing fits the budget - take the smallest file rather than failing
+        chosen = min(candidates, key=lambda c: c['estimated_bytes'])
+    chosen.pop('tbr', None)
+    fallback = height_capped_format(max_height) if max_height else 'best'
+    chosen['format'] = f"{chosen['format']}/{fallback}"
+    return chosen
+
+
+def height_capped_format(max_height):
+    """Format selector used when no plan could be made from the metadata"""
+    return f"bestvideo[height<={max_height}]+bestaudio/best[height<={max_height}]/best"
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+import logging
+import os
+import threading
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+# Plex extraType for trailers (subtype="trailer" on the Video element)
+PLEX_TRAILER_EXTRA_TYPE = '1'
+
+
+def extract_trailer_parts(element):
+    """(file path, size or None) of all trailer extras below an XML element (show, season or container)"""
+    parts = []
+    for extras in element.iter('Extras'):
+        for video in extras.iter('Video'):
+            if video.get('subtype') != 'trailer' and video.get('extraType') != PLEX_TRAILER_EXTRA_TYPE:
+                continue
+            for part in video.iter('Part'):
+                if part.get('file'):
+                    size = part.get('size')
+                    parts.append((part.get('file'), int(size) if size else None))
+    return parts
+
+
+############################################################
+# PLEX EXTRAS INDEX
+############################################################
+
+class PlexExtrasIndex:
+    """Trailer files Plex already knows about, with the listdir/isdir/isfile interface.
+
+    Trailer checks run against this index instead of the disk. Shows are loaded
+    with one includeExtras request per show (including their seasons), or for
+    show trailers in bulk per section (includeExtras on the section listing)
+    where the server supports it. With a
+    confirm filesystem only files that still exist on disk are indexed.
+    getsize() answers with the part size Plex reported.
+    """
+
+    def __init__(self, query, confirm=None):
+        self.query = query
+        self.confirm = confirm
+        self._lock = threading.Lock()
+        self._children = {}
+        self._files = {}
+        self._loaded_shows = set()
+        self.requests = 0
+
+    def load_section(self, section):
+        """Bulk-load extras for all shows of a section, returns the number of shows with trailers.
+
+        The listing only includes show-level extras, so shows loaded here are
+        complete for show trailers only; season trailers need ensure_show.
+        """
+        try:
+            container = self.query(f"/library/sections/{section.key}/all?type=2&includeExtras=1")
+            self.requests += 1
+        except Exception as e:
+            log.warning(f"Bulk extras request for {section.title} failed, falling back to per-show requests: {e}")
+            return 0
+
+        shows_with_extras = 0
+        loaded = []
+        for directory in container.iter('Directory'):
+            if directory.find('Extras') is None:
+                continue
+            loaded.append(directory.get('ratingKey'))
+            parts = extract_trailer_parts(directory)
+            if parts:
+                shows_with_extras += 1
+            self._add_parts(parts)
+
+        # Servers that ignore includeExtras on listings return no Extras at all;
+        # those shows are then loaded one by one
+        with self._lock:
+            self._loaded_shows.update(loaded)
+        log.info(f"Loaded Plex extras for {len(loaded)} show(s) in {section.title} "
+                 f"({shows_with_extras} with trailers)")
+        return shows_with_extras
+
+    def ensure_show(self, show):
+        """Load a show's (and its seasons') trailer extras unless the section load covered it"""
+        rating_key = str(show.ratingKey)
+        with self._lock:
+            if rating_key in self._loaded_shows:
+                return
+            self._loaded_shows.add(rating_key)
+        try:
+            container = self.query(f"/library/metadata/{rating_key}?includeExtras=1&includeChildren=1")
+            self.requests += 1
+        except Exception as e:
+            log.error(f"Extras request failed for {show.title}: {e}")
+            return
+        self._add_parts(extract_trailer_parts(container))
+
+    def _add_parts(self, parts):
+        if self.confirm is not None:
+            parts = [(file, size) for file, size in parts if self.confirm.isfile(file)]
+        with self._lock:
+            for file, size in parts:
+                file = os.path.normpath(file)
+                self._files[file] = size
+                child = file
+                parent = os.path.dirname(child)
+                while parent != child:
+                    self._children.setdefault(parent, set()).add(os.path.basename(child))
+                    child, parent = parent, os.path.dirname(parent)
+
+    def listdir(self, path):
+        with self._lock:
+            children = self._children.get(os.path.normpath(path))
+        if children is None:
+            raise FileNotFoundError(path)
+        return sorted(children)
+
+    def isdir(self, path):
+        return os.path.normpath(path) in self._children
+
+    def isfile(self, path):
+        return os.path.normpath(path) in self._files
+
+    def exists(self, path):
+        return self.isdir(path) or self.isfile(path)
+
+    def getsize(self, path):
+        path = os.path.normpath(path)
+        with self._lock:
+            if path not in self._files:
+                raise FileNotFoundError(path)
+            size = self._files[path]
+        if size is None:
+            # Older servers leave out the part size
+            return self.confirm.getsize(path) if self.confirm is not None else 0
+        return size
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+# Statuses worth retrying: rate limited or the server/proxy in front of it is struggling
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request while the circuit breaker is open"""
+
+
+############################################################
+# CIRCUIT BREAKER
+############################################################
+
+class CircuitBreaker:
+    """Stop calling a server that keeps failing, then probe it again after a pause.
+
+    After failure_threshold consecutive failures the circuit opens and requests
+    fail fast with CircuitOpenError for reset_timeout seconds. The first request
+    after that is let through as a probe: success closes the circuit, failure
+    opens it for another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.trips = 0
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None
+
+    def remaining(self):
+        """Seconds until the next probe is allowed (0 when closed)"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0.0, self.reset_timeout - (self.clock() - self._opened_at))
+
+    def before_request(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._probing or self.clock() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError("Plex circuit breaker is open, skipping request")
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                log.info("Plex server is responding again, closing circuit breaker")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                if self._opened_at is None:
+                    self.trips += 1
+                    log.warning(f"{self._failures} failed Plex requests in a row, "
+                                f"pausing requests for {self.reset_timeout}s")
+                self._opened_at = self.clock()
+                self._probing = False
+
+
+############################################################
+# SESSION
+############################################################
+
+class JitteredRetry(Retry):
+    """urllib3 Retry with full jitter on the exponential backoff, so parallel workers don't retry in lockstep"""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+
+class PlexSession(requests.Session):
+    """requests.Session for Plex that reports every outcome to a circuit breaker"""
+
+    def __init__(self, breaker):
+        super().__init__()
+        self.breaker = breaker
+
+    def request(self, method, url, *args, **kwargs):
+        self.breaker.before_request()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+
+def make_plex_session(pool_size=16, retries=3, backoff_factor=0.5, failure_threshold=5, reset_timeout=30):
+    """Session with a connection pool sized for the scan threads and retries on idempotent requests.
+
+    Only GET/HEAD are retried (on connection errors, read timeouts and
+    RETRY_STATUSES, honouring Retry-After); anything else is sent once. That
+    includes the partial-scan refreshes, which LibrarySection.update(path=...)
+    sends as GETs; asking Plex to scan a folder twice is harmless.
+    """
+    session = PlexSession(CircuitBreaker(failure_threshold, reset_timeout))
+    retry = JitteredRetry(total=retries, connect=retries, read=retries, status=retries,
+                          backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES,
+                          allowed_methods=frozenset({'GET', 'HEAD'}), respect_retry_after_header=True,
+                          raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+
+def iter_container(server, key, page_size=200):
+    """Yield the items of a Plex container page by page instead of loading it whole.
+
+    Only container_start/container_size are passed: PlexAPI 4.13 treats any other
+    keyword of fetchItems as an attribute filter on the returned items.
+    """
+    start = 0
+    while True:
+        page = server.fetchItems(key, container_start=start, container_size=page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        start += page_size
+
+
+############################################################
+# COMPACT RECORDS
+############################################################
+
+# Slotted stand-ins for plexapi Show/Season objects. They keep only what the scan
+# reads (same attribute names as plexapi) and drop the parsed XML, so holding a
+# record per show for a whole library stays small. Seasons and episodes are
+# fetched on demand, episodes in container pages.
+
+class SeasonRecord:
+    __slots__ = ('ratingKey', 'index', 'leafCount', '_server', '_page_size')
+
+    def __init__(self, season, server, page_size):
+        self.ratingKey = season.ratingKey
+        self.index = season.index
+        self.leafCount = getattr(season, 'leafCount', 0) or 0
+        self._server = server
+        self._page_size = page_size
+
+    def episodes(self):
+        return list(iter_container(self._server, f"/library/metadata/{self.ratingKey}/children", self._page_size))
+
+
+class ShowRecord:
+    __slots__ = ('ratingKey', 'title', 'guid', 'guids', 'locations', 'updatedAt', 'leafCount',
+                 '_server', '_page_size')
+
+    def __init__(self, show, server, page_size):
+        self.ratingKey = show.ratingKey
+        self.title = show.title
+        self.guid = getattr(show, 'guid', '') or ''
+        self.guids = tuple(str(getattr(guid, 'id', guid)) for guid in getattr(show, 'guids', None) or [])
+        self.locations = tuple(getattr(show, 'locations', None) or [])
+        self.updatedAt = getattr(show, 'updatedAt', None)
+        self.leafCount = getattr(show, 'leafCount', 0) or 0
+        self._server = server
+        self._page_size = page_size
+
+    def seasons(self):
+        return [SeasonRecord(season, self._server, self._page_size)
+                for season in self._server.fetchItems(f"/library/metadata/{self.ratingKey}/children")]
+
+
+def iter_section_shows(server, section, page_size=200):
+    """Stream a TV section's shows as ShowRecords, one container page at a time.
+
+    includeGuids puts the external IDs into the listing, so no per-show reload
+    is needed to read them.
+    """
+    key = f"/library/sections/{section.key}/all?type=2&includeGuids=1"
+    for show in iter_container(server, key, page_size):
+        yield ShowRecord(show, server, page_size)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+
+def coalesce_paths(paths, threshold=0, roots=()):
+    """Reduce a set of directories to the fewest partial-scan paths.
+
+    Paths below another pending path are dropped (the parent scan covers them).
+    With a threshold, threshold or more sibling directories are replaced by their
+    parent, e.g. several season folders of one show become one show scan.
+    Library roots are never used as a parent, that would be a full library scan.
+    """
+    paths = {os.path.normpath(path) for path in paths}
+    roots = {os.path.normpath(root) for root in roots}
+
+    if threshold:
+        by_parent = {}
+        for path in paths:
+            by_parent.setdefault(os.path.dirname(path), set()).add(path)
+        for parent, children in by_parent.items():
+            if len(children) >= threshold and parent not in roots:
+                paths -= children
+                paths.add(parent)
+
+    coalesced = []
+    for path in sorted(paths, key=len):
+        # Shorter paths first, so any pending ancestor is already kept
+        parent = os.path.dirname(path)
+        while parent not in coalesced and parent != os.path.dirname(parent):
+            parent = os.path.dirname(parent)
+        if parent in coalesced:
+            continue
+        coalesced.append(path)
+    return sorted(coalesced)
+
+
+############################################################
+# REFRESH BATCHER
+############################################################
+
+class RefreshBatcher:
+    """Collect directories with new trailers and refresh them in Plex in batches.
+
+    Each published trailer adds its show/season folder. Pending folders are
+    flushed as partial scans (section.update(path=...)), deduplicated and
+    coalesced per library, by a background thread once batch_window seconds
+    have passed since the first pending addition (whether or not more trailers
+    arrive), and by close() at the end of the run. Scans are spaced at least
+    min_interval seconds apart so a large batch doesn't flood the server.
+    """
+
+    def __init__(self, get_section, subdirectory_name='Trailers', batch_window=60, min_interval=2,
+                 coalesce_threshold=3, sleep=time.sleep, clock=time.monotonic):
+        self.get_section = get_section
+        self.subdirectory_name = subdirectory_name
+        self.batch_window = batch_window
+        self.min_interval = min_interval
+        self.coalesce_threshold = coalesce_threshold
+        self.sleep = sleep
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._first_pending_at = None
+        self._last_refresh_at = None
+        self._thread = None
+        self._closed = False
+        self.refreshes = 0
+
+    def add(self, library, file_path):
+        """Schedule a refresh for the folder a new trailer was written to"""
+        directory = os.path.dirname(file_path)
+        if os.path.basename(directory) == self.subdirectory_name:
+            # Plex scans extras folders as part of their parent
+            directory = os.path.dirname(directory)
+
+        with self._wake:
+            self._pending.setdefault(library, set()).add(directory)
+            if self._first_pending_at is None:
+                self._first_pending_at = self.clock()
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='plex-refresh', daemon=True)
+                self._thread.start()
+            self._wake.notify()
+
+    def _run(self):
+        """Flush each batch once its window has passed, until close()"""
+        while True:
+            with self._wake:
+                while not self._closed:
+                    if self._first_pending_at is None:
+                        self._wake.wait()
+                        continue
+                    remaining = self.batch_window - (self.clock() - self._first_pending_at)
+                    if remaining <= 0:
+                        break
+                    self._wake.wait(remaining)
+                if self._closed:
+                    return
+            self.flush()
+
+    def close(self):
+        """Stop the background flusher and issue whatever is still pending"""
+        with self._wake:
+            self._closed = True
+            self._wake.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def flush(self):
+        """Issue the pending partial scans"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._first_pending_at = None
+
+            for library, directories in pending.items():
+                try:
+                    section = self.get_section(library)
+                except Exception as e:
+                    log.error(f"Cannot refresh library {library}: {e}")
+                    continue
+
+                roots = getattr(section, 'locations', None) or []
+                for path in coalesce_paths(directories, self.coalesce_threshold, roots):
+                    self._wait_turn()
+                    try:
+                        section.update(path=path)
+                        self.refreshes += 1
+                        log.info(f"Requested Plex partial scan: {path}")
+                    except Exception as e:
+                        log.error(f"Plex partial scan failed for {path}: {e}")
+
+    def _wait_turn(self):
+        if self._last_refresh_at is not None:
+            remaining = self.min_interval - (self.clock() - self._last_refresh_at)
+            if remaining > 0:
+                self.sleep(remaining)
+        self._last_refresh_at = self.clock()
@@ -1,21 +1,49 @@
 #!/usr/bin/env python3
+import atexit
 import os
 import sys
+import argparse
 import logging
 import time
 import re
 import json
+import shutil
+import tempfile
 from pathlib import Path
+import glob
+import hashlib
 from collections import defaultdict
-from urllib.parse import urljoin
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urljoin
 import subprocess
+import threading
+import zlib
+import queue
 from difflib import SequenceMatcher
 
 import requests
 from tqdm import tqdm
 from plexapi.server import PlexServer
 
-from config import cfg
+from adaptive_concurrency import AdaptiveLimiter
+from cassette import Cassette
+from config import ConfigError, cfg
+from download_scheduler import BandwidthScheduler
+from filesystem_scan import FilesystemScanner, FilesystemShow
+from format_planner import get_episodes_video_height, height_capped_format, plan_format, probe_video_info
+from plex_extras import PlexExtrasIndex
+from plex_http import make_plex_session
+from plex_records import iter_section_shows
+from plex_refresh import RefreshBatcher
+from profiling import RunProfiler, profile_stage
+from remote_filesystem import LocalFilesystem, SSHConnection, build_remote_index
+from season_resolver import SeasonDirectoryResolver
+from state_store import StateStore, resolve_state_path
+from status_server import StatusServer, run_status
+from trailer_postprocess import PostProcessor, link_or_copy
+from trailer_providers import FileProvider, KinoCheckProvider, ProviderChain, SingleFlight, TMDBProvider
+from vpn_session import VPNSession
 
 ############################################################
 # INIT
@@ -32,18 +60,112 @@ logging.basicConfig(
 logging.getLogger('urllib3.connectionpool').disabled = True
 log = logging.getLogger("Plex_Trailer_Checker")
 
-# Setup PlexServer object
-try:
-    plex = PlexServer(cfg['PLEX_SERVER'], cfg['PLEX_TOKEN'], timeout=60)
-    log.info(f"Successfully connected to Plex server: {cfg['PLEX_SERVER']}")
-except Exception as e:
-    log.exception("Exception connecting to server %r with token %r", cfg['PLEX_SERVER'], cfg['PLEX_TOKEN'])
-    print(f"Exception connecting to {cfg['PLEX_SERVER']} with token: {cfg['PLEX_TOKEN']}")
-    print(f"Error: {e}")
-    exit(1)
+# PlexServer object, connected by connect_plex() only for modes that need Plex
+plex = None
+plex_session = None
+
+# Persistent state (verification results, coverage index) shared by all workers
+state_store = StateStore(cfg['STATE_DB'])
+
+# Library filesystem used for trailer checks; replaced by an SSH index with REMOTE_FILESYSTEM
+library_fs = LocalFilesystem()
+
+# Trailer files Plex knows as extras (TRAILER_DETECTION.source = 'plex_extras'), else None
+trailer_index = None
+
+# Season directories from show locations, cached by ratingKey
+season_resolver = SeasonDirectoryResolver(store=state_store)
+
+
+def connect_plex():
+    """Setup the PlexServer object on a pooled session with retries and a circuit breaker"""
+    global plex, plex_session
+    http_cfg = cfg['PLEX_HTTP']
+    plex_session = make_plex_session(pool_size=http_cfg['pool_size'], retries=http_cfg['retries'],
+                                     backoff_factor=http_cfg['backoff_factor'],
+                                     failure_threshold=http_cfg['circuit_failure_threshold'],
+                                     reset_timeout=http_cfg['circuit_reset_seconds'])
+    try:
+        plex = PlexServer(cfg['PLEX_SERVER'], cfg['PLEX_TOKEN'], session=plex_session, timeout=http_cfg['timeout'])
+        log.info(f"Successfully connected to Plex server: {cfg['PLEX_SERVER']}")
+    except Exception as e:
+        log.exception("Exception connecting to server %r with token %r", cfg['PLEX_SERVER'], cfg['PLEX_TOKEN'])
+        print(f"Exception connecting to {cfg['PLEX_SERVER']} with token: {cfg['PLEX_TOKEN']}")
+        print(f"Error: {e}")
+        exit(1)
 
 # Global request counter for API rate limiting
 api_request_count = 0
+api_request_count_lock = threading.Lock()
+
+# Trailer sources, created on first lookup
+trailer_providers = None
+
+# Coalesces identical KinoCheck requests that are in flight at the same time
+kinocheck_flight = SingleFlight()
+
+# AdaptiveLimiters by name ('kinocheck', 'downloads'), created on first use
+concurrency_limiters = {}
+concurrency_limiters_lock = threading.Lock()
+
+# Post-processing pool for downloads that don't bring their own (see get_shared_post_processor)
+shared_post_processor = None
+shared_post_processor_lock = threading.Lock()
+
+# Cassette of a --record/--replay run, None otherwise
+cassette = None
+
+
+def output_path(path):
+    """Where this run writes a file meant for path: the path itself, or its place in the replay sandbox"""
+    return cassette.sandbox_path(path) if cassette else path
+
+
+def get_limiter(name):
+    """Shared concurrency limiter for KinoCheck requests or downloads, configured by ADAPTIVE_CONCURRENCY"""
+    with concurrency_limiters_lock:
+        if name not in concurrency_limiters:
+            adaptive_cfg = cfg['ADAPTIVE_CONCURRENCY']
+            settings = adaptive_cfg[name]
+            if name == 'downloads':
+                max_limit = max(1, int(cfg['DOWNLOAD_SCHEDULE']['max_concurrent_downloads']))
+            else:
+                max_limit = settings['max']
+            if adaptive_cfg['enabled']:
+                concurrency_limiters[name] = AdaptiveLimiter(
+                    name, initial=settings['initial'], min_limit=settings['min'], max_limit=max_limit,
+                    window=settings['window'], latency_tolerance=settings.get('latency_tolerance', 0),
+                    error_threshold=settings['error_threshold'], throughput_drop=settings.get('throughput_drop', 0))
+            else:
+                concurrency_limiters[name] = AdaptiveLimiter(name, initial=max_limit, min_limit=max_limit,
+                                                             max_limit=max_limit)
+        return concurrency_limiters[name]
+
+
+def api_quota_remaining():
+    """Lookups left today per rate-limited trailer source"""
+    quotas = {}
+    if cfg['KINOCHECK_API']['enabled']:
+        quotas['kinocheck'] = max(0, cfg['KINOCHECK_API']['max_requests_per_day'] - api_request_count)
+    tmdb_cfg = cfg['TRAILER_PROVIDERS']['tmdb']
+    if tmdb_cfg['enabled'] and tmdb_cfg['max_requests_per_day']:
+        quotas['tmdb'] = max(0, tmdb_cfg['max_requests_per_day'] - state_store.get_provider_usage('tmdb'))
+    return quotas
+
+
+@contextmanager
+def run_stage(name):
+    """Mark a pipeline stage for the status endpoint and the profiler"""
+    run_status.set_stage(name)
+    with profile_stage(name):
+        yield
+
+
+def concurrency_metrics():
+    """Current state of the concurrency limiters, for results and reports"""
+    with concurrency_limiters_lock:
+        limiters = dict(concurrency_limiters)
+    return {name: limiter.metrics() for name, limiter in limiters.items()}
 
 ############################################################
 # KINOCHECK API FUNCTIONS
@@ -51,8 +173,6 @@ api_request_count = 0
 
 def make_kinocheck_request(endpoint, params=None):
     """Make a request to the KinoCheck API with rate limiting"""
-    global api_request_count
-    
     if not cfg['KINOCHECK_API']['enabled']:
         log.debug("KinoCheck API is disabled in config")
         print("    KinoCheck API is disabled")
@@ -79,12 +199,32 @@ def make_kinocheck_request(endpoint, params=None):
         params = {}
     params['language'] = cfg['KINOCHECK_API']['language']
     
+    # Identical requests already in flight (another thread) share that request's answer
+    cache_key = f"{url}?{urlencode(sorted(params.items()))}"
+    return kinocheck_flight.do(cache_key, fetch_kinocheck, url, headers, params, cache_key)
+
+
+def fetch_kinocheck(url, headers, params, cache_key):
+    """Perform one KinoCheck request, served from the persistent cache when possible"""
+    global api_request_count
+    
+    cache_ttl = cfg['KINOCHECK_API']['cache_ttl_hours'] * 3600
+    if cache_ttl:
+        cached = state_store.get_cached_response(cache_key, cache_ttl)
+        if cached is not None:
+            log.debug(f"KinoCheck cache hit: {cache_key}")
+            return cached
+    
     log.debug(f"Making API request to: {url} with params: {params}")
     print(f"    API Request: {url} with params: {params}")
     
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        api_request_count += 1
+        with get_limiter('kinocheck').slot() as outcome:
+            response = requests.get(url, headers=headers, params=params, timeout=10)
+            if response.status_code == 429 or response.status_code >= 500:
+                outcome.failed()
+        with api_request_count_lock:
+            api_request_count += 1
         
         log.debug(f"API Response: Status {response.status_code}")
         print(f"    API Response: Status {response.status_code}")
@@ -94,6 +234,8 @@ def make_kinocheck_request(endpoint, params=None):
             result = response.json()
             log.debug(f"API Response data: {result}")
             print(f"    Response data keys: {list(result.keys()) if isinstance(result, dict) else 'Not a dict'}")
+            if cache_ttl:
+                state_store.store_cached_response(cache_key, result)
             return result
         else:
             log.error(f"KinoCheck API request failed: {response.status_code} - {response.text}")
@@ -106,68 +248,104 @@ def make_kinocheck_request(endpoint, params=None):
         return None
 
 
+def build_trailer_providers():
+    """Create the configured trailer sources (KinoCheck, TMDB, local file)"""
+    providers_cfg = cfg['TRAILER_PROVIDERS']
+    common = {
+        'store': state_store,
+        'cache_ttl_hours': providers_cfg['cache_ttl_hours'],
+        'miss_ttl_hours': providers_cfg['miss_ttl_hours'],
+    }
+    providers = []
+    
+    if cfg['KINOCHECK_API']['enabled']:
+        providers.append(KinoCheckProvider(make_kinocheck_request, **common))
+    
+    if providers_cfg['tmdb']['enabled'] and providers_cfg['tmdb']['api_key']:
+        providers.append(TMDBProvider(
+            providers_cfg['tmdb']['api_key'],
+            language=providers_cfg['tmdb']['language'],
+            fallback_language=providers_cfg['tmdb']['fallback_language'],
+            max_requests_per_day=providers_cfg['tmdb']['max_requests_per_day'],
+            **common
+        ))
+    
+    if providers_cfg['file']['enabled']:
+        providers.append(FileProvider(resolve_state_path(providers_cfg['file']['path']), **common))
+    
+    log.info(f"Trailer providers: {[provider.name for provider in providers]}")
+    # Wide enough for the KinoCheck limiter's maximum of shows to ask every provider at once;
+    # the limiter, not the pool, decides how many KinoCheck requests are in flight
+    max_parallel = max(providers_cfg['max_parallel'], get_limiter('kinocheck').max_limit * len(providers))
+    return ProviderChain(providers, max_parallel=max_parallel)
+
+
+def get_trailer_providers():
+    global trailer_providers
+    if trailer_providers is None:
+        trailer_providers = build_trailer_providers()
+    return trailer_providers
+
+
+def get_lookup_ids(show):
+    """External IDs of a show that MATCHING allows trailer lookups by"""
+    ids = get_show_external_ids(show)
+    if not cfg['MATCHING']['use_tmdb_ids']:
+        ids.pop('tmdb', None)
+    if not cfg['MATCHING']['use_imdb_ids']:
+        ids.pop('imdb', None)
+    return ids
+
+
 def find_show_trailers(show):
-    """Find trailers for a TV show using KinoCheck API"""
-    trailers = []
-    
+    """Find trailers for a TV show, asking all trailer providers concurrently"""
     # Debug: Show the GUIDs for debugging
     print(f"    Show primary GUID: {getattr(show, 'guid', 'No GUID')}")
     
-    # Get all external GUIDs
-    external_guids = []
-    if hasattr(show, 'guids'):
-        external_guids = [str(guid) for guid in show.guids]
-        print(f"    External GUIDs: {external_guids}")
-    
-    # Try with TMDB ID first
-    if cfg['MATCHING']['use_tmdb_ids']:
-        tmdb_id = None
-        for guid_str in external_guids:
-            tmdb_id = extract_tmdb_id(guid_str)
-            if tmdb_id:
-                break
-        
-        if tmdb_id:
-            log.debug(f"Searching for trailers using TMDB ID: {tmdb_id}")
-            print(f"    Found TMDB ID: {tmdb_id}")
-            data = make_kinocheck_request('/shows', {'tmdb_id': tmdb_id, 'categories': 'Trailer'})
-            if data and 'videos' in data:
-                trailers.extend(data['videos'])
-                log.debug(f"Found {len(data['videos'])} trailers via TMDB ID")
-                print(f"    API returned {len(data['videos'])} trailers")
-        else:
-            log.debug("No TMDB ID found in GUIDs")
-            print("    No TMDB ID found")
-    
-    # Try with IMDB ID if no trailers found yet
-    if not trailers and cfg['MATCHING']['use_imdb_ids']:
-        imdb_id = None
-        for guid_str in external_guids:
-            imdb_id = extract_imdb_id(guid_str)
-            if imdb_id:
-                break
-        
-        if imdb_id:
-            log.debug(f"Searching for trailers using IMDB ID: {imdb_id}")
-            print(f"    Found IMDB ID: {imdb_id}")
-            data = make_kinocheck_request('/shows', {'imdb_id': imdb_id, 'categories': 'Trailer'})
-            if data and 'videos' in data:
-                trailers.extend(data['videos'])
-                log.debug(f"Found {len(data['videos'])} trailers via IMDB ID")
-                print(f"    API returned {len(data['videos'])} trailers")
-        else:
-            log.debug("No IMDB ID found in GUIDs")
-            print("    No IMDB ID found")
+    ids = get_lookup_ids(show)
+    print(f"    External IDs: {ids}")
+    
+    if not ids:
+        log.debug(f"No external IDs found for {show.title}")
+        print(f"    ❌ No TMDB/IMDB/TVDB ID found for {show.title}")
+        return []
+    
+    trailers = get_trailer_providers().find_trailers(ids, show.title)
     
     # Summary
     if trailers:
-        print(f"    ✅ Found {len(trailers)} trailers for {show.title}")
+        print(f"    ✅ Found {len(trailers)} trailers for {show.title} (via {trailers[0].get('source', 'unknown')})")
     else:
         print(f"    ❌ No trailers found for {show.title}")
     
     return trailers
 
 
+def start_trailer_prefetch(groups):
+    """Look up trailers for the upcoming shows in the background so the scan finds them cached.
+    
+    Lookups run on a pool as wide as the KinoCheck limiter's maximum; the
+    limiter decides how many requests are actually in flight. A lookup the scan
+    reaches while it is still running is joined (single flight), not repeated.
+    """
+    providers = get_trailer_providers()
+    
+    def prefetch(show):
+        ids = get_lookup_ids(show)
+        if not ids:
+            return
+        try:
+            providers.find_trailers(ids, show.title)
+        except Exception as e:
+            # The scan's own lookup reports the error
+            log.debug(f"Trailer prefetch failed for {show.title}: {e}")
+    
+    pool = ThreadPoolExecutor(max_workers=get_limiter('kinocheck').max_limit, thread_name_prefix='prefetch')
+    for group in groups:
+        pool.submit(prefetch, group[0][1])
+    return pool
+
+
 def extract_tmdb_id(guid_string):
     """Extract TMDB ID from Plex GUID string"""
     if not guid_string:
@@ -222,6 +400,34 @@ def extract_imdb_id(guid_string):
     return None
 
 
+def extract_tvdb_id(guid_string):
+    """Extract TVDB ID from Plex GUID string"""
+    if not guid_string:
+        return None
+    
+    for pattern in [r'tvdb://(\d+)', r'agents\.thetvdb://(\d+)']:
+        tvdb_match = re.search(pattern, guid_string)
+        if tvdb_match:
+            return int(tvdb_match.group(1))
+    return None
+
+
+def get_show_external_ids(show):
+    """Collect the TMDB/IMDB/TVDB IDs of a Plex show from its GUIDs"""
+    guid_strings = [getattr(show, 'guid', '') or '']
+    if hasattr(show, 'guids'):
+        guid_strings.extend(str(getattr(guid, 'id', guid)) for guid in show.guids)
+    
+    ids = {}
+    for guid_str in guid_strings:
+        for key, extract in (('tmdb', extract_tmdb_id), ('imdb', extract_imdb_id), ('tvdb', extract_tvdb_id)):
+            if key not in ids:
+                value = extract(guid_str)
+                if value:
+                    ids[key] = value
+    return ids
+
+
 ############################################################
 # VPN FUNCTIONS (Private Internet Access)
 ############################################################
@@ -289,10 +495,6 @@ def connect_to_vpn():
         return False
     
     try:
-        # Change to PIA directory
-        original_dir = os.getcwd()
-        os.chdir(setup_path)
-        
         # Set environment variables for automated connection
         env = os.environ.copy()
         env.update({
@@ -322,23 +524,18 @@ def connect_to_vpn():
         print(f"    ⏱️ Setup timeout: {cfg.get('VPN', {}).get('connect_timeout', 300)} seconds")
         print(f"    📝 Expected questions: server selection and connection method")
         
-        # Use run() without capturing output so sudo can prompt for password
-        import subprocess
-        import time
-        
-        # Use our automated setup script with preserved environment
+        # Use our automated setup script with preserved environment. Run it from the
+        # PIA directory via cwd= instead of os.chdir so other threads keep their cwd
         result = subprocess.run(
             ['sudo', '-E', '../automated_pia_setup.sh'],
             env=env,
+            cwd=setup_path,
             timeout=cfg.get('VPN', {}).get('connect_timeout', 300),
             text=True
         )
         result_code = result.returncode
         print(f"    ✅ Setup script completed (exit code: {result_code})")
         
-        # Return to original directory
-        os.chdir(original_dir)
-        
         if result_code == 0:
             print(f"    🔍 Verifying VPN connection...")
             # Check if connection was successful by testing IP
@@ -357,17 +554,14 @@ def connect_to_vpn():
             return False
     
     except subprocess.TimeoutExpired:
-        os.chdir(original_dir)
         print(f"    ⏰ VPN setup timed out after {cfg.get('VPN', {}).get('connect_timeout', 120)} seconds")
         print(f"    💡 Try increasing connect_timeout in config.json or check your network")
         return False
     except KeyboardInterrupt:
-        os.chdir(original_dir)
         print(f"    ⚠️ VPN setup interrupted by user")
         print(f"    💡 If you want to skip VPN, set 'enabled': false in config.json")
         return False
     except Exception as e:
-        os.chdir(original_dir)
         log.error(f"Error connecting to VPN: {e}")
         print(f"    ❌ VPN connection error: {e}")
         print(f"    💡 Try running: python3 test_pia_vpn.py")
@@ -399,12 +593,12 @@ def check_vpn_connection():
         return False
 
 
-def disconnect_vpn():
-    """Disconnect from PIA VPN"""
+def disconnect_vpn(force=False):
+    """Disconnect from PIA VPN (force ignores disconnect_after_downloads, e.g. before a reconnect)"""
     if not cfg.get('VPN', {}).get('enabled', False):
         return True
     
-    if not cfg.get('VPN', {}).get('disconnect_after_downloads', True):
+    if not force and not cfg.get('VPN', {}).get('disconnect_after_downloads', True):
         log.debug("VPN disconnect disabled in config")
         return True
     
@@ -434,31 +628,166 @@ def disconnect_vpn():
         return False
 
 
+def get_external_ip(timeout=5):
+    """Return the current external IP address, or None if it can't be determined"""
+    try:
+        response = requests.get('https://ipinfo.io/json', timeout=timeout)
+        if response.status_code == 200:
+            return response.json().get('ip')
+    except Exception as e:
+        log.debug(f"External IP lookup failed: {e}")
+    return None
+
+
+def open_vpn_session():
+    """Create a VPN session whose health probe checks that traffic still leaves via the tunnel"""
+    vpn_cfg = cfg.get('VPN', {})
+    # A tunnel left up by an earlier run (disconnect_after_downloads=False) would be taken
+    # for the direct connection and fail every probe, so take it down first
+    disconnect_vpn(force=True)
+    direct_ip = get_external_ip()
+    log.debug(f"External IP before VPN: {direct_ip}")
+
+    def probe():
+        current_ip = get_external_ip()
+        # Unknown IP means the tunnel (or the network) is down; falling back to the
+        # direct IP means the tunnel dropped and traffic is leaking around it
+        return current_ip is not None and current_ip != direct_ip
+
+    return VPNSession(
+        connect=connect_to_vpn,
+        disconnect=disconnect_vpn,
+        probe=probe,
+        reset=lambda: disconnect_vpn(force=True),
+        probe_interval=vpn_cfg.get('health_check_interval', 30),
+        max_reconnect_attempts=vpn_cfg.get('max_reconnect_attempts', 3)
+    )
+
+
 ############################################################
 # TRAILER DOWNLOAD FUNCTIONS
 ############################################################
 
-def download_trailer(youtube_video_id, target_path, title="Trailer"):
-    """Download a trailer using yt-dlp with trimming options"""
+# Download outcomes returned by download_trailer / attempt_season_trailer_download
+DOWNLOAD_OK = 'downloaded'
+DOWNLOAD_GEO_BLOCKED = 'geo_blocked'
+DOWNLOAD_FAILED = 'failed'
+
+# yt-dlp error fragments that mean the video is blocked for the current location
+GEO_BLOCK_PATTERNS = [
+    'not available in your country',
+    'not made this video available in your country',
+    'blocked it in your country',
+    'blocked in your country',
+    'geo restriction',
+    'geo-restricted',
+    'georestricted',
+    'is not available from your location',
+]
+
+
+def is_geo_block_error(error_output):
+    """Classify yt-dlp error output as a geo-block"""
+    error_lower = (error_output or '').lower()
+    return any(pattern in error_lower for pattern in GEO_BLOCK_PATTERNS)
+
+
+# Files yt-dlp leaves behind while (or after failing) downloading
+PARTIAL_DOWNLOAD_SUFFIXES = ('.part', '.ytdl', '.temp', '.tmp')
+PARTIAL_DOWNLOAD_PATTERN = re.compile(r'(\.part-Frag\d+|\.f\d+\.\w+$|\.trim\.\w+$)', re.IGNORECASE)
+
+
+def is_partial_download(file_name):
+    """Check whether a file name belongs to an unfinished download or an intermediate file"""
+    name = os.path.basename(file_name).lower()
+    return name.endswith(PARTIAL_DOWNLOAD_SUFFIXES) or bool(PARTIAL_DOWNLOAD_PATTERN.search(name))
+
+
+def get_staging_directory(target_path):
+    """Scratch directory for a download target, stable across runs so retries can resume"""
+    key = hashlib.sha1(target_path.encode('utf-8')).hexdigest()[:16]
+    staging_dir = output_path(os.path.join(resolve_state_path(cfg['STAGING_DIR']), key))
+    os.makedirs(staging_dir, exist_ok=True)
+    return staging_dir
+
+
+def make_refresh_batcher():
+    """Batched Plex partial scans for folders that received trailers, None if disabled"""
+    refresh_cfg = cfg['PLEX_REFRESH']
+    # A replay publishes into its sandbox, so there is nothing new for Plex to scan
+    replaying = cassette is not None and cassette.mode == 'replay'
+    if not refresh_cfg['enabled'] or cfg.get('LOCAL_TEST_MODE', False) or plex is None or replaying:
+        return None
+    return RefreshBatcher(
+        plex.library.section,
+        subdirectory_name=cfg['TRAILER_NAMING_PATTERNS']['subdirectory_name'],
+        batch_window=refresh_cfg['batch_window_seconds'],
+        min_interval=refresh_cfg['min_interval_seconds'],
+        coalesce_threshold=refresh_cfg['coalesce_threshold']
+    )
+
+
+def make_post_processor():
+    """Post-processing pool for trimming and verifying downloaded trailers"""
+    return PostProcessor(
+        max_workers=cfg['POSTPROCESS_WORKERS'],
+        verify_cfg=cfg['VERIFICATION'],
+        state_store=state_store,
+        max_duration=cfg['MAX_TRAILER_DURATION']
+    )
+
+
+def get_shared_post_processor():
+    """Post-processing pool for downloads made outside the download phase, created once"""
+    global shared_post_processor
+    with shared_post_processor_lock:
+        if shared_post_processor is None:
+            shared_post_processor = make_post_processor()
+        return shared_post_processor
+
+
+def download_trailer(youtube_video_id, target_path, title="Trailer", limit_rate=None, format_selector=None,
+                     post_processor=None, on_rejected=None, on_published=None):
+    """Download a trailer using yt-dlp with trimming options.
+    
+    limit_rate caps this download in bytes/sec (its share of the scheduler budget).
+    format_selector overrides TRAILER_QUALITY (see select_trailer_format).
+    Trimming and verification are handed to post_processor's pool when given
+    (on_rejected is called if the file later fails verification, on_published
+    once it is in place), otherwise this call waits for them on a shared
+    pool and a bad file is reported as DOWNLOAD_FAILED.
+    Only the yt-dlp run holds a 'downloads' limiter slot, so the limiter's
+    throughput samples aren't diluted by format probing or post-processing.
+    
+    Returns one of DOWNLOAD_OK, DOWNLOAD_GEO_BLOCKED or DOWNLOAD_FAILED.
+    """
     
     if not youtube_video_id:
         print(f"    ❌ No YouTube video ID provided for: {title}")
-        return False
+        return DOWNLOAD_FAILED
     
     youtube_url = f"https://www.youtube.com/watch?v={youtube_video_id}"
     
     # Show expected file location upfront
     expected_file = target_path.replace('%(ext)s', cfg['TRAILER_FORMAT'])
+    
+    # yt-dlp writes into a per-target scratch directory; partial state left by a
+    # timeout stays there (outside the library) and is resumed on the next attempt
+    staging_dir = get_staging_directory(target_path)
+    staged_path = os.path.join(staging_dir, os.path.basename(target_path))
     print(f"    🎬 Downloading: {title}")
     print(f"    🔗 YouTube: https://www.youtube.com/watch?v={youtube_video_id}")
     print(f"    📁 Saving to: {expected_file}")
     
+    format_selector = format_selector or cfg['TRAILER_QUALITY']
+    
     # yt-dlp command with quality and format settings + VPN-friendly options
     cmd = [
         'yt-dlp',
-        '--format', cfg['TRAILER_QUALITY'],  # e.g., 'best[height<=1080]'
+        '--format', format_selector,  # e.g., 'best[height<=1080]'
         '--merge-output-format', cfg['TRAILER_FORMAT'],  # e.g., 'mp4'
-        '--output', target_path,
+        '--output', staged_path,
+        '--continue',  # Resume .part files left in the staging directory
         '--no-playlist',
         '--force-ipv4',  # Prevent IPv6 leakage that could reveal real location
         '--no-check-certificates',  # More permissive SSL handling for VPN
@@ -466,84 +795,77 @@ def download_trailer(youtube_video_id, target_path, title="Trailer"):
         '--geo-bypass-country', 'DE',  # Tell yt-dlp we're in Germany
         '--user-agent', 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',  # Human-like browser
         '--extractor-retries', '3',  # Retry on bot detection
-        '--sleep-requests', '1',  # Delay between requests (human-like)
+        '--sleep-requests', str(cfg['DOWNLOAD_SCHEDULE']['sleep_requests']),  # Delay between requests (human-like)
         youtube_url
     ]
     
-    # Add trimming if configured
-    if cfg.get('TRIM_START_SECONDS', 0) > 0:
-        trim_seconds = cfg['TRIM_START_SECONDS']
-        cmd.extend(['--download-sections', f'*{trim_seconds}-inf'])
-        trim_message = f"trimming first {trim_seconds}s"
+    if limit_rate:
+        cmd[-1:-1] = ['--limit-rate', str(limit_rate)]
+        print(f"    🚦 Rate limit: {limit_rate / 125000:.1f} Mbit/s")
+    
+    # Trimming happens after the download (stream copy, no re-encode) instead of
+    # yt-dlp's --download-sections, which forces a slow ffmpeg-based download
+    trim_seconds = cfg.get('TRIM_START_SECONDS', 0)
+    if trim_seconds > 0:
         print(f"    ✂️ Will trim first {trim_seconds} seconds")
-    else:
-        trim_message = "no trimming"
+    
+    download_timeout = cfg['DOWNLOAD_SCHEDULE']['download_timeout']
     
     log.debug(f"Downloading trailer: {title}")
-    log.debug(f"Quality setting: {cfg['TRAILER_QUALITY']}")
+    log.debug(f"Quality setting: {format_selector}")
     log.debug(f"Command: {' '.join(cmd)}")
-    print(f"    ⬇️ Starting download ({cfg['TRAILER_QUALITY']})...")
+    print(f"    ⬇️ Starting download ({format_selector})...")
     
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        with get_limiter('downloads').slot() as transfer:
+            run_status.start_download(staged_path, title)
+            try:
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=download_timeout)
+            finally:
+                run_status.finish_download(staged_path)
+            
+            # Find the actual downloaded file; a geo-block says nothing about congestion
+            matching_files = []
+            if result.returncode == 0:
+                matching_files = [f for f in glob.glob(staged_path.replace('%(ext)s', '*'))
+                                  if not is_partial_download(f)]
+            if matching_files:
+                transfer.bytes = os.path.getsize(matching_files[0])
+            elif not is_geo_block_error(result.stderr):
+                transfer.failed()
         
         if result.returncode == 0:
-            # Find the actual downloaded file and show details
-            import glob
-            
-            pattern = target_path.replace('%(ext)s', '*')
-            matching_files = glob.glob(pattern)
-            
             if matching_files:
                 actual_file = matching_files[0]
-                file_size = os.path.getsize(actual_file)
+                final_file = output_path(os.path.join(os.path.dirname(target_path), os.path.basename(actual_file)))
+                file_size = transfer.bytes
                 file_size_mb = file_size / (1024 * 1024)
                 
                 log.info(f"Successfully downloaded trailer: {title}")
                 print(f"    ✅ Download completed successfully!")
                 print(f"    📄 File: {os.path.basename(actual_file)}")
-                print(f"    📁 Full path: {actual_file}")
+                print(f"    📁 Full path: {final_file}")
                 print(f"    📏 Size: {file_size_mb:.1f} MB")
                 
-                # Try to get video resolution info
-                try:
-                    # Parse yt-dlp output for quality info
-                    output_text = result.stderr + result.stdout
-                    if output_text:
-                        import re
-                        # Look for various resolution patterns in yt-dlp output
-                        patterns = [
-                            r'(\d{3,4}x\d{3,4})',  # e.g., 1920x1080
-                            r'(\d{3,4}p)',         # e.g., 1080p
-                            r'height=(\d+)',       # height=1080
-                        ]
-                        
-                        for pattern in patterns:
-                            resolution_match = re.search(pattern, output_text)
-                            if resolution_match:
-                                print(f"    🎬 Resolution: {resolution_match.group(1)}")
-                                break
-                        else:
-                            # If we can't parse from output, check the actual file with ffprobe
-                            try:
-                                probe_cmd = ['ffprobe', '-v', 'quiet', '-select_streams', 'v:0', 
-                                           '-show_entries', 'stream=width,height', '-of', 'csv=p=0', actual_file]
-                                probe_result = subprocess.run(probe_cmd, capture_output=True, text=True, timeout=10)
-                                if probe_result.returncode == 0:
-                                    dimensions = probe_result.stdout.strip().split(',')
-                                    if len(dimensions) >= 2:
-                                        width, height = dimensions[0], dimensions[1]
-                                        print(f"    🎬 Resolution: {width}x{height}")
-                            except:
-                                print(f"    🎬 Resolution: Could not determine")
-                except:
-                    pass  # Don't fail if we can't get quality info
+                # Trimming, verification (ffprobe) and the atomic move into the library run
+                # on the post-processing pool; rejected files are reported via on_rejected
+                if post_processor:
+                    post_processor.submit(actual_file, trim_seconds, video_id=youtube_video_id,
+                                          on_rejected=on_rejected, on_published=on_published,
+                                          publish_to=final_file)
+                else:
+                    rejected = []
+                    get_shared_post_processor().submit(actual_file, trim_seconds, video_id=youtube_video_id,
+                                                       on_rejected=rejected.append, on_published=on_published,
+                                                       publish_to=final_file).result()
+                    if rejected:
+                        return DOWNLOAD_FAILED
                 
-                return True
+                return DOWNLOAD_OK
             else:
                 print(f"    ⚠️ Download may have completed but file not found")
-                print(f"    🔍 Expected pattern: {pattern}")
-                return False
+                print(f"    🔍 Expected pattern: {staged_path.replace('%(ext)s', '*')}")
+                return DOWNLOAD_FAILED
         else:
             error_output = result.stderr.strip()
             log.error(f"yt-dlp failed: {error_output}")
@@ -551,7 +873,11 @@ def download_trailer(youtube_video_id, target_path, title="Trailer"):
             # Provide specific error messages
             print(f"    ❌ Download failed!")
             
-            if "Video unavailable" in error_output:
+            if is_geo_block_error(error_output):
+                print(f"    🌍 Video is geo-blocked in the current region")
+                log.info(f"Trailer is geo-blocked: {youtube_url}")
+                return DOWNLOAD_GEO_BLOCKED
+            elif "Video unavailable" in error_output:
                 print(f"    🚫 Video is unavailable (removed or private)")
             elif "Sign in to confirm your age" in error_output:
                 print(f"    🔞 Video requires age verification")
@@ -563,22 +889,100 @@ def download_trailer(youtube_video_id, target_path, title="Trailer"):
                 print(f"    ❓ Error: {error_output}")
             
             print(f"    🔗 Check manually: {youtube_url}")
-            return False
+            return DOWNLOAD_FAILED
     
     except subprocess.TimeoutExpired:
         log.error(f"Download timeout for trailer: {title}")
-        print(f"    ⏰ Download timed out after 5 minutes")
+        print(f"    ⏰ Download timed out after {download_timeout} seconds")
         print(f"    💡 Video may be very large or connection is slow")
-        return False
+        print(f"    ♻️ Partial download kept in staging - the next attempt resumes it")
+        return DOWNLOAD_FAILED
     except Exception as e:
         log.error(f"Error downloading trailer: {e}")
         print(f"    ❌ Unexpected error: {e}")
         print(f"    🔗 Check manually: {youtube_url}")
-        return False
+        return DOWNLOAD_FAILED
+
+
+def plan_trailer_format(youtube_video_id, season_info):
+    """Plan the yt-dlp format for a season trailer.
+    
+    The planner caps the resolution at the season's own episode resolution (no 4K
+    trailers for 720p shows) and picks the best formats that fit max_trailer_mb.
+    Returns (format selector or None for TRAILER_QUALITY, estimated bytes or None).
+    """
+    planner_cfg = cfg['FORMAT_PLANNER']
+    if not planner_cfg['enabled']:
+        return None, None
+    
+    max_height = None
+    if planner_cfg['match_episode_resolution'] and season_info.get('video_height'):
+        max_height = max(season_info['video_height'], planner_cfg['min_height'])
+    max_bytes = planner_cfg['max_trailer_mb'] * 1024 * 1024 if planner_cfg['max_trailer_mb'] else None
+    
+    plan = plan_format(probe_video_info(youtube_video_id, store=state_store), max_height=max_height, max_bytes=max_bytes)
+    if plan:
+        log.debug(f"Format plan for {youtube_video_id}: {plan}")
+        return plan['format'], plan['estimated_bytes']
+    
+    if max_height:
+        return height_capped_format(max_height), None
+    return None, None
+
+
+def select_trailer_format(youtube_video_id, season_info):
+    """Choose a yt-dlp format for a season trailer, returns None to use TRAILER_QUALITY"""
+    # Jobs loaded from a plan file carry the format that was planned for them
+    if season_info.get('planned_format'):
+        return season_info['planned_format']
+    
+    format_selector, estimated_bytes = plan_trailer_format(youtube_video_id, season_info)
+    if estimated_bytes:
+        print(f"    📐 Format plan: {format_selector}, ~{estimated_bytes / (1024 * 1024):.1f} MB")
+    return format_selector
+
+
+def get_trailer_target_path(season_info, trailer_title):
+    """Target path for a trailer at the target's granularity (show, season or episode)"""
+    granularity = season_info.get('granularity', GRANULARITY_SEASON)
+    if granularity == GRANULARITY_SHOW:
+        return get_show_trailer_target_path(season_info, trailer_title)
+    if granularity == GRANULARITY_EPISODE:
+        return get_episode_trailer_target_path(season_info)
+    return get_season_trailer_target_path(season_info, trailer_title, season_info['season_directory'])
+
+
+def get_show_trailer_target_path(season_info, trailer_title):
+    """Show-level trailer: <show>/Trailers/<title>.ext, or <show>/<show>-trailer.ext inline"""
+    safe_title = re.sub(r'[<>:"/\\|?*]', '', trailer_title).replace(' ', '_')
+    show_directory = season_info['season_directory']
+    if cfg.get('LOCAL_TEST_MODE', False):
+        show_directory = os.path.join(cfg.get('LOCAL_TEST_DIR', './test_downloads'),
+                                      re.sub(r'[<>:"/\\|?*]', '', season_info['show']))
+    
+    if cfg['DOWNLOAD_METHOD'] == 'inline':
+        safe_show = re.sub(r'[<>:"/\\|?*]', '', season_info['show']).replace(' ', '_')
+        return os.path.join(show_directory, f"{safe_show}{cfg['TRAILER_NAMING_PATTERNS']['inline_suffix']}.%(ext)s")
+    return os.path.join(show_directory, cfg['TRAILER_NAMING_PATTERNS']['subdirectory_name'], f"{safe_title}.%(ext)s")
+
+
+def get_episode_trailer_target_path(season_info):
+    """Episode trailer next to the episode file: Episode_Name-trailer.ext (always inline)"""
+    episode_stem = Path(season_info['episode_file']).stem
+    episode_directory = season_info['season_directory']
+    if cfg.get('LOCAL_TEST_MODE', False):
+        episode_directory = os.path.join(cfg.get('LOCAL_TEST_DIR', './test_downloads'),
+                                         re.sub(r'[<>:"/\\|?*]', '', season_info['show']),
+                                         f"Season {season_info['season']:02d}")
+    return os.path.join(episode_directory,
+                        f"{episode_stem}{cfg['TRAILER_NAMING_PATTERNS']['inline_suffix']}.%(ext)s")
 
 
 def get_season_trailer_target_path(season_info, trailer_title, season_directory):
-    """Generate the target path for a downloaded season trailer"""
+    """Generate the target path for a downloaded season trailer.
+    
+    Pure path computation - directories are created when the trailer is published.
+    """
     
     # Clean up the trailer title for filename
     safe_title = re.sub(r'[<>:"/\\|?*]', '', trailer_title)
@@ -601,12 +1005,10 @@ def get_season_trailer_target_path(season_info, trailer_title, season_directory)
             # Use underscore in filename (not folder name) for safety
             safe_show_filename = safe_show.replace(' ', '_')
             filename = f"{safe_show_filename}_Season_{season_info['season']:02d}_{safe_title}-trailer.%(ext)s"
-            os.makedirs(local_season_dir, exist_ok=True)
             return os.path.join(local_season_dir, filename)
         else:
             # Place in Trailers subdirectory
             trailers_dir = os.path.join(local_season_dir, cfg['TRAILER_NAMING_PATTERNS']['subdirectory_name'])
-            os.makedirs(trailers_dir, exist_ok=True)
             filename = f"Season_{season_info['season']:02d}_{safe_title}.%(ext)s"
             return os.path.join(trailers_dir, filename)
     else:
@@ -618,7 +1020,6 @@ def get_season_trailer_target_path(season_info, trailer_title, season_directory)
         else:
             # Place in Trailers subdirectory
             trailers_dir = os.path.join(season_directory, cfg['TRAILER_NAMING_PATTERNS']['subdirectory_name'])
-            os.makedirs(trailers_dir, exist_ok=True)
             filename = f"Season_{season_info['season']:02d}_{safe_title}.%(ext)s"
             return os.path.join(trailers_dir, filename)
 
@@ -627,6 +1028,40 @@ def get_season_trailer_target_path(season_info, trailer_title, season_directory)
 # HELPER FUNCTIONS
 ############################################################
 
+def open_remote_filesystem():
+    """Index the library tree on the Plex host over SSH and use it for all trailer checks.
+    
+    One `find` over one multiplexed connection (REMOTE_TRANSFER.server/ssh_key)
+    replaces thousands of local lookups of paths that only exist on the server.
+    """
+    global library_fs
+    remote_cfg = cfg['REMOTE_FILESYSTEM']
+    transfer_cfg = cfg['REMOTE_TRANSFER']
+    
+    roots = remote_cfg['roots']
+    if not roots:
+        roots = [location for library_name in cfg['PLEX_LIBRARIES']
+                 for location in plex.library.section(library_name).locations]
+    
+    print(f"🔌 Indexing {len(roots)} library folder(s) on {transfer_cfg['server']} over SSH...")
+    connection = SSHConnection(transfer_cfg['server'], ssh_key=transfer_cfg['ssh_key'] or None)
+    try:
+        library_fs = build_remote_index(connection, roots, inline_suffix=cfg.inline_suffix,
+                                        subdirectory_name=cfg.subdirectory_name,
+                                        max_depth=remote_cfg['max_depth'], timeout=remote_cfg['timeout'])
+    except Exception as e:
+        # Checking server paths locally would report every season as missing
+        log.exception("Building the remote filesystem index failed")
+        print(f"✗ Remote filesystem index failed: {e}")
+        exit(1)
+    finally:
+        connection.close()
+    
+    season_resolver.listdir = library_fs.listdir
+    season_resolver.isdir = library_fs.isdir
+    print(f"✓ Remote index ready ({len(library_fs)} entries)")
+
+
 def get_section_type(plex_section_name):
     """Get the type of Plex library section"""
     try:
@@ -638,56 +1073,102 @@ def get_section_type(plex_section_name):
         exit(1)
 
 
-def get_season_directory_from_episodes(episodes):
-    """Get the common season directory from episodes"""
-    if not episodes:
+def get_target_video_height(load_episodes):
+    """Resolution of a target's episodes, used to cap the trailer resolution.
+    
+    load_episodes is only called when the format planner needs the resolution.
+    """
+    if load_episodes is None or not (cfg['FORMAT_PLANNER']['enabled'] and
+                                     cfg['FORMAT_PLANNER']['match_episode_resolution']):
+        return None
+    try:
+        return get_episodes_video_height(load_episodes())
+    except Exception as e:
+        log.error(f"Error getting episode resolution: {e}")
         return None
+
+
+def is_video_file(file_name):
+    return Path(file_name).suffix.lower() in cfg.video_extensions
+
+
+def check_for_show_trailers_in_directory(directory_path):
+    """Check for show-level trailers: <show>/Trailers/* or -trailer files in the show folder"""
+    trailers_found = []
+    trailers_dir = os.path.join(directory_path, cfg.subdirectory_name)
+    fs = trailer_index or library_fs
     
-    # Get the directory path from the first episode
     try:
-        first_episode = episodes[0]
-        for media in first_episode.media:
-            for part in media.parts:
-                if hasattr(part, 'file') and part.file:
-                    return os.path.dirname(part.file)
+        for directory, inline_only in ((directory_path, True), (trailers_dir, False)):
+            if not fs.isdir(directory):
+                continue
+            for file in fs.listdir(directory):
+                file_path = os.path.join(directory, file)
+                if not fs.isfile(file_path) or is_partial_download(file) or not is_video_file(file):
+                    continue
+                if inline_only and not Path(file).stem.lower().endswith(cfg.inline_suffix):
+                    continue
+                trailers_found.append(file_path)
+                log.debug(f"Found show trailer: {file_path}")
     except Exception as e:
-        log.error(f"Error getting season directory: {e}")
+        log.error(f"Error checking for show trailers in {directory_path}: {e}")
     
-    return None
+    return trailers_found
+
+
+def check_for_episode_trailer(episode_file, listings=None):
+    """Check for an inline trailer next to an episode file (Episode_Name-trailer.ext).
+    
+    listings caches directory listings by path, so the episodes of a season
+    folder share one listdir instead of listing it once per episode.
+    """
+    directory_path = os.path.dirname(episode_file)
+    trailer_stem = f"{Path(episode_file).stem.lower()}{cfg.inline_suffix}"
+    if listings is None:
+        listings = {}
+    if directory_path not in listings:
+        try:
+            listings[directory_path] = (trailer_index or library_fs).listdir(directory_path)
+        except OSError as e:
+            log.debug(f"Cannot list {directory_path}: {e}")
+            listings[directory_path] = []
+    return [os.path.join(directory_path, file) for file in listings[directory_path]
+            if Path(file).stem.lower() == trailer_stem and is_video_file(file) and not is_partial_download(file)]
 
 
 def check_for_season_trailers_in_directory(directory_path, season_number):
     """Check for season trailers in a given directory using both naming patterns"""
     trailers_found = []
+    fs = trailer_index or library_fs
     
-    if not os.path.exists(directory_path):
+    if not fs.exists(directory_path):
         log.debug(f"Directory does not exist: {directory_path}")
         return trailers_found
     
     try:
         # Check for inline trailers (files ending with -trailer.ext)
-        for file in os.listdir(directory_path):
+        for file in fs.listdir(directory_path):
             file_path = os.path.join(directory_path, file)
-            if os.path.isfile(file_path):
+            if fs.isfile(file_path) and not is_partial_download(file):
                 file_stem = Path(file).stem.lower()
                 file_ext = Path(file).suffix.lower()
                 
                 # Check if it's a video file and ends with trailer pattern
                 # Also check if it contains season reference
-                if (file_ext in [ext.lower() for ext in cfg['SUPPORTED_VIDEO_EXTENSIONS']] and 
-                    file_stem.endswith(cfg['TRAILER_NAMING_PATTERNS']['inline_suffix']) and
+                if (file_ext in cfg.video_extensions and
+                    file_stem.endswith(cfg.inline_suffix) and
                     ('season' in file_stem or f's{season_number:02d}' in file_stem or f'season_{season_number:02d}' in file_stem)):
                     trailers_found.append(file_path)
                     log.debug(f"Found inline season trailer: {file_path}")
         
         # Check for trailers in subdirectory
-        trailers_dir = os.path.join(directory_path, cfg['TRAILER_NAMING_PATTERNS']['subdirectory_name'])
-        if os.path.exists(trailers_dir) and os.path.isdir(trailers_dir):
-            for file in os.listdir(trailers_dir):
+        trailers_dir = os.path.join(directory_path, cfg.subdirectory_name)
+        if fs.isdir(trailers_dir):
+            for file in fs.listdir(trailers_dir):
                 file_path = os.path.join(trailers_dir, file)
-                if os.path.isfile(file_path):
+                if fs.isfile(file_path) and not is_partial_download(file):
                     file_ext = Path(file).suffix.lower()
-                    if file_ext in [ext.lower() for ext in cfg['SUPPORTED_VIDEO_EXTENSIONS']]:
+                    if file_ext in cfg.video_extensions:
                         trailers_found.append(file_path)
                         log.debug(f"Found subdirectory season trailer: {file_path}")
     
@@ -701,9 +1182,203 @@ def check_for_season_trailers_in_directory(directory_path, season_number):
 # MAIN ANALYSIS FUNCTIONS
 ############################################################
 
-def analyze_tv_series():
-    """Analyze TV series libraries for missing season trailers"""
-    results = {
+def process_download_job(job, results, results_lock, scheduler, post_processor, defer_geo_blocked=False,
+                         refresh_batcher=None):
+    """Download one queued job and record the outcome in results.
+    
+    The job waits for a scheduler slot (and its time window) first. With
+    defer_geo_blocked the geo-blocked outcome is returned without being
+    counted, so the caller can retry the job over the VPN. Published trailers
+    are handed to refresh_batcher so Plex picks them up.
+    """
+    season_info = job['season_info']
+    mirrors = job.get('mirrors', [])
+    
+    def on_rejected(item):
+        # The download was counted as a success; verification later found it bad
+        with results_lock:
+            results['trailers_downloaded'] -= 1
+            results['seasons_with_trailers'] -= 1
+            results['seasons_without_trailers'] += 1
+            results['download_failures'] += 1
+            results['verification_failures'] += 1
+            results['missing_trailers'].extend(missing_records(job_targets(job)))
+        log.info(f"Downloaded trailer failed verification for: {season_info['season_title']}")
+    
+    def on_published(item):
+        state_store.record_season_trailer(season_info['show_key'], season_info['season'], item['file'],
+                                          video_id=item.get('video_id'), size=item.get('size', 0))
+        if refresh_batcher:
+            refresh_batcher.add(season_info['library'], item['file'])
+        if mirrors:
+            publish_mirrors(item, job, results, results_lock, refresh_batcher)
+    
+    # The adaptive 'downloads' limiter is taken around the yt-dlp run inside
+    # download_trailer, so waiting for a window or probing formats isn't measured
+    with scheduler.slot() as limit_rate:
+        outcome = attempt_season_trailer_download(season_info, job['available_trailers'], limit_rate=limit_rate,
+                                                  post_processor=post_processor, on_rejected=on_rejected,
+                                                  on_published=on_published)
+    
+    if outcome == DOWNLOAD_GEO_BLOCKED and defer_geo_blocked:
+        log.info(f"Deferring geo-blocked trailer to VPN batch: {season_info['season_title']}")
+        return outcome
+    
+    with results_lock:
+        if outcome == DOWNLOAD_OK:
+            results['trailers_downloaded'] += 1
+            results['seasons_with_trailers'] += 1
+            results['seasons_without_trailers'] -= 1
+            log.info(f"Successfully downloaded trailer for: {season_info['season_title']}")
+        else:
+            results['download_failures'] += 1
+            results['missing_trailers'].extend(missing_records(job_targets(job)))
+            log.info(f"Failed to download trailer for: {season_info['season_title']}")
+    
+    return outcome
+
+
+def publish_mirrors(item, job, results, results_lock, refresh_batcher=None):
+    """Link a published trailer into the same season of the show's other libraries"""
+    trailer_title = choose_best_trailer(job['available_trailers']).get('title', 'Trailer')
+    ext = os.path.splitext(item['file'])[1].lstrip('.')
+    for mirror in job['mirrors']:
+        mirror_path = output_path(get_trailer_target_path(mirror, trailer_title).replace('%(ext)s', ext))
+        try:
+            link_or_copy(item['file'], mirror_path)
+        except OSError as e:
+            log.error(f"Could not link trailer to {mirror_path}: {e}")
+            with results_lock:
+                results['missing_trailers'].extend(missing_records([mirror]))
+            continue
+        
+        state_store.record_season_trailer(mirror['show_key'], mirror['season'], mirror_path,
+                                          video_id=item.get('video_id'), size=item.get('size', 0))
+        if refresh_batcher:
+            refresh_batcher.add(mirror['library'], mirror_path)
+        with results_lock:
+            results['trailers_linked'] += 1
+            results['seasons_with_trailers'] += 1
+            results['seasons_without_trailers'] -= 1
+        print(f"    🔗 Linked trailer into {mirror['library']}: {mirror_path}")
+
+
+def run_vpn_batch(jobs, results, results_lock, scheduler, post_processor, pool, refresh_batcher=None):
+    """Download jobs through the VPN, bringing the tunnel up once for the whole batch"""
+    print(f"\n🌍 Retrying {len(jobs)} geo-blocked trailer(s) through the VPN...")
+    
+    with open_vpn_session() as vpn_session:
+        with results_lock:
+            results['vpn_used'] = results['vpn_used'] or vpn_session.connected
+        
+        def download_via_vpn(job):
+            vpn_session.wait_until_ready()
+            outcome = process_download_job(job, results, results_lock, scheduler, post_processor,
+                                           refresh_batcher=refresh_batcher)
+            if outcome != DOWNLOAD_OK and vpn_session.connected:
+                vpn_session.report_failure()
+        
+        for future in [pool.submit(download_via_vpn, job) for job in jobs]:
+            future.result()
+
+
+def download_worker(job_queue, results, results_lock):
+    """Dispatch download jobs to a pool while the scan keeps running.
+    
+    Concurrency and bandwidth are governed by the DOWNLOAD_SCHEDULE scheduler.
+    VPN.routing selects how the VPN is used:
+      'always'       - every download goes through the tunnel, which is brought up
+                       when the first job arrives and torn down once the queue drains
+      'geo_fallback' - downloads go direct; only geo-blocked videos are re-queued
+                       into a VPN batch that runs after the direct downloads
+    Either way scanning and API lookups never depend on the VPN.
+    """
+    vpn_cfg = cfg.get('VPN', {})
+    vpn_enabled = vpn_cfg.get('enabled', False)
+    geo_fallback = vpn_enabled and vpn_cfg.get('routing', 'always') == 'geo_fallback'
+    scheduler = BandwidthScheduler(cfg['DOWNLOAD_SCHEDULE'])
+    post_processor = make_post_processor()
+    refresh_batcher = make_refresh_batcher()
+    vpn_session = None
+    vpn_batch = []
+    vpn_batch_lock = threading.Lock()
+    
+    def run_job(job):
+        try:
+            if geo_fallback:
+                outcome = process_download_job(job, results, results_lock, scheduler, post_processor,
+                                               defer_geo_blocked=True, refresh_batcher=refresh_batcher)
+                if outcome == DOWNLOAD_GEO_BLOCKED:
+                    with vpn_batch_lock:
+                        vpn_batch.append(job)
+                return
+            
+            if vpn_session:
+                # Hold the download while the session reconnects a dropped tunnel
+                vpn_session.wait_until_ready()
+            
+            outcome = process_download_job(job, results, results_lock, scheduler, post_processor,
+                                           refresh_batcher=refresh_batcher)
+            
+            if outcome != DOWNLOAD_OK and vpn_session and vpn_session.connected:
+                # A failed download may mean the tunnel dropped - probe now instead of waiting
+                vpn_session.report_failure()
+        except Exception:
+            log.exception(f"Download job crashed: {job['season_info']['season_title']}")
+            with results_lock:
+                results['download_failures'] += 1
+                results['missing_trailers'].extend(missing_records(job_targets(job)))
+    
+    pool = ThreadPoolExecutor(max_workers=scheduler.max_concurrent, thread_name_prefix='download')
+    futures = []
+    run_status.add_queue('downloads', lambda: job_queue.qsize() + sum(
+        1 for future in list(futures) if not future.running() and not future.done()))
+    
+    try:
+        while True:
+            job = job_queue.get()
+            if job is None:
+                break
+            
+            if vpn_session is None and vpn_enabled and not geo_fallback:
+                vpn_session = open_vpn_session()
+                vpn_session.start()
+                with results_lock:
+                    results['vpn_used'] = vpn_session.connected
+            
+            futures.append(pool.submit(run_job, job))
+        
+        for future in futures:
+            future.result()
+        
+        if vpn_batch:
+            run_vpn_batch(vpn_batch, results, results_lock, scheduler, post_processor, pool, refresh_batcher)
+            vpn_batch.clear()
+    
+    except Exception:
+        log.exception("Download worker crashed")
+    
+    finally:
+        pool.shutdown(wait=True)
+        post_processor.shutdown()
+        if refresh_batcher:
+            # Stops the background flusher and refreshes what the last trailers added
+            refresh_batcher.close()
+            if refresh_batcher.refreshes:
+                print(f"\n🔄 Requested {refresh_batcher.refreshes} Plex partial scan(s) for new trailers")
+        if vpn_session:
+            vpn_session.stop()
+        
+        # Anything still waiting for the VPN batch is a failure
+        with results_lock:
+            for job in vpn_batch:
+                results['download_failures'] += 1
+                results['missing_trailers'].extend(missing_records(job_targets(job)))
+
+
+def new_results():
+    """Empty results/counters for a run"""
+    return {
         'shows_analyzed': 0,
         'seasons_analyzed': 0,
         'seasons_with_trailers': 0,
@@ -711,161 +1386,653 @@ def analyze_tv_series():
         'missing_trailers': [],
         'trailers_downloaded': 0,
         'download_failures': 0,
-        'vpn_used': False
+        'verification_failures': 0,
+        'trailers_linked': 0,
+        'shows_failed': 0,
+        'concurrency': {},
+        'vpn_used': False,
+        'plan': []
     }
+
+
+# TRAILER_GRANULARITY values: one trailer per show, per season or per episode
+GRANULARITY_SHOW = 'show'
+GRANULARITY_SEASON = 'season'
+GRANULARITY_EPISODE = 'episode'
+
+# Season number under which show-level trailers are indexed
+SHOW_LEVEL_SEASON = -1
+
+
+def get_show_trailer_targets(show, library_name):
+    """One show-level target in the show's first location"""
+    locations = getattr(show, 'locations', None) or []
+    show_directory = locations[0] if locations else None
+    season_info = {
+        'granularity': GRANULARITY_SHOW,
+        'show': show.title,
+        'show_key': show.ratingKey,
+        'library': library_name,
+        'season': SHOW_LEVEL_SEASON,
+        'season_title': show.title,
+        'episode_count': getattr(show, 'leafCount', 0),
+        'season_directory': show_directory,
+        'season_directories': locations
+    }
+    existing = check_for_show_trailers_in_directory(show_directory) if show_directory else []
+    return [(season_info, existing, None)]
+
+
+def get_season_trailer_targets(show, seasons, season_directories, library_name):
+    """One target per season, checked across all of the season's folders"""
+    targets = []
+    for season in seasons:
+        season_number = season.index
+        directories = season_directories.get(season_number) or []
+        existing = []
+        for directory in directories:
+            existing.extend(check_for_season_trailers_in_directory(directory, season_number))
+        season_info = {
+            'granularity': GRANULARITY_SEASON,
+            'show': show.title,
+            'show_key': show.ratingKey,
+            'library': library_name,
+            'season': season_number,
+            'season_title': f"{show.title} - Season {season_number:02d}",
+            'episode_count': getattr(season, 'leafCount', 0),
+            'season_directory': directories[0] if directories else None,
+            'season_directories': directories
+        }
+        targets.append((season_info, existing, season.episodes))
+    return targets
+
+
+def get_episode_trailer_targets(show, seasons, season_directories, library_name):
+    """One target per episode file (episodes are loaded season by season)"""
+    targets = []
+    listings = {}
+    for season in seasons:
+        # A failed episode listing fails the whole show, which is then retried
+        for episode in season.episodes():
+            episode_files = [part.file for media in (getattr(episode, 'media', None) or [])
+                             for part in media.parts if getattr(part, 'file', None)]
+            if not episode_files:
+                continue
+            season_info = {
+                'granularity': GRANULARITY_EPISODE,
+                'show': show.title,
+                'show_key': show.ratingKey,
+                'library': library_name,
+                'season': season.index,
+                'episode': episode.index,
+                'season_title': f"{show.title} - S{season.index:02d}E{(episode.index or 0):02d}",
+                'episode_count': 1,
+                'episode_file': episode_files[0],
+                'season_directory': os.path.dirname(episode_files[0]),
+                'season_directories': season_directories.get(season.index) or []
+            }
+            targets.append((season_info, check_for_episode_trailer(episode_files[0], listings),
+                            lambda episode=episode: [episode]))
+    return targets
+
+
+def get_trailer_targets(show, library_name):
+    """Build (season_info, existing trailers, episode loader) for a show at TRAILER_GRANULARITY"""
+    granularity = cfg['TRAILER_GRANULARITY']
+    if trailer_index:
+        trailer_index.ensure_show(show)
+    if granularity == GRANULARITY_SHOW:
+        return get_show_trailer_targets(show, library_name)
+    
+    # Lightweight season listing; directories come from the show's locations
+    seasons = [season for season in show.seasons()
+               if season.index is not None and getattr(season, 'leafCount', 1)]
+    if isinstance(show, FilesystemShow):
+        # The filesystem scan already found the season folders
+        season_directories = {season.index: season.directories for season in seasons}
+    else:
+        season_directories = season_resolver.resolve(show, seasons)
     
-    # VPN setup moved to download phase to avoid Plex API timeouts
-    vpn_connected = False
+    if granularity == GRANULARITY_EPISODE:
+        return get_episode_trailer_targets(show, seasons, season_directories, library_name)
+    return get_season_trailer_targets(show, seasons, season_directories, library_name)
+
+
+def record_target_scans(targets):
+    """Index what the scan found, one row per season (or per show in show mode)"""
+    scans = {}
+    for season_info, existing_trailers, _ in targets:
+        if not season_info['season_directory']:
+            continue
+        scan = scans.setdefault(season_info['season'], {
+            'show_key': season_info['show_key'],
+            'library': season_info['library'],
+            'directory': season_info['season_directories'][0] if season_info['season_directories'] else season_info['season_directory'],
+            'episode_count': 0,
+            'trailer_files': [],
+            'trailer_bytes': 0
+        })
+        scan['episode_count'] += season_info['episode_count']
+        scan['trailer_files'].extend(existing_trailers)
+        scan['trailer_bytes'] += sum(existing_trailer_size(path) for path in existing_trailers)
     
-    for library_name in cfg['PLEX_LIBRARIES']:
-        try:
-            section = plex.library.section(library_name)
-            section_type = get_section_type(library_name)
+    for season_number, scan in scans.items():
+        state_store.record_season_scan(scan['show_key'], season_number, scan['library'], scan['directory'],
+                                       scan['episode_count'], scan['trailer_files'], scan['trailer_bytes'])
+
+
+def existing_trailer_size(path):
+    """Size of a trailer the scan found, from the same index or filesystem the scan used"""
+    try:
+        return (trailer_index or library_fs).getsize(path)
+    except OSError:
+        return 0
+
+
+def open_trailer_index():
+    """Detect existing trailers from Plex extras instead of the disk (TRAILER_DETECTION)"""
+    global trailer_index
+    detection_cfg = cfg['TRAILER_DETECTION']
+    # With confirm_on_disk a trailer only counts if the file is also still on disk
+    confirm = library_fs if detection_cfg['confirm_on_disk'] else None
+    trailer_index = PlexExtrasIndex(plex.query, confirm=confirm)
+    print("Existing trailers are detected from Plex extras"
+          + (" (confirmed on disk)" if confirm else ""))
+
+
+def get_library_shows(library_name, filesystem=False):
+    """Shows of a library, from Plex or (filesystem=True) from FILESYSTEM_SCAN.roots.
+    
+    Returns None for Plex libraries that aren't TV show libraries.
+    """
+    if filesystem:
+        scan_cfg = cfg['FILESYSTEM_SCAN']
+        scanner = FilesystemScanner(cfg.video_extensions, inline_suffix=cfg.inline_suffix,
+                                    workers=scan_cfg['workers'])
+        return scanner.scan(scan_cfg['roots'][library_name])
+    
+    section = plex.library.section(library_name)
+    section_type = get_section_type(library_name)
+    if section_type != 'show':
+        log.info(f"Skipping library {library_name} - not a TV show library (type: {section_type})")
+        return None
+    # The section listing only carries show-level extras; season and episode
+    # trailers need the per-show request (includeChildren)
+    if trailer_index and cfg['TRAILER_DETECTION']['bulk'] and cfg['TRAILER_GRANULARITY'] == GRANULARITY_SHOW:
+        trailer_index.load_section(section)
+    # Paged listing into compact records instead of section.all()'s full Show objects
+    return iter_section_shows(plex, section, page_size=cfg['PLEX_PAGE_SIZE'])
+
+
+def group_shows_by_identity(library_shows):
+    """Group (library, show) pairs that are the same show in different libraries.
+    
+    Shows are the same when they share any external ID (IMDB/TMDB/TVDB); shows
+    without IDs stay on their own. Groups keep library order, so the first
+    configured library's copy comes first.
+    """
+    groups = []
+    group_by_id = {}
+    for library_name, show in library_shows:
+        ids = get_show_external_ids(show)
+        keys = [(source, str(value)) for source, value in sorted(ids.items())]
+        group = next((group_by_id[key] for key in keys if key in group_by_id), None)
+        if group is None:
+            group = []
+            groups.append(group)
+        group.append((library_name, show, ids))
+        for key in keys:
+            group_by_id.setdefault(key, group)
+    return groups
+
+
+def show_identity(group):
+    """Stable key of a show group for sharding: its first external ID, else the ratingKey"""
+    _, show, ids = group[0]
+    for source in ('imdb', 'tmdb', 'tvdb'):
+        if source in ids:
+            return f"{source}-{ids[source]}"
+    return show.ratingKey
+
+
+def analyze_tv_series(plan_only=False, shard=None, filesystem=False):
+    """Analyze TV series libraries for missing season trailers.
+    
+    Shows that exist in several libraries (e.g. an HD and a 4K section) are
+    grouped by external ID: trailers are looked up once per group and each
+    season is downloaded once, then linked into the other libraries' folders
+    (the job's 'mirrors').
+    
+    With plan_only nothing is downloaded: each season that would be downloaded is
+    added to results['plan'] instead (see build_plan_entry). With shard=(i, N)
+    only the show groups belonging to shard i of N are processed. With filesystem
+    the shows come from walking FILESYSTEM_SCAN.roots instead of the Plex API.
+    """
+    results = new_results()
+    results_lock = threading.Lock()
+    run_status.attach_results(results, results_lock)
+    
+    # Downloads run on a separate worker so the scan doesn't wait for them (or the VPN)
+    job_queue = queue.Queue()
+    worker = None
+    if cfg['DOWNLOAD_TRAILERS'] and not plan_only:
+        worker = threading.Thread(target=download_worker, args=(job_queue, results, results_lock),
+                                  name='download-worker', daemon=True)
+        worker.start()
+    
+    prefetch_pool = None
+    try:
+        library_shows = []
+        
+        def load_library(library_name):
+            # Shows are consumed page by page; a listing that fails midway is
+            # rolled back so the retry pass doesn't add its shows twice
+            shows = get_library_shows(library_name, filesystem=filesystem)
+            if shows is None:
+                return
+            count = len(library_shows)
+            try:
+                for show in shows:
+                    library_shows.append((library_name, show))
+            except Exception:
+                del library_shows[count:]
+                raise
+            log.info(f"Found {len(library_shows) - count} show(s) in TV library: {library_name}")
+            print(f"\nTV library {library_name}: {len(library_shows) - count} show(s)")
+        
+        library_names = scanned_library_names(filesystem)
+        with run_stage('list_libraries'):
+            run_with_retries(library_names, load_library, lambda library_name: f"library {library_name}")
+        
+        with run_stage('group_shows'):
+            groups = group_shows_by_identity(library_shows)
+        if len(groups) < len(library_shows):
+            print(f"{len(library_shows) - len(groups)} show(s) are in more than one library - "
+                  f"looking them up once")
+        if shard:
+            groups = [group for group in groups if in_shard(show_identity(group), shard)]
+            print(f"Shard {shard[0]}/{shard[1]}: {len(groups)} show(s)")
+        with results_lock:
+            results['shows_analyzed'] += len(groups)
+        run_status.set_scan_total(len(groups))
+        
+        # Prefetched answers only reach the scan through the provider cache
+        if (cfg['DOWNLOAD_TRAILERS'] or plan_only) and cfg['TRAILER_PROVIDERS']['cache_ttl_hours']:
+            prefetch_pool = start_trailer_prefetch(groups)
+        
+        def analyze_group(group):
+            analyze_show_group(group, results, results_lock, job_queue, plan_only)
+            run_status.show_done()
+        
+        with run_stage('analyze_shows'):
+            failed = run_with_retries(groups, analyze_group, lambda group: f"show {group[0][1].title}")
+        with results_lock:
+            results['shows_failed'] += len(failed)
+    
+    finally:
+        if prefetch_pool:
+            prefetch_pool.shutdown(wait=False, cancel_futures=True)
+        if worker:
+            # Let the worker drain the queue, then tear down the VPN
+            job_queue.put(None)
+            with run_stage('drain_downloads'):
+                worker.join()
+    
+    results['concurrency'] = concurrency_metrics()
+    return results
+
+
+def scanned_library_names(filesystem=False):
+    """Libraries a scan covers: the FILESYSTEM_SCAN.roots libraries or PLEX_LIBRARIES"""
+    return list(cfg['FILESYSTEM_SCAN']['roots']) if filesystem else cfg['PLEX_LIBRARIES']
+
+
+def run_with_retries(items, process, describe):
+    """Call process(item) for every item; items that raise are retried in later passes.
+    
+    A Plex hiccup then costs only the item it hit instead of the rest of the
+    library. Retry passes wait PLEX_HTTP.retry_delay_seconds (longer each pass)
+    and at least until the circuit breaker lets requests through again.
+    Returns the items that still failed after PLEX_HTTP.retry_rounds passes.
+    """
+    http_cfg = cfg['PLEX_HTTP']
+    failed = list(items)
+    for attempt in range(http_cfg['retry_rounds'] + 1):
+        if attempt:
+            delay = http_cfg['retry_delay_seconds'] * attempt
+            if plex_session is not None:
+                delay = max(delay, plex_session.breaker.remaining())
+            print(f"\nRetrying {len(failed)} failed item(s) in {delay:.0f}s (pass {attempt}/{http_cfg['retry_rounds']})")
+            time.sleep(delay)
+        
+        pending, failed = failed, []
+        for item in pending:
+            try:
+                process(item)
+            except Exception as e:
+                log.exception(f"Error analyzing {describe(item)}")
+                print(f"Error analyzing {describe(item)}: {e}")
+                failed.append(item)
+        if not failed:
+            break
+    
+    for item in failed:
+        log.error(f"Giving up on {describe(item)}")
+    return failed
+
+
+def analyze_show_group(group, results, results_lock, job_queue, plan_only=False):
+    """Check every library copy of one show and queue one job per missing season.
+    
+    A season that already has a trailer in one copy gets that file linked into
+    the copies without one instead of a download. All Plex lookups for the
+    group happen before any result is counted, so a group that fails can be
+    retried without counting seasons twice.
+    """
+    _, show, _ = group[0]
+    other_libraries = [library_name for library_name, _, _ in group[1:]]
+    print(f"  Checking show: {show.title}" + (f" (also in {', '.join(other_libraries)})" if other_libraries else ""))
+    log.info(f"Checking show: {show.title}")
+    library_targets = [(library_name, get_trailer_targets(library_show, library_name))
+                       for library_name, library_show, _ in group]
+    for library_name, library_show, ids in group:
+        state_store.upsert_show(library_show.ratingKey, library_name, library_show.title, ids)
+    
+    # Find available trailers for this show (once for all libraries). A plan
+    # always resolves them; DOWNLOAD_TRAILERS only governs real downloads
+    looking_up = cfg['DOWNLOAD_TRAILERS'] or plan_only
+    available_trailers = find_show_trailers(show) if looking_up else []
+    downloading = looking_up and bool(available_trailers)
+    linking = cfg['DOWNLOAD_TRAILERS'] and not plan_only
+    
+    # (season, episode) -> a trailer one of the copies already has
+    existing_by_key = {}
+    for _, targets in library_targets:
+        for season_info, existing_trailers, _ in targets:
+            if existing_trailers and season_info['season_directory']:
+                existing_by_key.setdefault((season_info['season'], season_info.get('episode')), existing_trailers[0])
+    
+    # (season, episode) -> job; the same season in another library becomes a mirror
+    jobs = {}
+    links = []
+    for library_name, targets in library_targets:
+        record_target_scans(targets)
+        
+        for season_info, existing_trailers, load_episodes in targets:
+            season_title = season_info['season_title']
+            
+            with results_lock:
+                results['seasons_analyzed'] += 1
             
-            if section_type != 'show':
-                log.info(f"Skipping library {library_name} - not a TV show library (type: {section_type})")
+            if not season_info['season_directory']:
+                log.warning(f"No directory found for: {season_title}")
                 continue
             
-            log.info(f"Analyzing TV library: {library_name}")
-            print(f"\nAnalyzing TV library: {library_name}")
+            with results_lock:
+                if existing_trailers:
+                    results['seasons_with_trailers'] += 1
+                else:
+                    results['seasons_without_trailers'] += 1
             
-            # Get all shows in the library
-            shows = section.all()
-            results['shows_analyzed'] += len(shows)
+            if existing_trailers:
+                log.debug(f"{season_title} has {len(existing_trailers)} trailer(s)")
+                continue
             
-            for show in shows:
-                print(f"  Checking show: {show.title}")
-                log.info(f"Checking show: {show.title}")
-                
-                # Find available trailers for this show
-                available_trailers = find_show_trailers(show) if cfg['DOWNLOAD_TRAILERS'] else []
-                
-                # Group episodes by season
-                seasons = defaultdict(list)
-                for episode in show.episodes():
-                    seasons[episode.parentIndex].append(episode)
-                
-                for season_number, episodes in seasons.items():
-                    if not episodes:
-                        continue
-                    
-                    results['seasons_analyzed'] += 1
-                    season_title = f"{show.title} - Season {season_number:02d}"
-                    
-                    # Get the season directory (from first episode)
-                    season_directory = get_season_directory_from_episodes(episodes)
-                    
-                    if not season_directory:
-                        log.warning(f"No directory found for season: {season_title}")
-                        continue
-                    
-                    # Check if season already has trailers
-                    existing_trailers = check_for_season_trailers_in_directory(season_directory, season_number)
-                    
-                    if existing_trailers:
-                        results['seasons_with_trailers'] += 1
-                        log.debug(f"Season has {len(existing_trailers)} trailer(s): {season_title}")
-                    else:
-                        results['seasons_without_trailers'] += 1
-                        season_info = {
-                            'show': show.title,
-                            'season': season_number,
-                            'season_title': season_title,
-                            'episode_count': len(episodes),
-                            'season_directory': season_directory
-                        }
-                        
-                        # Try to download trailer if enabled
-                        if cfg['DOWNLOAD_TRAILERS'] and available_trailers:
-                            # Set up VPN before first download (if not already connected)
-                            if not vpn_connected and cfg.get('VPN', {}).get('enabled', False):
-                                print("\n🔐 Setting up VPN connection for downloads...")
-                                vpn_connected = connect_to_vpn()
-                                results['vpn_used'] = vpn_connected
-                                
-                                if not vpn_connected:
-                                    print("⚠️ VPN connection failed - continuing without VPN")
-                                    print("   (Downloads may fail due to geo-blocking)")
-                                else:
-                                    # Test current location
-                                    try:
-                                        response = requests.get('https://ipinfo.io/json', timeout=5)
-                                        if response.status_code == 200:
-                                            location_info = response.json()
-                                            country = location_info.get('country', 'Unknown')
-                                            city = location_info.get('city', 'Unknown')
-                                            print(f"    🌍 Connected via: {city}, {country}")
-                                    except:
-                                        pass
-                            
-                            downloaded = attempt_season_trailer_download(season_info, available_trailers)
-                            if downloaded:
-                                results['trailers_downloaded'] += 1
-                                results['seasons_with_trailers'] += 1
-                                results['seasons_without_trailers'] -= 1
-                                log.info(f"Successfully downloaded trailer for: {season_title}")
-                            else:
-                                results['download_failures'] += 1
-                                results['missing_trailers'].append(season_info)
-                                log.info(f"Failed to download trailer for: {season_title}")
-                        else:
-                            results['missing_trailers'].append(season_info)
-                            log.info(f"Missing trailer for: {season_title}")
-        
-        except Exception as e:
-            log.exception(f"Error analyzing library {library_name}")
-            print(f"Error analyzing library {library_name}: {e}")
+            key = (season_info['season'], season_info.get('episode'))
+            if linking and key in existing_by_key:
+                links.append((season_info, existing_by_key[key]))
+                continue
+            
+            if not downloading:
+                with results_lock:
+                    results['missing_trailers'].extend(missing_records([season_info]))
+                log.info(f"Missing trailer for: {season_title}")
+                continue
+            
+            if key in jobs:
+                jobs[key]['mirrors'].append(season_info)
+                continue
+            
+            # Episodes are only loaded for targets that will actually get a download
+            season_info['video_height'] = get_target_video_height(load_episodes)
+            jobs[key] = {'season_info': season_info, 'available_trailers': available_trailers, 'mirrors': []}
+    
+    for season_info, source_path in links:
+        link_existing_trailer(season_info, source_path, results, results_lock)
+    
+    # Queue a download per season, the worker updates the results
+    for job in jobs.values():
+        if plan_only:
+            entry = build_plan_entry(job['season_info'], available_trailers, job['mirrors'])
+            with results_lock:
+                results['plan'].append(entry)
+                results['missing_trailers'].extend(missing_records(job_targets(job)))
+        else:
+            job_queue.put(job)
+
+
+# season_info keys kept for seasons that end up in the report
+MISSING_TRAILER_FIELDS = ('granularity', 'show', 'show_key', 'library', 'season', 'episode', 'season_title',
+                          'episode_count', 'season_directory', 'episode_file')
+
+
+def missing_records(targets):
+    """Trim season_info dicts to what the report needs before they stay in results"""
+    return [{key: target[key] for key in MISSING_TRAILER_FIELDS if key in target} for target in targets]
+
+
+def existing_trailer_link_path(season_info, source_path):
+    """Where another library's copy of a target gets an existing trailer, keeping its name and layout"""
+    ext = os.path.splitext(source_path)[1].lstrip('.')
+    if season_info.get('granularity') == GRANULARITY_EPISODE:
+        # Inline episode trailers are named after that library's episode file
+        return get_episode_trailer_target_path(season_info).replace('%(ext)s', ext)
+    if os.path.basename(os.path.dirname(source_path)) == cfg.subdirectory_name:
+        return os.path.join(season_info['season_directory'], cfg.subdirectory_name, os.path.basename(source_path))
+    return os.path.join(season_info['season_directory'], os.path.basename(source_path))
+
+
+def link_existing_trailer(season_info, source_path, results, results_lock):
+    """Link a trailer another library copy already has into this target (counted as linked)"""
+    target_path = existing_trailer_link_path(season_info, source_path)
+    try:
+        link_or_copy(source_path, output_path(target_path))
+    except OSError as e:
+        log.error(f"Could not link existing trailer {source_path} to {target_path}: {e}")
+        with results_lock:
+            results['missing_trailers'].extend(missing_records([season_info]))
+        return False
+    
+    state_store.record_season_trailer(season_info['show_key'], season_info['season'], target_path,
+                                      size=existing_trailer_size(source_path))
+    with results_lock:
+        results['trailers_linked'] += 1
+        results['seasons_with_trailers'] += 1
+        results['seasons_without_trailers'] -= 1
+    log.info(f"Linked existing trailer into {season_info['library']}: {target_path}")
+    print(f"    🔗 Linked existing trailer into {season_info['library']}: {target_path}")
+    return True
+
+
+def job_targets(job):
+    """All targets a download job serves: its own season and the mirrored copies"""
+    return [job['season_info']] + job.get('mirrors', [])
+
+
+############################################################
+# PLANNING
+############################################################
+
+PLAN_VERSION = 1
+
+
+def build_plan_entry(season_info, available_trailers, mirrors=()):
+    """Resolve everything a download needs (trailer, target path, format, size) without side effects"""
+    trailer = choose_best_trailer(available_trailers)
+    target_path = get_trailer_target_path(season_info, trailer.get('title', 'Trailer'))
+    format_selector, estimated_bytes = plan_trailer_format(trailer['youtube_video_id'], season_info)
+    
+    entry = dict(season_info)
+    entry.update({
+        'trailer': {
+            'youtube_video_id': trailer['youtube_video_id'],
+            'title': trailer.get('title', 'Trailer'),
+            'categories': trailer.get('categories', [])
+        },
+        'target_path': target_path,
+        'planned_format': format_selector,
+        'estimated_bytes': estimated_bytes,
+        # Same season in other libraries, linked to the downloaded file
+        'mirrors': [dict(mirror, target_path=get_trailer_target_path(mirror, trailer.get('title', 'Trailer')))
+                    for mirror in mirrors]
+    })
+    return entry
+
+
+def write_plan(results, plan_path, filesystem=False, stream=None):
+    """Write the download plan as JSON (to stream, default stdout, for '-') with total size/time estimates"""
+    entries = results['plan']
+    known_sizes = [entry['estimated_bytes'] for entry in entries if entry['estimated_bytes']]
+    # Seasons without a size estimate are assumed to be as large as the average known one
+    average_size = sum(known_sizes) / len(known_sizes) if known_sizes else 0
+    total_bytes = int(sum(entry['estimated_bytes'] or average_size for entry in entries))
+    
+    schedule_cfg = cfg['DOWNLOAD_SCHEDULE']
+    throughput_mbit = schedule_cfg['max_rate_mbit'] or schedule_cfg['assumed_throughput_mbit']
+    estimated_seconds = int(total_bytes / (throughput_mbit * 125000)) if throughput_mbit else None
+    
+    plan = {
+        'version': PLAN_VERSION,
+        'generated': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'libraries': scanned_library_names(filesystem),
+        'summary': {
+            'shows_analyzed': results['shows_analyzed'],
+            'seasons_analyzed': results['seasons_analyzed'],
+            'seasons_with_trailers': results['seasons_with_trailers'],
+            'downloads': len(entries),
+            'estimated_bytes': total_bytes,
+            'estimated_seconds': estimated_seconds,
+            'assumed_throughput_mbit': throughput_mbit
+        },
+        'downloads': entries
+    }
     
-    # Disconnect VPN if we connected it
-    if vpn_connected:
-        print(f"\n🔓 Cleaning up VPN connection...")
-        disconnect_vpn()
+    if filesystem:
+        plan['filesystem_roots'] = {library: cfg['FILESYSTEM_SCAN']['roots'][library] for library in plan['libraries']}
     
-    return results
+    if plan_path == '-':
+        stream = stream or sys.stdout
+        stream.write(json.dumps(plan, indent=2) + '\n')
+        stream.flush()
+        return plan
+    
+    with open(plan_path, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, indent=2)
+    
+    duration = f"~{estimated_seconds / 3600:.1f} h at {throughput_mbit} Mbit/s" if estimated_seconds is not None else "unknown"
+    print(f"\n📋 Plan saved to: {plan_path}")
+    print(f"   Downloads: {len(entries)}")
+    print(f"   Estimated size: {format_bytes(total_bytes)}")
+    print(f"   Estimated time: {duration}")
+    return plan
 
 
-def attempt_season_trailer_download(season_info, available_trailers):
-    """Attempt to download a suitable trailer for a season"""
-    if not available_trailers:
-        return False
+def execute_plan(plan_path):
+    """Download everything in a plan file, skipping the scan and resolve phases"""
+    with open(plan_path, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    
+    if plan.get('version') != PLAN_VERSION:
+        print(f"Unsupported plan version: {plan.get('version')}")
+        exit(1)
     
-    # Find the best trailer (prefer recent, shorter trailers)
-    best_trailer = None
+    entries = plan['downloads']
+    results = new_results()
+    results_lock = threading.Lock()
+    run_status.attach_results(results, results_lock)
+    target_count = sum(1 + len(entry.get('mirrors', [])) for entry in entries)
+    results['shows_analyzed'] = len({entry['show_key'] for entry in entries})
+    results['seasons_analyzed'] = target_count
+    results['seasons_without_trailers'] = target_count
+    
+    print(f"Executing plan with {len(entries)} download(s) from: {plan_path}")
+    job_queue = queue.Queue()
+    for entry in entries:
+        season_info = {key: value for key, value in entry.items()
+                       if key not in ('trailer', 'target_path', 'estimated_bytes', 'mirrors')}
+        mirrors = [{key: value for key, value in mirror.items() if key != 'target_path'}
+                   for mirror in entry.get('mirrors', [])]
+        job_queue.put({'season_info': season_info, 'available_trailers': [entry['trailer']], 'mirrors': mirrors})
+    job_queue.put(None)
+    
+    download_worker(job_queue, results, results_lock)
+    results['concurrency'] = concurrency_metrics()
+    return results
+
+
+def choose_best_trailer(available_trailers):
+    """Find the best trailer (prefer recent, shorter trailers)"""
     for trailer in available_trailers:
         if 'youtube_video_id' not in trailer:
             continue
         
         # Prefer trailers with "Trailer" in categories
         if 'Trailer' in trailer.get('categories', []):
-            best_trailer = trailer
-            break
+            return trailer
+    
+    return available_trailers[0]  # Use first available
+
+
+def attempt_season_trailer_download(season_info, available_trailers, limit_rate=None, post_processor=None,
+                                    on_rejected=None, on_published=None):
+    """Attempt to download a suitable trailer for a season, returns a DOWNLOAD_* outcome"""
+    if not available_trailers:
+        return DOWNLOAD_FAILED
     
-    if not best_trailer:
-        best_trailer = available_trailers[0]  # Use first available
+    best_trailer = choose_best_trailer(available_trailers)
     
-    # Download the trailer to the season directory
-    season_directory = season_info['season_directory']
-    target_path = get_season_trailer_target_path(season_info, best_trailer.get('title', 'Trailer'), season_directory)
+    # Download the trailer to the show, season or episode directory
+    target_path = get_trailer_target_path(season_info, best_trailer.get('title', 'Trailer'))
     
-    # Check if file already exists
+    # Check if file already exists. Only complete video files count; fragments left
+    # in the library by older versions (which downloaded in place) are removed
     existing_files = []
+    target_prefix = os.path.basename(target_path).replace('.%(ext)s', '')
     try:
-        target_dir = os.path.dirname(target_path)
+        target_dir = output_path(os.path.dirname(target_path))
         if os.path.exists(target_dir):
             for f in os.listdir(target_dir):
-                if f.startswith(os.path.basename(target_path).replace('.%(ext)s', '')):
+                if not f.startswith(target_prefix):
+                    continue
+                if is_partial_download(f):
+                    log.info(f"Removing stale partial download: {os.path.join(target_dir, f)}")
+                    os.remove(os.path.join(target_dir, f))
+                elif Path(f).suffix.lower() in cfg.video_extensions:
                     existing_files.append(f)
     except:
         pass
     
     if existing_files and not cfg['OVERWRITE_EXISTING']:
         log.info(f"Season trailer already exists, skipping: {existing_files[0]}")
-        return True
+        if on_published:
+            # Still recorded and linked into the show's other copies, like a fresh download
+            existing_path = os.path.join(target_dir, existing_files[0])
+            try:
+                size = os.path.getsize(existing_path)
+            except OSError:
+                size = 0
+            on_published({'file': existing_path, 'size': size})
+        return DOWNLOAD_OK
     
     success = download_trailer(
         best_trailer['youtube_video_id'], 
         target_path, 
-        best_trailer.get('title', 'Trailer')
+        best_trailer.get('title', 'Trailer'),
+        limit_rate=limit_rate,
+        format_selector=select_trailer_format(best_trailer['youtube_video_id'], season_info),
+        post_processor=post_processor,
+        on_rejected=on_rejected,
+        on_published=on_published
     )
     
     return success
@@ -892,10 +2059,22 @@ def generate_report(results):
     if cfg['DOWNLOAD_TRAILERS']:
         report_lines.append(f"  Trailers downloaded: {results['trailers_downloaded']}")
         report_lines.append(f"  Download failures: {results['download_failures']}")
-        report_lines.append(f"  API requests made: {api_request_count}")
+        if results.get('verification_failures'):
+            report_lines.append(f"  Failed verification (quarantined): {results['verification_failures']}")
+        if results.get('trailers_linked'):
+            report_lines.append(f"  Trailers linked into other libraries: {results['trailers_linked']}")
+        report_lines.append(f"  API requests made: {results.get('api_requests', api_request_count)}")
         if results.get('vpn_used', False):
             report_lines.append(f"  VPN used: ✅ Private Internet Access")
     
+    if results.get('shows_failed'):
+        report_lines.append(f"  Shows skipped after errors: {results['shows_failed']} (see log)")
+    for name, metrics in results.get('concurrency', {}).items():
+        if metrics['completed']:
+            report_lines.append(f"  Concurrency {name}: limit {metrics['limit']} ({metrics['min_limit']}-{metrics['max_limit']}), "
+                                f"{metrics['completed']} calls, {metrics['errors']} errors, "
+                                f"{metrics['increases']} increases, {metrics['decreases']} decreases")
+    
     if results['seasons_analyzed'] > 0:
         coverage_percentage = (results['seasons_with_trailers'] / results['seasons_analyzed']) * 100
         report_lines.append(f"  Season trailer coverage: {coverage_percentage:.1f}%")
@@ -909,6 +2088,15 @@ def generate_report(results):
         
         if cfg['REPORT_FORMAT'] == 'detailed':
             for item in results['missing_trailers']:
+                granularity = item.get('granularity', GRANULARITY_SEASON)
+                if granularity != GRANULARITY_SEASON:
+                    report_lines.append(f"{granularity.capitalize()}: {item['season_title']}")
+                    report_lines.append(f"  Directory: {item['season_directory']}")
+                    if item['season_directory']:
+                        report_lines.append(f"  Expected trailer location:")
+                        report_lines.append(f"    {get_trailer_target_path(item, 'Trailer').replace('%(ext)s', '[ext]')}")
+                    report_lines.append("")
+                    continue
                 report_lines.append(f"Show: {item['show']}")
                 report_lines.append(f"  Season {item['season']:02d} ({item['episode_count']} episodes)")
                 report_lines.append(f"  Season directory:")
@@ -946,12 +2134,247 @@ def generate_report(results):
     return report_lines
 
 
+############################################################
+# SHARDING
+############################################################
+
+def parse_shard(value):
+    """Parse an 'i/N' shard spec (0 <= i < N)"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', expected i/N (e.g. 0/3)")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', i must be between 0 and N-1")
+    return index, count
+
+
+def in_shard(show_key, shard):
+    """Deterministically assign a show to a shard by hashing its key (stable across hosts)"""
+    index, count = shard
+    return zlib.crc32(str(show_key).encode('utf-8')) % count == index
+
+
+def write_results_json(results, path, shard=None):
+    """Save run results so per-shard runs can be merged later"""
+    data = {key: value for key, value in results.items() if key != 'plan'}
+    data['api_requests'] = results.get('api_requests', api_request_count)
+    data['shard'] = f"{shard[0]}/{shard[1]}" if shard else None
+    data['generated'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    print(f"Results saved to: {path}")
+
+
+def run_merge(args):
+    """Combine per-shard results into one report and per-shard state stores into the local index"""
+    merged = new_results()
+    merged['api_requests'] = 0
+    shards = []
+    
+    for results_path in args.results:
+        with open(results_path, 'r', encoding='utf-8') as f:
+            shard_results = json.load(f)
+        shards.append(shard_results.get('shard') or results_path)
+        for key in ('shows_analyzed', 'seasons_analyzed', 'seasons_with_trailers', 'seasons_without_trailers',
+                    'trailers_downloaded', 'download_failures', 'verification_failures', 'trailers_linked',
+                    'shows_failed', 'api_requests'):
+            merged[key] += shard_results.get(key, 0)
+        merged['missing_trailers'].extend(shard_results.get('missing_trailers', []))
+        merged['vpn_used'] = merged['vpn_used'] or shard_results.get('vpn_used', False)
+    
+    for state_path in args.state or []:
+        state_store.merge_from(state_path)
+        print(f"Merged state store: {state_path}")
+    
+    merged['missing_trailers'].sort(key=lambda item: (item['show'].lower(), item['season']))
+    print(f"Merged results from {len(shards)} shard(s): {', '.join(str(shard) for shard in shards)}")
+    generate_report(merged)
+    return 0
+
+
+############################################################
+# COVERAGE INDEX QUERIES
+############################################################
+
+def format_bytes(num_bytes):
+    """Human readable byte count"""
+    size = float(num_bytes or 0)
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if size < 1024 or unit == 'TB':
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def run_stats(args):
+    """Print coverage per library from the index (no Plex or KinoCheck requests)"""
+    rows = state_store.coverage_stats(library=args.library)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    
+    if not rows:
+        print("Coverage index is empty - run a scan first")
+        return 1
+    
+    print(f"{'Library':<25} {'Shows':>7} {'Seasons':>8} {'Trailers':>9} {'Coverage':>9} {'Size':>10}")
+    print("-" * 72)
+    for row in rows:
+        print(f"{row['library']:<25} {row['shows']:>7} {row['seasons']:>8} {row['with_trailers']:>9} "
+              f"{row['coverage_percent']:>8.1f}% {format_bytes(row['trailer_bytes']):>10}")
+    return 0
+
+
+def run_query(args):
+    """Print seasons from the index, filtered by library/show/missing (no Plex or KinoCheck requests)"""
+    rows = state_store.query_seasons(library=args.library, show=args.show, missing_only=args.missing,
+                                     limit=args.limit)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    
+    for row in rows:
+        status = f"✅ {row['trailer_count']} trailer(s), {format_bytes(row['trailer_bytes'])}" \
+            if row['trailer_count'] else "❌ missing"
+        verified = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['last_verified'])) \
+            if row['last_verified'] else 'never'
+        label = "Show" if row['season'] == SHOW_LEVEL_SEASON else f"Season {row['season']:02d}"
+        print(f"{row['show']} - {label} [{row['library']}]: {status} (verified: {verified})")
+        if args.verbose:
+            print(f"    {row['directory']}")
+            for trailer_file in row['trailer_files']:
+                print(f"      {trailer_file}")
+    print(f"\n{len(rows)} season(s)")
+    return 0
+
+
+# Stage names passed to run_stage(), for --profile-stage
+PROFILE_STAGES = ('connect', 'list_libraries', 'group_shows', 'analyze_shows', 'drain_downloads', 'execute_plan',
+                  'report')
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Find and download missing season trailers for Plex TV libraries")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    run_parser = subparsers.add_parser('run', help="Scan libraries and download missing trailers (default)")
+    for target in (parser, run_parser):
+        mode = target.add_mutually_exclusive_group()
+        mode.add_argument('--plan', metavar='PLAN_JSON',
+                          help="Only compute the download plan and write it as JSON ('-' for stdout)")
+        mode.add_argument('--execute', metavar='PLAN_JSON',
+                          help="Download everything in a plan file without scanning")
+        target.add_argument('--shard', type=parse_shard, metavar='I/N',
+                            help="Only process shard I of N (shows partitioned by external ID hash)")
+        target.add_argument('--results-json', metavar='PATH',
+                            help="Also save the run results as JSON (input for the merge command)")
+        target.add_argument('--filesystem', action='store_true',
+                            help="Find shows by walking FILESYSTEM_SCAN.roots instead of asking Plex")
+        target.add_argument('--set', action='append', metavar='KEY=VALUE', dest='overrides',
+                            help="Override a config option for this run, e.g. --set DOWNLOAD_SCHEDULE.max_concurrent_downloads=4 "
+                                 "(values are JSON; repeatable)")
+        cassette = target.add_mutually_exclusive_group()
+        cassette.add_argument('--record', metavar='CASSETTE',
+                              help="Record all Plex/API requests and yt-dlp/ffmpeg runs into a cassette file")
+        cassette.add_argument('--replay', metavar='CASSETTE',
+                              help="Serve requests and yt-dlp/ffmpeg runs from a recorded cassette (offline)")
+        target.add_argument('--replay-latency-scale', type=float, default=1.0, metavar='FACTOR',
+                            help="Multiply recorded latencies during --replay (0 = no delays, default 1)")
+        target.add_argument('--status-port', type=int, metavar='PORT',
+                            help="Serve live progress on http://STATUS_SERVER.host:PORT/status and /metrics")
+        target.add_argument('--profile', metavar='PREFIX',
+                            help="Profile the run: writes PREFIX.pstats (cProfile) and PREFIX.collapsed (flamegraph stacks)")
+        target.add_argument('--profile-stage', metavar='STAGE', choices=PROFILE_STAGES,
+                            help=f"Only CPU-profile one stage ({', '.join(PROFILE_STAGES)})")
+        target.add_argument('--profile-memory', action='store_true',
+                            help="With --profile, also write tracemalloc top allocations per stage to PREFIX.memory.txt")
+    
+    stats_parser = subparsers.add_parser('stats', help="Show trailer coverage per library from the coverage index")
+    stats_parser.add_argument('--library', help="Only this library")
+    stats_parser.add_argument('--json', action='store_true', help="Machine-readable output")
+    
+    merge_parser = subparsers.add_parser('merge', help="Combine per-shard results and state stores")
+    merge_parser.add_argument('results', nargs='+', help="Results JSON files written with --results-json")
+    merge_parser.add_argument('--state', action='append', metavar='DB',
+                              help="Shard state store to merge into the local coverage index (repeatable)")
+    
+    query_parser = subparsers.add_parser('query', help="List seasons from the coverage index")
+    query_parser.add_argument('--library', help="Only this library")
+    query_parser.add_argument('--show', help="Show title contains this text")
+    query_parser.add_argument('--missing', action='store_true', help="Only seasons without trailers")
+    query_parser.add_argument('--limit', type=int, help="Maximum number of seasons")
+    query_parser.add_argument('--verbose', '-v', action='store_true', help="Include directories and trailer files")
+    query_parser.add_argument('--json', action='store_true', help="Machine-readable output")
+    
+    return parser.parse_args()
+
+
 ############################################################
 # MAIN
 ############################################################
 
 if __name__ == "__main__":
-    print(r"""
+    args = parse_arguments()
+    
+    try:
+        cfg.apply_overrides(getattr(args, 'overrides', None))
+    except ConfigError as e:
+        print(e)
+        exit(2)
+    
+    # Index queries answer from the local state store without contacting Plex
+    if args.command == 'stats':
+        exit(run_stats(args))
+    if args.command == 'query':
+        exit(run_query(args))
+    if args.command == 'merge':
+        exit(run_merge(args))
+    
+    # With '--plan -' stdout carries nothing but the plan JSON, progress goes to stderr
+    plan_stream = sys.stdout
+    if args.plan == '-':
+        sys.stdout = sys.stderr
+    
+    if args.record or args.replay:
+        cassette = Cassette(args.record or args.replay, 'record' if args.record else 'replay',
+                            latency_scale=args.replay_latency_scale).install()
+        atexit.register(cassette.close)
+    recording_state = None
+    if args.record:
+        # KinoCheck/TMDB responses, video probes and season directories cached in STATE_DB would
+        # never reach the cassette; record against an empty store and merge it back afterwards
+        recording_state = tempfile.mkdtemp(prefix='cassette-record-')
+    if args.replay:
+        # Replayed downloads land in the cassette's sandbox and the run's state in a
+        # throwaway store there, so an offline run never touches the library or STATE_DB
+        cfg['VERIFICATION']['quarantine_dir'] = output_path(os.path.abspath(cfg['VERIFICATION']['quarantine_dir']))
+        # Only yt-dlp/ffmpeg/ssh runs are replayed; the PIA scripts, sudo and git would run for real
+        cfg['VPN']['enabled'] = False
+        print(f"Replay sandbox: {cassette.sandbox}")
+    if cassette:
+        # Record and replay both start from the same empty state
+        state_store.close()
+        state_store = StateStore(os.path.join(recording_state or cassette.sandbox, 'trailer_state.db'))
+        season_resolver.store = state_store
+    
+    try:
+        if args.status_port or cfg['STATUS_SERVER']['enabled']:
+            run_status.add_source('api_quota_remaining', api_quota_remaining)
+            run_status.add_source('concurrency', concurrency_metrics)
+            try:
+                status_server = StatusServer(run_status, cfg['STATUS_SERVER']['host'],
+                                             args.status_port or cfg['STATUS_SERVER']['port']).start()
+            except OSError as e:
+                print(f"Cannot start status server: {e}")
+                exit(1)
+            print(f"Status: http://{status_server.host}:{status_server.port}/status (Prometheus: /metrics)")
+            atexit.register(status_server.stop)
+        
+        if args.profile:
+            profiler = RunProfiler(args.profile, only_stage=args.profile_stage, trace_memory=args.profile_memory).start()
+            atexit.register(profiler.stop)
+        
+        print(r"""
  ____  _              _____           _ _            ____ _               _             
 |  _ \| | _____  __  |_   _| __ __ _ (_) | ___ _ __ / ___| |__   ___  ___| | _____ _ __ 
 | |_) | |/ _ \ \/ /    | || '__/ _` || | |/ _ \ '__| |   | '_ \ / _ \/ __| |/ / _ \ '__|
@@ -963,40 +2386,103 @@ if __name__ == "__main__":
 # Purpose:  Download one trailer per season for Plex TV series             #
 #############################################################################
 """)
-    
-    print("Initializing...")
-    log.info("Starting Plex Trailer Checker with KinoCheck API (Season-based)")
-    
-    if not cfg['CHECK_SERIES']:
-        print("TV Series checking is disabled in configuration.")
-        log.info("TV Series checking is disabled")
-        exit(0)
-    
-    # Check if yt-dlp is available for downloading
-    if cfg['DOWNLOAD_TRAILERS']:
-        try:
-            subprocess.run(['yt-dlp', '--version'], capture_output=True, check=True)
-            print("✓ yt-dlp found - trailer downloading enabled")
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            print("✗ yt-dlp not found - disabling trailer downloads")
-            print("  Install with: pip install yt-dlp")
-            cfg['DOWNLOAD_TRAILERS'] = False
-    
-    # Analyze TV series for missing season trailers
-    print("Scanning Plex libraries for missing season trailers...")
-    if cfg['DOWNLOAD_TRAILERS']:
-        print("Will download one trailer per season using KinoCheck API...")
-    
-    results = analyze_tv_series()
-    
-    # Generate and display report
-    generate_report(results)
-    
-    print("\nSeason trailer check complete!")
-    if cfg['DOWNLOAD_TRAILERS']:
-        print(f"Downloaded {results['trailers_downloaded']} season trailers")
-        print(f"Failed downloads: {results['download_failures']}")
-        if results.get('vpn_used', False):
-            print(f"VPN used: ✅ Private Internet Access")
-    
-    log.info("Season trailer check completed") 
\ No newline at end of file
+        
+        print("Initializing...")
+        log.info("Starting Plex Trailer Checker with KinoCheck API (Season-based)")
+        
+        if not cfg['CHECK_SERIES']:
+            print("TV Series checking is disabled in configuration.")
+            log.info("TV Series checking is disabled")
+            exit(0)
+        
+        # Check if yt-dlp is available for downloading
+        if cfg['DOWNLOAD_TRAILERS']:
+            try:
+                subprocess.run(['yt-dlp', '--version'], capture_output=True, check=True)
+                print("✓ yt-dlp found - trailer downloading enabled")
+            except (subprocess.CalledProcessError, FileNotFoundError):
+                print("✗ yt-dlp not found - disabling trailer downloads")
+                print("  Install with: pip install yt-dlp")
+                cfg['DOWNLOAD_TRAILERS'] = False
+        
+        # Trimming needs ffmpeg for the stream copy
+        if cfg['DOWNLOAD_TRAILERS'] and cfg.get('TRIM_START_SECONDS', 0) > 0:
+            try:
+                subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
+            except (subprocess.CalledProcessError, FileNotFoundError):
+                print("✗ ffmpeg not found - trailers will not be trimmed")
+                cfg['TRIM_START_SECONDS'] = 0
+        
+        # Verification needs ffprobe, without it every file would be quarantined
+        if cfg['DOWNLOAD_TRAILERS'] and cfg['VERIFICATION']['enabled']:
+            try:
+                subprocess.run(['ffprobe', '-version'], capture_output=True, check=True)
+            except (subprocess.CalledProcessError, FileNotFoundError):
+                print("✗ ffprobe not found - downloaded trailers will not be verified")
+                cfg['VERIFICATION']['enabled'] = False
+        
+        if args.execute:
+            # The plan already resolved shows, trailers and paths - no Plex scan needed.
+            # Plex is only contacted to refresh the folders that received trailers
+            if cfg['PLEX_REFRESH']['enabled']:
+                with run_stage('connect'):
+                    connect_plex()
+            with run_stage('execute_plan'):
+                results = execute_plan(args.execute)
+            with run_stage('report'):
+                generate_report(results)
+            if args.results_json:
+                write_results_json(results, args.results_json)
+            print(f"\nDownloaded {results['trailers_downloaded']} season trailers")
+            print(f"Failed downloads: {results['download_failures']}")
+            exit(0)
+        
+        # The filesystem scan reads show IDs from folder names and needs no Plex
+        # connection at all (the Plex refresh after downloads is skipped as well)
+        filesystem = args.filesystem or cfg['FILESYSTEM_SCAN']['enabled']
+        if filesystem:
+            print(f"Scanning media roots for missing season trailers: {cfg['FILESYSTEM_SCAN']['roots']}")
+        else:
+            with run_stage('connect'):
+                connect_plex()
+                if cfg['REMOTE_FILESYSTEM']['enabled']:
+                    open_remote_filesystem()
+                if cfg['TRAILER_DETECTION']['source'] == 'plex_extras':
+                    open_trailer_index()
+            print("Scanning Plex libraries for missing season trailers...")
+        
+        # Analyze TV series for missing season trailers
+        if args.plan:
+            print("Plan mode - nothing will be downloaded")
+            results = analyze_tv_series(plan_only=True, shard=args.shard, filesystem=filesystem)
+            write_plan(results, args.plan, filesystem=filesystem, stream=plan_stream)
+            exit(0)
+        
+        if cfg['DOWNLOAD_TRAILERS']:
+            print("Will download one trailer per season using KinoCheck API...")
+        
+        results = analyze_tv_series(shard=args.shard, filesystem=filesystem)
+        
+        # Generate and display report
+        with run_stage('report'):
+            generate_report(results)
+        if args.results_json:
+            write_results_json(results, args.results_json, shard=args.shard)
+        
+        print("\nSeason trailer check complete!")
+        if cfg['DOWNLOAD_TRAILERS']:
+            print(f"Downloaded {results['trailers_downloaded']} season trailers")
+            print(f"Failed downloads: {results['download_failures']}")
+            if results.get('vpn_used', False):
+                print(f"VPN used: ✅ Private Internet Access")
+        
+        log.info("Season trailer check completed")
+    finally:
+        # Flush the cassette as soon as the run ends; atexit only covers an unexpected exit
+        if cassette:
+            cassette.close()
+        if recording_state:
+            state_store.close()
+            state_store = StateStore(cfg['STATE_DB'])
+            state_store.merge_from(os.path.join(recording_state, 'trailer_state.db'))
+            shutil.rmtree(recording_state, ignore_errors=True)
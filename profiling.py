@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+import cProfile
+import contextlib
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+# Profiler of the current run; None keeps profile_stage() a shared no-op
+_active = None
+_NO_STAGE = contextlib.nullcontext()
+
+
+def profile_stage(name):
+    """Mark a pipeline stage (profiling boundary); costs nothing unless --profile is active"""
+    profiler = _active
+    return profiler.stage(name) if profiler else _NO_STAGE
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+############################################################
+# STACK SAMPLER
+############################################################
+
+class StackSampler:
+    """Sample the stacks of all threads at a fixed interval into collapsed-stack counts.
+
+    Samples are wall-clock (threads waiting on a download or a lock show up
+    too), which is what a flamegraph of a mostly I/O-bound run should show.
+    The output is the "thread;outer;...;inner count" format read by
+    flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+############################################################
+# RUN PROFILER
+############################################################
+
+class RunProfiler:
+    """cProfile + stack sampling for the whole run (or one stage), tracemalloc at stage boundaries.
+
+    Writes <prefix>.pstats (cProfile of every thread, merged), <prefix>.collapsed
+    (sampled stacks for flamegraphs) and, with trace_memory, <prefix>.memory.txt
+    with the top allocation sites that grew since the previous boundary. With
+    only_stage the CPU profile covers just that stage.
+    """
+
+    def __init__(self, prefix, only_stage=None, trace_memory=False, sample_interval=0.005, top=15):
+        self.prefix = prefix
+        self.only_stage = only_stage
+        self.trace_memory = trace_memory
+        self.top = top
+        self.sampler = StackSampler(sample_interval)
+        self._profiles = []
+        self._profiles_lock = threading.Lock()
+        self._cpu_running = False
+        self._stage_seen = False
+        self._last_snapshot = None
+        self._memory_file = None
+        self._stage_times = []
+
+    def start(self):
+        global _active
+        _active = self
+        if self.trace_memory:
+            tracemalloc.start(25)
+            self._memory_file = open(f"{self.prefix}.memory.txt", 'w', encoding='utf-8')
+            self._memory_boundary('start')
+        if not self.only_stage:
+            self._start_cpu()
+        log.info(f"Profiling enabled, writing {self.prefix}.*")
+        return self
+
+    def stop(self):
+        global _active
+        if _active is not self:
+            return
+        _active = None
+        if self._cpu_running:
+            self._stop_cpu()
+        if self.trace_memory:
+            self._memory_boundary('end')
+            tracemalloc.stop()
+            self._memory_file.close()
+        if self._stage_times:
+            print("Stage times: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in self._stage_times))
+        if self.only_stage and not self._stage_seen:
+            log.warning(f"Profiled stage {self.only_stage!r} was never entered, no CPU profile written")
+        else:
+            print(f"Profile written to {self.prefix}.pstats / {self.prefix}.collapsed"
+                  + (f" / {self.prefix}.memory.txt" if self.trace_memory else ""))
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        profile_this = self.only_stage == name and not self._cpu_running
+        if self.trace_memory:
+            self._memory_boundary(f"{name}: start")
+        if profile_this:
+            self._stage_seen = True
+            self._start_cpu()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._stage_times.append((name, time.monotonic() - started))
+            if profile_this:
+                self._stop_cpu()
+            if self.trace_memory:
+                self._memory_boundary(f"{name}: end")
+
+    # CPU
+
+    def _start_cpu(self):
+        profile = cProfile.Profile()
+        self._profiles.append(profile)
+        if sys.version_info < (3, 12):
+            # Threads started from now on get their own profiler (cProfile is per thread
+            # before 3.12; later versions profile every thread from one profiler)
+            threading.setprofile(self._thread_hook)
+        self.sampler.start()
+        self._cpu_running = True
+        profile.enable()
+
+    def _thread_hook(self, frame, event, arg):
+        sys.setprofile(None)
+        profile = cProfile.Profile(self._thread_clock)
+        with self._profiles_lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def _thread_clock(self):
+        # A profiler can only be detached by its own thread: once profiling has stopped,
+        # the next event a worker reports takes its profiler off
+        if not self._cpu_running:
+            sys.setprofile(None)
+        return time.perf_counter()
+
+    def _stop_cpu(self):
+        self._cpu_running = False
+        threading.setprofile(None)
+        with self._profiles_lock:
+            profiles = list(self._profiles)
+        for profile in profiles:
+            profile.disable()
+        self.sampler.stop()
+
+        stats = None
+        for profile in profiles:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            except TypeError:
+                # A thread profiler that never saw a call has no stats
+                continue
+        if stats is not None:
+            stats.dump_stats(f"{self.prefix}.pstats")
+        self.sampler.write(f"{self.prefix}.collapsed")
+
+    # Memory
+
+    def _memory_boundary(self, label):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        self._memory_file.write(f"== {label} (current {current / 1048576:.1f} MiB, peak {peak / 1048576:.1f} MiB) ==\n")
+        if self._last_snapshot is None:
+            top_stats = snapshot.statistics('lineno')[:self.top]
+        else:
+            top_stats = snapshot.compare_to(self._last_snapshot, 'lineno')[:self.top]
+        for stat in top_stats:
+            self._memory_file.write(f"  {stat}\n")
+        self._memory_file.write("\n")
+        self._memory_file.flush()
+        self._last_snapshot = snapshot
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+import logging
+import os
+import posixpath
+import shlex
+import subprocess
+import tempfile
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+
+class LocalFilesystem:
+    """Library filesystem access on the machine the checker runs on"""
+
+    listdir = staticmethod(os.listdir)
+    isdir = staticmethod(os.path.isdir)
+    isfile = staticmethod(os.path.isfile)
+    exists = staticmethod(os.path.exists)
+    getsize = staticmethod(os.path.getsize)
+
+
+############################################################
+# REMOTE INDEX
+############################################################
+
+class RemoteFilesystemIndex:
+    """In-memory snapshot of the remote library tree with the LocalFilesystem interface.
+
+    Built from one remote `find` listing of (kind, path, size) entries, so every
+    later listdir/isdir/isfile/getsize is a dict lookup instead of a round trip.
+    listdir and getsize raise FileNotFoundError for unknown paths, like os.listdir
+    and os.path.getsize.
+    """
+
+    def __init__(self, entries):
+        self._children = {}
+        self._files = {}
+        for kind, path, size in entries:
+            path = posixpath.normpath(path)
+            if kind == 'd':
+                self._children.setdefault(path, set())
+            else:
+                self._files[path] = size
+            parent = posixpath.dirname(path)
+            if parent != path:
+                self._children.setdefault(parent, set()).add(posixpath.basename(path))
+
+    def __len__(self):
+        return len(self._children) + len(self._files)
+
+    def listdir(self, path):
+        path = posixpath.normpath(path)
+        if path not in self._children:
+            raise FileNotFoundError(path)
+        return sorted(self._children[path])
+
+    def isdir(self, path):
+        return posixpath.normpath(path) in self._children
+
+    def isfile(self, path):
+        return posixpath.normpath(path) in self._files
+
+    def exists(self, path):
+        return self.isdir(path) or self.isfile(path)
+
+    def getsize(self, path):
+        try:
+            return self._files[posixpath.normpath(path)]
+        except KeyError:
+            raise FileNotFoundError(path) from None
+
+
+class SSHConnection:
+    """One multiplexed SSH connection (ControlMaster) reused by every remote command"""
+
+    def __init__(self, server, ssh_key=None, persist_seconds=600):
+        self.server = server
+        self.ssh_key = ssh_key
+        self.persist_seconds = persist_seconds
+        self._control_dir = tempfile.mkdtemp(prefix='trailer-ssh-')
+        self.control_path = os.path.join(self._control_dir, 'control')
+
+    def base_command(self):
+        cmd = ['ssh',
+               '-o', 'BatchMode=yes',
+               '-o', 'ControlMaster=auto',
+               '-o', f'ControlPath={self.control_path}',
+               '-o', f'ControlPersist={self.persist_seconds}']
+        if self.ssh_key:
+            cmd.extend(['-i', os.path.expanduser(self.ssh_key)])
+        cmd.append(self.server)
+        return cmd
+
+    def run(self, remote_command, timeout=300):
+        """Run a command on the server, returns stdout bytes (raises on failure)"""
+        result = subprocess.run(self.base_command() + [remote_command], capture_output=True, timeout=timeout)
+        if result.returncode != 0:
+            raise RuntimeError(f"ssh {self.server} failed ({result.returncode}): "
+                               f"{result.stderr.decode('utf-8', 'replace').strip()[:300]}")
+        return result.stdout
+
+    def close(self):
+        subprocess.run(['ssh', '-o', f'ControlPath={self.control_path}', '-O', 'exit', self.server],
+                       capture_output=True, timeout=30)
+        try:
+            os.rmdir(self._control_dir)
+        except OSError:
+            pass
+
+
+def build_remote_index(connection, roots, inline_suffix='-trailer', subdirectory_name='Trailers', max_depth=4,
+                       timeout=300):
+    """List the library tree on the server with a single `find` and index it.
+
+    Directories are listed down to max_depth (root/show/season/Trailers); files
+    only when they can be trailers (inline suffix or inside a trailer folder), so
+    the transfer stays small even for large libraries. File sizes come with the
+    listing, so indexing existing trailers needs no extra stat per file.
+    """
+    file_filter = (f"\\( -iname {shlex.quote('*' + inline_suffix + '.*')} "
+                   f"-o -path {shlex.quote('*/' + subdirectory_name + '/*')} \\)")
+    command = (f"find {' '.join(shlex.quote(root) for root in roots)} -maxdepth {int(max_depth)} "
+               f"\\( -type d -o -type f {file_filter} \\) -printf '%y %s %p\\0' 2>/dev/null; true")
+
+    log.debug(f"Remote index command: {command}")
+    output = connection.run(command, timeout=timeout)
+
+    entries = []
+    for record in output.split(b'\0'):
+        if not record:
+            continue
+        kind, size, path = record.decode('utf-8', 'surrogateescape').split(' ', 2)
+        entries.append((kind, path, int(size)))
+
+    index = RemoteFilesystemIndex(entries)
+    log.info(f"Remote index of {len(roots)} root(s) on {connection.server}: {len(index)} entries")
+    return index
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+import logging
+import os
+import re
+import threading
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+# Season folder names Plex understands: "Season 01", "Season 1", "Staffel 2", "S03", "Specials"
+SEASON_FOLDER_PATTERN = re.compile(r'^(?:season|staffel|series|saison|temporada|s)[ ._-]*(\d{1,4})$', re.IGNORECASE)
+SPECIALS_FOLDER_NAMES = {'specials', 'special', 'season 00', 'extras'}
+
+
+def parse_season_folder(name):
+    """Season number for a season folder name, or None if it isn't one"""
+    if name.lower() in SPECIALS_FOLDER_NAMES:
+        return 0
+    match = SEASON_FOLDER_PATTERN.match(name.strip())
+    return int(match.group(1)) if match else None
+
+
+def episode_directories(episodes):
+    """Distinct directories holding the episodes' files, in first-seen order"""
+    directories = []
+    for episode in episodes:
+        for media in getattr(episode, 'media', None) or []:
+            for part in media.parts:
+                if getattr(part, 'file', None):
+                    directory = os.path.dirname(part.file)
+                    if directory not in directories:
+                        directories.append(directory)
+    return directories
+
+
+############################################################
+# SEASON DIRECTORY RESOLVER
+############################################################
+
+class SeasonDirectoryResolver:
+    """Find season directories from show-level Plex Location data.
+
+    Season folders are found by listing each of the show's locations
+    (show.locations) once, which handles shows spread over several folders.
+    Only seasons that can't be matched to a folder fall back to loading that
+    season's episodes. Results are cached by ratingKey in memory and in the
+    state store, and reused until the show's updatedAt changes.
+    """
+
+    def __init__(self, store=None, listdir=os.listdir, isdir=os.path.isdir, episode_fallback=True):
+        self.store = store
+        self.listdir = listdir
+        self.isdir = isdir
+        self.episode_fallback = episode_fallback
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, show, seasons):
+        """Map season index -> list of directories for the given Plex seasons"""
+        rating_key = str(show.ratingKey)
+        updated_at = _timestamp(getattr(show, 'updatedAt', None))
+
+        with self._lock:
+            cached = self._cache.get(rating_key)
+        if cached is None and self.store is not None:
+            cached = self.store.get_season_directories(rating_key)
+        if cached and cached['updated_at'] == updated_at and all(s.index in cached['seasons'] for s in seasons):
+            return cached['seasons']
+
+        resolved = self._from_show_locations(getattr(show, 'locations', None) or [])
+
+        for season in seasons:
+            if resolved.get(season.index) or not self.episode_fallback:
+                continue
+            log.debug(f"No season folder found for {show.title} season {season.index} - using episode paths")
+            try:
+                resolved[season.index] = episode_directories(season.episodes())
+            except Exception as e:
+                log.error(f"Error loading episodes for {show.title} season {season.index}: {e}")
+
+        entry = {'updated_at': updated_at, 'seasons': resolved}
+        with self._lock:
+            self._cache[rating_key] = entry
+        if self.store is not None:
+            self.store.store_season_directories(rating_key, updated_at, resolved)
+        return resolved
+
+    def _from_show_locations(self, locations):
+        resolved = {}
+        for location in locations:
+            try:
+                names = sorted(self.listdir(location))
+            except OSError as e:
+                log.debug(f"Cannot list show location {location}: {e}")
+                continue
+
+            for name in names:
+                season_index = parse_season_folder(name)
+                if season_index is None:
+                    continue
+                path = os.path.join(location, name)
+                if self.isdir(path):
+                    resolved.setdefault(season_index, []).append(path)
+        return resolved
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if hasattr(value, 'timestamp'):
+        return int(value.timestamp())
+    return int(value)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+
+def resolve_state_path(path):
+    """Relative state paths live next to the script, like config.json and the log"""
+    if os.path.isabs(path):
+        return path
+    return os.path.join(os.path.dirname(os.path.realpath(sys.argv[0])), path)
+
+
+############################################################
+# STATE STORE
+############################################################
+
+class StateStore:
+    """Persistent run state (SQLite), shared by all worker threads"""
+
+    SCHEMA = [
+        '''CREATE TABLE IF NOT EXISTS verifications (
+            path TEXT PRIMARY KEY,
+            video_id TEXT,
+            status TEXT NOT NULL,
+            duration REAL,
+            width INTEGER,
+            height INTEGER,
+            video_codec TEXT,
+            audio_codec TEXT,
+            size INTEGER,
+            error TEXT,
+            quarantine_path TEXT,
+            verified_at REAL NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS shows (
+            rating_key TEXT PRIMARY KEY,
+            library TEXT NOT NULL,
+            title TEXT NOT NULL,
+            imdb_id TEXT,
+            tmdb_id TEXT,
+            tvdb_id TEXT,
+            updated_at REAL NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS seasons (
+            show_key TEXT NOT NULL,
+            season INTEGER NOT NULL,
+            library TEXT NOT NULL,
+            directory TEXT,
+            episode_count INTEGER,
+            trailer_files TEXT NOT NULL DEFAULT '[]',
+            trailer_count INTEGER NOT NULL DEFAULT 0,
+            trailer_bytes INTEGER NOT NULL DEFAULT 0,
+            video_id TEXT,
+            scanned_at REAL,
+            last_verified REAL,
+            PRIMARY KEY (show_key, season)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS api_cache (
+            cache_key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS video_probes (
+            video_id TEXT PRIMARY KEY,
+            info TEXT NOT NULL,
+            probed_at REAL NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS season_directories (
+            show_key TEXT PRIMARY KEY,
+            show_updated_at INTEGER,
+            directories TEXT NOT NULL,
+            resolved_at REAL NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS provider_usage (
+            provider TEXT NOT NULL,
+            day TEXT NOT NULL,
+            requests INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (provider, day)
+        )''',
+        'CREATE INDEX IF NOT EXISTS seasons_library ON seasons (library, trailer_count)',
+        'CREATE INDEX IF NOT EXISTS shows_title ON shows (title COLLATE NOCASE)',
+    ]
+
+    def __init__(self, path):
+        self.path = resolve_state_path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+        log.debug(f"Opened state store: {self.path}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record_verification(self, path, status, video_id=None, probe=None, error=None, quarantine_path=None):
+        """Store the outcome of a media verification ('ok' or 'quarantined')"""
+        probe = probe or {}
+        with self._lock, self._conn:
+            self._conn.execute(
+                '''INSERT OR REPLACE INTO verifications
+                   (path, video_id, status, duration, width, height, video_codec, audio_codec,
+                    size, error, quarantine_path, verified_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (path, video_id, status, probe.get('duration'), probe.get('width'), probe.get('height'),
+                 probe.get('video_codec'), probe.get('audio_codec'), probe.get('size'), error,
+                 quarantine_path, time.time())
+            )
+
+    def get_verification(self, path):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM verifications WHERE path = ?', (path,)).fetchone()
+        return dict(row) if row else None
+
+    # Tables merged from other state stores: (table, key columns, timestamp column).
+    # On conflicts the row with the newer timestamp wins.
+    MERGE_TABLES = [
+        ('shows', ('rating_key',), 'updated_at'),
+        ('seasons', ('show_key', 'season'), 'scanned_at'),
+        ('verifications', ('path',), 'verified_at'),
+        ('api_cache', ('cache_key',), 'fetched_at'),
+        ('video_probes', ('video_id',), 'probed_at'),
+        ('season_directories', ('show_key',), 'resolved_at'),
+    ]
+
+    def merge_from(self, other_path):
+        """Merge another state store (e.g. from a shard host) into this one"""
+        with self._lock:
+            self._conn.execute('ATTACH DATABASE ? AS other', (other_path,))
+            try:
+                with self._conn:
+                    for table, keys, timestamp in self.MERGE_TABLES:
+                        join = ' AND '.join(f'mine.{key} = theirs.{key}' for key in keys)
+                        self._conn.execute(
+                            f'''INSERT OR REPLACE INTO main.{table}
+                                SELECT theirs.* FROM other.{table} AS theirs
+                                LEFT JOIN main.{table} AS mine ON {join}
+                                WHERE mine.{keys[0]} IS NULL
+                                   OR COALESCE(theirs.{timestamp}, 0) > COALESCE(mine.{timestamp}, 0)'''
+                        )
+            finally:
+                self._conn.execute('DETACH DATABASE other')
+        log.info(f"Merged state store: {other_path}")
+
+    ############################################################
+    # CACHES
+    ############################################################
+
+    def get_cached_response(self, cache_key, max_age):
+        """Cached API response younger than max_age seconds, or None"""
+        with self._lock:
+            row = self._conn.execute('SELECT response, fetched_at FROM api_cache WHERE cache_key = ?',
+                                     (cache_key,)).fetchone()
+        if not row or time.time() - row['fetched_at'] > max_age:
+            return None
+        return json.loads(row['response'])
+
+    def store_cached_response(self, cache_key, response):
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO api_cache (cache_key, response, fetched_at) VALUES (?, ?, ?)',
+                               (cache_key, json.dumps(response), time.time()))
+
+    def increment_provider_usage(self, provider, daily_limit):
+        """Count one request against a provider's daily quota; False if the quota is used up"""
+        day = time.strftime('%Y-%m-%d')
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT requests FROM provider_usage WHERE provider = ? AND day = ?',
+                                     (provider, day)).fetchone()
+            used = row['requests'] if row else 0
+            if daily_limit and used >= daily_limit:
+                return False
+            self._conn.execute('INSERT OR REPLACE INTO provider_usage (provider, day, requests) VALUES (?, ?, ?)',
+                               (provider, day, used + 1))
+        return True
+
+    def get_provider_usage(self, provider):
+        with self._lock:
+            row = self._conn.execute('SELECT requests FROM provider_usage WHERE provider = ? AND day = ?',
+                                     (provider, time.strftime('%Y-%m-%d'))).fetchone()
+        return row['requests'] if row else 0
+
+    def get_video_probe(self, video_id, max_age):
+        with self._lock:
+            row = self._conn.execute('SELECT info, probed_at FROM video_probes WHERE video_id = ?',
+                                     (video_id,)).fetchone()
+        if not row or time.time() - row['probed_at'] > max_age:
+            return None
+        return json.loads(row['info'])
+
+    def store_video_probe(self, video_id, info):
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO video_probes (video_id, info, probed_at) VALUES (?, ?, ?)',
+                               (video_id, json.dumps(info), time.time()))
+
+    def get_season_directories(self, show_key):
+        """Cached season directories of a show: {'updated_at', 'seasons': {index: [dirs]}}"""
+        with self._lock:
+            row = self._conn.execute('SELECT show_updated_at, directories FROM season_directories WHERE show_key = ?',
+                                     (str(show_key),)).fetchone()
+        if not row:
+            return None
+        seasons = {int(index): dirs for index, dirs in json.loads(row['directories']).items()}
+        return {'updated_at': row['show_updated_at'], 'seasons': seasons}
+
+    def store_season_directories(self, show_key, show_updated_at, seasons):
+        with self._lock, self._conn:
+            self._conn.execute(
+                '''INSERT OR REPLACE INTO season_directories (show_key, show_updated_at, directories, resolved_at)
+                   VALUES (?, ?, ?, ?)''',
+                (str(show_key), show_updated_at, json.dumps(seasons), time.time())
+            )
+
+    ############################################################
+    # COVERAGE INDEX
+    ############################################################
+
+    def upsert_show(self, rating_key, library, title, ids=None):
+        ids = ids or {}
+        with self._lock, self._conn:
+            self._conn.execute(
+                '''INSERT OR REPLACE INTO shows (rating_key, library, title, imdb_id, tmdb_id, tvdb_id, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                (str(rating_key), library, title, ids.get('imdb'), _str_or_none(ids.get('tmdb')),
+                 _str_or_none(ids.get('tvdb')), time.time())
+            )
+
+    def record_season_scan(self, show_key, season, library, directory, episode_count, trailer_files,
+                           trailer_bytes=0):
+        """Store what a scan found for a season (trailer files already on disk and their total size)"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                '''INSERT INTO seasons (show_key, season, library, directory, episode_count, trailer_files,
+                                      trailer_count, trailer_bytes, scanned_at, last_verified)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (show_key, season) DO UPDATE SET
+                       library = excluded.library,
+                       directory = excluded.directory,
+                       episode_count = excluded.episode_count,
+                       trailer_files = excluded.trailer_files,
+                       trailer_count = excluded.trailer_count,
+                       trailer_bytes = excluded.trailer_bytes,
+                       scanned_at = excluded.scanned_at,
+                       last_verified = CASE WHEN excluded.trailer_count > 0
+                                            THEN excluded.last_verified ELSE seasons.last_verified END''',
+                (str(show_key), season, library, directory, episode_count, json.dumps(list(trailer_files)),
+                 len(trailer_files), trailer_bytes, now, now if trailer_files else None)
+            )
+
+    def record_season_trailer(self, show_key, season, file_path, video_id=None, size=0):
+        """Add a newly downloaded (and verified) trailer of the given size to a season"""
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT trailer_files FROM seasons WHERE show_key = ? AND season = ?',
+                                     (str(show_key), season)).fetchone()
+            if not row:
+                return
+            files = json.loads(row['trailer_files'])
+            added_bytes = 0
+            if file_path not in files:
+                files.append(file_path)
+                added_bytes = size or 0
+            self._conn.execute(
+                '''UPDATE seasons SET trailer_files = ?, trailer_count = ?, trailer_bytes = trailer_bytes + ?,
+                                      video_id = ?, last_verified = ?
+                   WHERE show_key = ? AND season = ?''',
+                (json.dumps(files), len(files), added_bytes, video_id, time.time(), str(show_key), season)
+            )
+
+    def coverage_stats(self, library=None):
+        """Per-library season coverage: seasons, with trailer, percent and trailer bytes"""
+        query = '''SELECT library,
+                          COUNT(DISTINCT show_key) AS shows,
+                          COUNT(*) AS seasons,
+                          SUM(trailer_count > 0) AS with_trailers,
+                          SUM(trailer_bytes) AS trailer_bytes,
+                          MAX(scanned_at) AS last_scan
+                   FROM seasons'''
+        params = ()
+        if library:
+            query += ' WHERE library = ?'
+            params = (library,)
+        query += ' GROUP BY library ORDER BY library'
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(query, params)]
+        for row in rows:
+            row['coverage_percent'] = (row['with_trailers'] / row['seasons'] * 100) if row['seasons'] else 0.0
+        return rows
+
+    def query_seasons(self, library=None, show=None, missing_only=False, limit=None):
+        """Season rows joined with their show, filtered by library, show title (substring) or coverage"""
+        query = '''SELECT shows.title AS show, shows.rating_key, seasons.library, seasons.season,
+                          seasons.directory, seasons.episode_count, seasons.trailer_files,
+                          seasons.trailer_count, seasons.trailer_bytes, seasons.video_id, seasons.last_verified
+                   FROM seasons JOIN shows ON shows.rating_key = seasons.show_key'''
+        conditions, params = [], []
+        if library:
+            conditions.append('seasons.library = ?')
+            params.append(library)
+        if show:
+            conditions.append('shows.title LIKE ?')
+            params.append(f'%{show}%')
+        if missing_only:
+            conditions.append('seasons.trailer_count = 0')
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY shows.title COLLATE NOCASE, seasons.season'
+        if limit:
+            query += f' LIMIT {int(limit)}'
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(query, params)]
+        for row in rows:
+            row['trailer_files'] = json.loads(row['trailer_files'])
+        return rows
+
+
+def _str_or_none(value):
+    return str(value) if value is not None else None
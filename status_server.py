@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+METRIC_PREFIX = 'trailer_checker'
+
+
+############################################################
+# RUN STATUS
+############################################################
+
+class RunStatus:
+    """Thread-safe view of the running job that the status server reports.
+
+    The pipeline reports its stage, scan progress and the downloads yt-dlp is
+    running; queue depths and other values (quotas, concurrency) are read from
+    registered callables when a snapshot is taken, so reporting costs nothing
+    between requests.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.started = clock()
+        self._lock = threading.Lock()
+        self.stage = 'starting'
+        self.stage_started = self.started
+        self._results = None
+        self._results_lock = None
+        self._queues = {}
+        self._sources = {}
+        self._downloads = {}
+        self._download_durations = []
+        self.shows_total = 0
+        self.shows_done = 0
+
+    def set_stage(self, name):
+        with self._lock:
+            self.stage = name
+            self.stage_started = self.clock()
+
+    def attach_results(self, results, results_lock):
+        with self._lock:
+            self._results = results
+            self._results_lock = results_lock
+
+    def add_queue(self, name, depth):
+        """Register a queue by a callable returning its current depth"""
+        with self._lock:
+            self._queues[name] = depth
+
+    def add_source(self, name, values):
+        """Register a callable returning a dict of extra values (e.g. API quotas)"""
+        with self._lock:
+            self._sources[name] = values
+
+    def set_scan_total(self, total):
+        with self._lock:
+            self.shows_total = total
+            self.shows_done = 0
+
+    def show_done(self):
+        with self._lock:
+            self.shows_done += 1
+
+    def start_download(self, output_pattern, title):
+        """A yt-dlp download writing to output_pattern (with %(ext)s) has started"""
+        with self._lock:
+            self._downloads[output_pattern] = {'title': title, 'started': self.clock()}
+
+    def finish_download(self, output_pattern):
+        with self._lock:
+            download = self._downloads.pop(output_pattern, None)
+            if download:
+                self._download_durations.append(self.clock() - download['started'])
+                del self._download_durations[:-50]
+
+    def snapshot(self):
+        now = self.clock()
+        with self._lock:
+            queues = dict(self._queues)
+            sources = dict(self._sources)
+            downloads = dict(self._downloads)
+            durations = list(self._download_durations)
+            stage, stage_started = self.stage, self.stage_started
+            shows_total, shows_done = self.shows_total, self.shows_done
+            results, results_lock = self._results, self._results_lock
+
+        counters = {}
+        if results is not None:
+            with results_lock:
+                counters = {key: value for key, value in results.items()
+                            if isinstance(value, (int, float)) and not isinstance(value, bool)}
+                counters['missing_trailers'] = len(results.get('missing_trailers', []))
+
+        active = []
+        for pattern, download in downloads.items():
+            # yt-dlp output isn't captured live; the growing files in the staging directory are
+            size = 0
+            for path in glob.glob(glob.escape(pattern).replace(glob.escape('%(ext)s'), '*')):
+                try:
+                    size += os.path.getsize(path)
+                except OSError:
+                    continue
+            elapsed = max(now - download['started'], 1e-6)
+            active.append({'title': download['title'], 'seconds': round(elapsed, 1), 'bytes': size,
+                           'bytes_per_second': round(size / elapsed)})
+
+        queue_depths = {}
+        for name, depth in queues.items():
+            try:
+                queue_depths[name] = depth()
+            except Exception:
+                continue
+
+        eta = {}
+        if shows_total and shows_done and stage == 'analyze_shows':
+            eta['scan'] = round((now - stage_started) / shows_done * (shows_total - shows_done))
+        pending_downloads = queue_depths.get('downloads')
+        if pending_downloads and durations:
+            parallel = max(1, len(active))
+            eta['downloads'] = round(sum(durations) / len(durations) * pending_downloads / parallel)
+
+        extra = {}
+        for name, values in sources.items():
+            try:
+                extra[name] = values()
+            except Exception as e:
+                log.debug(f"Status source {name} failed: {e}")
+
+        return {
+            'stage': stage,
+            'stage_seconds': round(now - stage_started, 1),
+            'uptime_seconds': round(now - self.started, 1),
+            'scan': {'shows_total': shows_total, 'shows_done': shows_done},
+            'queues': queue_depths,
+            'active_downloads': active,
+            'eta_seconds': eta,
+            'results': counters,
+            **extra,
+        }
+
+
+# Status of this process, updated by the pipeline whether or not a server is running
+run_status = RunStatus()
+
+
+############################################################
+# PROMETHEUS FORMAT
+############################################################
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_metrics(snapshot):
+    """Render a status snapshot in the Prometheus text exposition format"""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        name = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            if value is None:
+                continue
+            label_text = ','.join(f'{key}="{_label(label)}"' for key, label in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    metric('stage', 'gauge', "Current pipeline stage (1 for the active stage)", [({'stage': snapshot['stage']}, 1)])
+    metric('stage_seconds', 'gauge', "Seconds spent in the current stage", [({}, snapshot['stage_seconds'])])
+    metric('uptime_seconds', 'gauge', "Seconds since the run started", [({}, snapshot['uptime_seconds'])])
+    metric('shows_total', 'gauge', "Shows to scan", [({}, snapshot['scan']['shows_total'])])
+    metric('shows_done', 'gauge', "Shows scanned", [({}, snapshot['scan']['shows_done'])])
+    metric('queue_depth', 'gauge', "Items waiting per queue",
+           [({'queue': name}, depth) for name, depth in snapshot['queues'].items()])
+    metric('active_downloads', 'gauge', "Downloads running now", [({}, len(snapshot['active_downloads']))])
+    metric('download_bytes_per_second', 'gauge', "Combined rate of the running downloads",
+           [({}, sum(download['bytes_per_second'] for download in snapshot['active_downloads']))])
+    metric('eta_seconds', 'gauge', "Estimated seconds until the phase finishes",
+           [({'phase': phase}, seconds) for phase, seconds in snapshot['eta_seconds'].items()])
+    metric('results', 'gauge', "Run result counters",
+           [({'counter': key}, value) for key, value in snapshot['results'].items()])
+    metric('api_quota_remaining', 'gauge', "Lookups left in today's API quota",
+           [({'provider': provider}, remaining)
+            for provider, remaining in snapshot.get('api_quota_remaining', {}).items()])
+    concurrency = snapshot.get('concurrency', {})
+    metric('concurrency_limit', 'gauge', "Current adaptive concurrency limit",
+           [({'limiter': name}, values['limit']) for name, values in concurrency.items()])
+    metric('concurrency_in_flight', 'gauge', "Calls holding a concurrency slot",
+           [({'limiter': name}, values['in_flight']) for name, values in concurrency.items()])
+    metric('concurrency_errors_total', 'counter', "Calls that failed per limiter",
+           [({'limiter': name}, values['errors']) for name, values in concurrency.items()])
+    return '\n'.join(lines) + '\n'
+
+
+############################################################
+# HTTP SERVER
+############################################################
+
+class StatusServer:
+    """Tiny HTTP server: /status (JSON snapshot) and /metrics (Prometheus) on a daemon thread"""
+
+    def __init__(self, status, host='127.0.0.1', port=8765):
+        self.status = status
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        status = self.status
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path in ('/', '/status'):
+                    body = json.dumps(status.snapshot(), indent=2).encode('utf-8')
+                    content_type = 'application/json'
+                elif path == '/metrics':
+                    body = prometheus_metrics(status.snapshot()).encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                log.debug(f"Status server: {format % args}")
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='status-server', daemon=True)
+        self._thread.start()
+        log.info(f"Status server listening on http://{self.host}:{self.port}/status")
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
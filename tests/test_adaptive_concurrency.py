@@ -0,0 +1,137 @@
+import threading
+
+from adaptive_concurrency import AdaptiveLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def call(limiter, clock, seconds=1.0, ok=True, transferred=None):
+    with limiter.slot() as outcome:
+        clock.now += seconds
+        outcome.bytes = transferred
+        if not ok:
+            outcome.failed()
+
+
+def test_limit_grows_by_one_per_window_that_reached_it():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter('test', initial=1, max_limit=4, window=2, clock=clock)
+
+    call(limiter, clock)
+    call(limiter, clock)
+    assert limiter.limit == 2
+    assert limiter.increases == 1
+
+    # One call at a time never reaches a limit of 2, so there is no reason to grow
+    call(limiter, clock)
+    call(limiter, clock)
+    assert limiter.limit == 2
+
+
+def test_limit_never_exceeds_max():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter('test', initial=1, max_limit=2, window=1, clock=clock)
+
+    for _ in range(3):
+        call(limiter, clock)
+        limiter._saturated = True  # pretend every window was full
+    assert limiter.limit == 2
+
+
+def test_errors_halve_the_limit_down_to_the_minimum():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter('test', initial=8, min_limit=3, max_limit=8, window=4, error_threshold=0.2,
+                              clock=clock)
+
+    for ok in (True, False, True, False):
+        call(limiter, clock, ok=ok)
+    assert limiter.limit == 4
+    assert limiter.decreases == 1
+
+    for _ in range(4):
+        call(limiter, clock, ok=False)
+    assert limiter.limit == 3
+    assert limiter.errors == 6
+
+
+def test_exception_in_slot_counts_as_error():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter('test', initial=4, max_limit=4, window=1, error_threshold=0.5, clock=clock)
+
+    try:
+        with limiter.slot():
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert limiter.errors == 1
+    assert limiter.limit == 2
+    assert limiter.in_flight == 0
+
+
+def test_latency_rise_backs_off():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter('test', initial=4, max_limit=4, window=2, latency_tolerance=2.0, clock=clock)
+
+    call(limiter, clock, seconds=1)
+    call(limiter, clock, seconds=1)
+    assert limiter.limit == 4
+
+    call(limiter, clock, seconds=3)
+    call(limiter, clock, seconds=3)
+    assert limiter.limit == 2
+    assert limiter.metrics()['median_latency_seconds'] == 3
+
+
+def test_throughput_drop_backs_off():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter('test', initial=4, max_limit=4, window=2, latency_tolerance=0, throughput_drop=0.5,
+                              clock=clock)
+
+    call(limiter, clock, transferred=1000)
+    call(limiter, clock, transferred=1000)
+    assert limiter.limit == 4
+
+    call(limiter, clock, transferred=100)
+    call(limiter, clock, transferred=100)
+    assert limiter.limit == 2
+    assert limiter.metrics()['median_throughput_bytes'] == 100
+
+
+def test_fixed_limit_does_not_adapt():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter('test', initial=3, min_limit=3, max_limit=3, window=1, clock=clock)
+
+    call(limiter, clock, ok=False)
+    assert not limiter.adaptive
+    assert limiter.limit == 3
+
+
+def test_slots_block_at_the_limit():
+    limiter = AdaptiveLimiter('test', initial=1, max_limit=1)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with limiter.slot():
+            entered.set()
+            release.wait(1)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    entered.wait(1)
+
+    second = threading.Thread(target=lambda: limiter.slot().__enter__())
+    second.start()
+    second.join(0.05)
+    assert second.is_alive()  # waiting for the held slot
+
+    release.set()
+    holder.join()
+    second.join(1)
+    assert not second.is_alive()
@@ -0,0 +1,80 @@
+import os
+import stat
+import subprocess
+
+import pytest
+
+pytest.importorskip("requests")
+
+from cassette import Cassette  # noqa: E402
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path):
+    """An 'ffmpeg' that writes 5 bytes to the path given as its last argument"""
+    path = tmp_path / 'bin' / 'ffmpeg'
+    path.parent.mkdir()
+    path.write_text("#!/bin/sh\nprintf 'trail' > \"$1\"\necho done\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def record(tmp_path, argv):
+    cassette = Cassette(str(tmp_path / 'run.jsonl.gz'), 'record').install()
+    try:
+        result = subprocess.run(argv, capture_output=True, text=True)
+    finally:
+        cassette.close()
+    return result
+
+
+def test_replay_writes_outputs_into_the_sandbox_only(tmp_path, fake_ffmpeg):
+    library = tmp_path / 'library' / 'Show' / 'Season 01'
+    library.mkdir(parents=True)
+    target = str(library / 'trailer.mp4')
+    recorded = record(tmp_path, [fake_ffmpeg, target])
+    os.remove(target)
+
+    sandbox = tmp_path / 'sandbox'
+    cassette = Cassette(str(tmp_path / 'run.jsonl.gz'), 'replay', latency_scale=0, sandbox=str(sandbox)).install()
+    try:
+        # The caller addresses its outputs inside the sandbox; they still match the recorded run
+        result = subprocess.run([fake_ffmpeg, cassette.sandbox_path(target)], capture_output=True, text=True)
+    finally:
+        cassette.close()
+
+    assert result.returncode == recorded.returncode == 0
+    assert result.stdout == recorded.stdout == "done\n"
+    assert cassette.replayed == 1 and cassette.misses == 0
+    assert not os.path.exists(target)
+    replayed_file = sandbox / target.lstrip(os.sep)
+    assert replayed_file.stat().st_size == 5
+
+
+def test_replay_creates_and_removes_a_temporary_sandbox(tmp_path, fake_ffmpeg):
+    target = str(tmp_path / 'out' / 'trailer.mp4')
+    os.makedirs(os.path.dirname(target))
+    record(tmp_path, [fake_ffmpeg, target])
+    os.remove(target)
+
+    original_run = subprocess.run
+    cassette = Cassette(str(tmp_path / 'run.jsonl.gz'), 'replay', latency_scale=0).install()
+    subprocess.run([fake_ffmpeg, target], capture_output=True)
+    sandbox = cassette.sandbox
+    assert os.path.exists(cassette.sandbox_path(target))
+    assert not os.path.exists(target)
+
+    cassette.close()
+    cassette.close()  # closing twice is harmless
+    assert not os.path.exists(sandbox)
+    assert subprocess.run is original_run
+
+
+def test_recording_is_flushed_on_close(tmp_path, fake_ffmpeg):
+    target = str(tmp_path / 'trailer.mp4')
+    record(tmp_path, [fake_ffmpeg, target])
+
+    # Readable right after close(), without waiting for interpreter exit
+    replay = Cassette(str(tmp_path / 'run.jsonl.gz'), 'replay', latency_scale=0)
+    assert replay._entries
+    replay.close()
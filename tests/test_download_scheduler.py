@@ -0,0 +1,77 @@
+import threading
+from datetime import datetime
+
+from download_scheduler import BandwidthScheduler, in_window, mbit_to_bytes
+
+SCHEDULE = {
+    'max_concurrent_downloads': 4,
+    'max_rate_mbit': 40,
+    'quiet_hours': [{'start': '18:00', 'end': '23:00', 'max_rate_mbit': 8},
+                    {'start': '23:00', 'end': '06:00', 'max_rate_mbit': 0}],
+    'full_speed_windows': [{'start': '02:00', 'end': '04:00'}],
+}
+
+
+def at(hour, minute=0):
+    return datetime(2024, 1, 1, hour, minute)
+
+
+def test_budget_is_split_evenly_over_download_slots():
+    scheduler = BandwidthScheduler(SCHEDULE, clock=lambda: at(12))
+
+    assert scheduler.current_rate() == mbit_to_bytes(40)
+    assert scheduler.per_download_rate() == mbit_to_bytes(40) // 4
+    assert scheduler.per_download_rate() * scheduler.max_concurrent <= scheduler.current_rate()
+
+
+def test_quiet_hours_replace_the_budget_and_full_speed_lifts_it():
+    scheduler = BandwidthScheduler(SCHEDULE)
+
+    assert scheduler.per_download_rate(at(19)) == mbit_to_bytes(8) // 4
+    assert scheduler.per_download_rate(at(23, 30)) == 0
+    assert scheduler.per_download_rate(at(3)) is None
+
+
+def test_per_download_rate_has_a_floor():
+    scheduler = BandwidthScheduler({'max_concurrent_downloads': 100, 'max_rate_mbit': 0.01})
+
+    assert scheduler.per_download_rate(at(12)) == 1024
+
+
+def test_windows_wrap_around_midnight():
+    window = {'start': '23:00', 'end': '06:00'}
+
+    assert in_window(window, 23 * 60 + 30)
+    assert in_window(window, 5 * 60)
+    assert not in_window(window, 12 * 60)
+
+
+def test_next_open_time_skips_paused_hours():
+    scheduler = BandwidthScheduler(SCHEDULE)
+
+    assert scheduler.next_open_time(at(23, 30)) == datetime(2024, 1, 2, 2, 0)
+
+
+def test_slots_limit_concurrent_downloads_and_yield_the_share():
+    scheduler = BandwidthScheduler(SCHEDULE, clock=lambda: at(12))
+    entered = threading.Barrier(5, timeout=0.2)
+    rates = []
+
+    def download():
+        with scheduler.slot() as rate:
+            rates.append(rate)
+            try:
+                entered.wait()
+            except threading.BrokenBarrierError:
+                pass
+
+    threads = [threading.Thread(target=download) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Only four slots exist, so the fifth download never joined the other four
+    assert entered.broken
+    assert rates == [mbit_to_bytes(40) // 4] * 5
+    assert scheduler.active_downloads == 0
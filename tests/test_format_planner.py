@@ -0,0 +1,35 @@
+from format_planner import height_capped_format, plan_format
+
+
+def make_info(*formats, duration=100):
+    return {'duration': duration, 'formats': list(formats)}
+
+
+VIDEO_720 = {'format_id': '136', 'height': 720, 'vcodec': 'avc1', 'acodec': 'none', 'filesize': 5_000_000}
+VIDEO_1080 = {'format_id': '137', 'height': 1080, 'vcodec': 'avc1', 'acodec': 'none', 'filesize': 20_000_000}
+AUDIO = {'format_id': '140', 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a', 'abr': 128, 'filesize': 1_000_000}
+
+
+def test_plan_picks_highest_format_under_height_cap_with_fallback():
+    plan = plan_format(make_info(VIDEO_720, VIDEO_1080, AUDIO), max_height=720)
+
+    assert plan['format'] == f"136+140/{height_capped_format(720)}"
+    assert plan['height'] == 720
+    assert plan['estimated_bytes'] == 6_000_000
+
+
+def test_plan_without_height_cap_falls_back_to_best():
+    plan = plan_format(make_info(VIDEO_720, VIDEO_1080, AUDIO))
+
+    assert plan['format'] == "137+140/best"
+
+
+def test_plan_takes_smallest_format_when_nothing_fits_budget():
+    plan = plan_format(make_info(VIDEO_720, VIDEO_1080, AUDIO), max_bytes=1_000)
+
+    assert plan['format'].startswith("136+140/")
+
+
+def test_plan_needs_formats():
+    assert plan_format(None) is None
+    assert plan_format(make_info()) is None
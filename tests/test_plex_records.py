@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+from plex_records import ShowRecord, iter_container, iter_section_shows
+
+
+class StubServer:
+    """fetchItems with PlexAPI 4.13 semantics: unknown keywords filter items by attribute"""
+
+    def __init__(self, containers):
+        self.containers = containers
+        self.calls = []
+
+    def fetchItems(self, key, container_start=None, container_size=None, **kwargs):
+        self.calls.append((key, container_start, container_size))
+        items = self.containers[key]
+        if container_start is not None:
+            items = items[container_start:container_start + container_size]
+        return [item for item in items
+                if all(str(getattr(item, name, None)) == str(value) for name, value in kwargs.items())]
+
+
+def make_show(rating_key):
+    return SimpleNamespace(ratingKey=rating_key, title=f"Show {rating_key}", guid=f"plex://show/{rating_key}",
+                           guids=[SimpleNamespace(id=f"tvdb://{rating_key}")], locations=[f"/tv/{rating_key}"],
+                           updatedAt=None, leafCount=3)
+
+
+def test_iter_container_pages_through_more_items_than_page_size():
+    server = StubServer({'/items': list(range(7))})
+
+    assert list(iter_container(server, '/items', page_size=3)) == list(range(7))
+    assert [(start, size) for _, start, size in server.calls] == [(0, 3), (3, 3), (6, 3)]
+
+
+def test_iter_container_stops_after_exactly_full_last_page():
+    server = StubServer({'/items': list(range(6))})
+
+    assert list(iter_container(server, '/items', page_size=3)) == list(range(6))
+    assert len(server.calls) == 3
+
+
+def test_iter_section_shows_streams_compact_records():
+    key = '/library/sections/2/all?type=2&includeGuids=1'
+    server = StubServer({key: [make_show(i) for i in range(5)]})
+
+    shows = iter_section_shows(server, SimpleNamespace(key=2), page_size=2)
+    first = next(shows)
+    assert len(server.calls) == 1  # only the first page was fetched so far
+
+    records = [first] + list(shows)
+    assert [record.ratingKey for record in records] == [0, 1, 2, 3, 4]
+    assert isinstance(first, ShowRecord)
+    assert first.guids == ('tvdb://0',)
+    assert first.locations == ('/tv/0',)
+    assert not hasattr(first, '__dict__')
+
+
+def test_season_episodes_are_paged():
+    server = StubServer({
+        '/library/metadata/1/children': [SimpleNamespace(ratingKey=10, index=1, leafCount=5)],
+        '/library/metadata/10/children': [SimpleNamespace(index=number) for number in range(1, 6)],
+    })
+    show = ShowRecord(make_show(1), server, page_size=2)
+
+    seasons = show.seasons()
+    assert [season.index for season in seasons] == [1]
+    assert [episode.index for episode in seasons[0].episodes()] == [1, 2, 3, 4, 5]
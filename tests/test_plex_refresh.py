@@ -0,0 +1,59 @@
+import threading
+
+from plex_refresh import RefreshBatcher, coalesce_paths
+
+
+class StubSection:
+    def __init__(self, locations=()):
+        self.locations = list(locations)
+        self.updated = []
+        self.refreshed = threading.Event()
+
+    def update(self, path=None):
+        self.updated.append(path)
+        self.refreshed.set()
+
+
+def make_batcher(section, **kwargs):
+    return RefreshBatcher(lambda library: section, min_interval=0, sleep=lambda seconds: None, **kwargs)
+
+
+def test_pending_refresh_is_flushed_after_the_window_without_further_adds():
+    section = StubSection()
+    batcher = make_batcher(section, batch_window=0.05)
+
+    batcher.add('TV', '/tv/Show/Season 01/Trailers/trailer.mp4')
+    assert section.updated == []
+
+    assert section.refreshed.wait(2)
+    assert section.updated == ['/tv/Show/Season 01']
+    batcher.close()
+    assert section.updated == ['/tv/Show/Season 01']
+
+
+def test_close_flushes_what_is_still_pending():
+    section = StubSection()
+    batcher = make_batcher(section, batch_window=3600)
+
+    batcher.add('TV', '/tv/Show/Season 01/Trailers/a.mp4')
+    batcher.add('TV', '/tv/Show/Season 02/b-trailer.mkv')
+    batcher.close()
+
+    assert sorted(section.updated) == ['/tv/Show/Season 01', '/tv/Show/Season 02']
+    assert batcher.refreshes == 2
+
+
+def test_close_without_additions_is_a_no_op():
+    section = StubSection()
+    batcher = make_batcher(section)
+
+    batcher.close()
+    assert section.updated == []
+
+
+def test_coalesce_paths_merges_siblings_but_not_library_roots():
+    seasons = [f'/tv/Show/Season 0{number}' for number in (1, 2, 3)]
+
+    assert coalesce_paths(seasons, threshold=3) == ['/tv/Show']
+    assert coalesce_paths(['/tv/A', '/tv/B', '/tv/C'], threshold=3, roots=['/tv']) == ['/tv/A', '/tv/B', '/tv/C']
+    assert coalesce_paths(['/tv/Show', '/tv/Show/Season 01']) == ['/tv/Show']
@@ -0,0 +1,42 @@
+import threading
+
+import profiling
+from profiling import RunProfiler
+
+
+def busy(rounds):
+    total = 0
+    for number in range(rounds):
+        total += len(str(number))
+    return total
+
+
+def call_count(profiler):
+    return sum(entry.callcount for profile in profiler._profiles for entry in profile.getstats())
+
+
+def test_stopping_detaches_the_worker_thread_profilers(tmp_path):
+    prefix = str(tmp_path / 'run')
+    profiler = RunProfiler(prefix, sample_interval=0.001).start()
+    go = threading.Event()
+    done = threading.Event()
+
+    def worker():
+        busy(1000)
+        done.set()
+        go.wait(2)
+        busy(1000)  # after the profile was written
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    done.wait(2)
+    profiler.stop()
+    written = call_count(profiler)
+    go.set()
+    thread.join()
+
+    assert threading.getprofile() is None
+    assert profiling._active is None
+    assert call_count(profiler) <= written + 2  # at most the call that notices profiling has stopped
+    assert (tmp_path / 'run.pstats').stat().st_size > 0
+    assert (tmp_path / 'run.collapsed').exists()
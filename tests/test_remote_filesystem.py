@@ -0,0 +1,39 @@
+import pytest
+
+from remote_filesystem import RemoteFilesystemIndex, build_remote_index
+
+
+class FakeConnection:
+    server = 'nas'
+
+    def __init__(self, output):
+        self.output = output
+        self.commands = []
+
+    def run(self, command, timeout=300):
+        self.commands.append(command)
+        return self.output
+
+
+def test_index_is_built_from_one_listing_with_sizes():
+    listing = (b"d 4096 /tv\0d 4096 /tv/Show\0d 4096 /tv/Show/Season 01\0"
+               b"d 4096 /tv/Show/Season 01/Trailers\0f 1234 /tv/Show/Season 01/Trailers/Season 01 trailer.mp4\0")
+    connection = FakeConnection(listing)
+
+    index = build_remote_index(connection, ['/tv'])
+
+    assert len(connection.commands) == 1
+    assert "-printf '%y %s %p\\0'" in connection.commands[0]
+    assert index.listdir('/tv/Show') == ['Season 01']
+    assert index.isfile('/tv/Show/Season 01/Trailers/Season 01 trailer.mp4')
+    assert index.getsize('/tv/Show/Season 01/Trailers/Season 01 trailer.mp4') == 1234
+
+
+def test_unknown_paths_raise_like_the_local_filesystem():
+    index = RemoteFilesystemIndex([('d', '/tv', 4096), ('f', '/tv/a-trailer.mkv', 10)])
+
+    assert index.exists('/tv/')
+    with pytest.raises(FileNotFoundError):
+        index.listdir('/movies')
+    with pytest.raises(FileNotFoundError):
+        index.getsize('/tv/b-trailer.mkv')
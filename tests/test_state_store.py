@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from state_store import StateStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StateStore(str(tmp_path / 'state.db'))
+    yield store
+    store.close()
+
+
+def add_show(store, key, library, title, seasons):
+    """seasons: {season number: [(trailer path, size), ...]}"""
+    store.upsert_show(key, library, title, {'tvdb': int(key)})
+    for season, trailers in seasons.items():
+        store.record_season_scan(key, season, library, f"/{library}/{title}/Season {season:02d}", 10,
+                                 [path for path, _ in trailers], sum(size for _, size in trailers))
+
+
+def test_coverage_stats_per_library(store):
+    add_show(store, '1', 'TV', 'Alpha', {1: [('/TV/Alpha/Season 01/Trailers/a.mp4', 100)], 2: []})
+    add_show(store, '2', 'TV', 'Beta', {1: [('/TV/Beta/Season 01/b-trailer.mkv', 50)]})
+    add_show(store, '3', 'Anime', 'Gamma', {1: []})
+
+    stats = {row['library']: row for row in store.coverage_stats()}
+
+    assert stats['TV']['shows'] == 2
+    assert stats['TV']['seasons'] == 3
+    assert stats['TV']['with_trailers'] == 2
+    assert stats['TV']['trailer_bytes'] == 150
+    assert stats['TV']['coverage_percent'] == pytest.approx(200 / 3)
+    assert stats['Anime']['coverage_percent'] == 0
+    assert [row['library'] for row in store.coverage_stats(library='Anime')] == ['Anime']
+
+
+def test_query_seasons_filters(store):
+    add_show(store, '1', 'TV', 'Alpha', {1: [('/TV/Alpha/Season 01/Trailers/a.mp4', 100)], 2: []})
+    add_show(store, '2', 'TV', 'beta', {1: []})
+
+    missing = store.query_seasons(missing_only=True)
+    assert [(row['show'], row['season']) for row in missing] == [('Alpha', 2), ('beta', 1)]
+
+    alpha = store.query_seasons(show='alp')
+    assert [row['season'] for row in alpha] == [1, 2]
+    assert alpha[0]['trailer_files'] == ['/TV/Alpha/Season 01/Trailers/a.mp4']
+    assert len(store.query_seasons(limit=1)) == 1
+
+
+def test_new_trailer_adds_its_reported_size(store):
+    add_show(store, '1', 'TV', 'Alpha', {1: [('/TV/Alpha/Season 01/Trailers/old.mp4', 100)]})
+
+    store.record_season_trailer('1', 1, '/TV/Alpha/Season 01/Trailers/new.mp4', video_id='abc', size=40)
+    store.record_season_trailer('1', 1, '/TV/Alpha/Season 01/Trailers/new.mp4', video_id='abc', size=40)
+
+    row = store.query_seasons()[0]
+    assert row['trailer_count'] == 2
+    assert row['trailer_bytes'] == 140
+    assert row['video_id'] == 'abc'
+
+
+def test_merge_keeps_the_newer_rows(tmp_path, store):
+    add_show(store, '1', 'TV', 'Alpha', {1: []})
+    add_show(store, '2', 'TV', 'Beta', {1: []})
+
+    time.sleep(0.01)
+    shard = StateStore(str(tmp_path / 'shard.db'))
+    # Newer scan of a season this store knows, plus a show only the shard has seen
+    add_show(shard, '1', 'TV', 'Alpha', {1: [('/TV/Alpha/Season 01/Trailers/a.mp4', 100)]})
+    add_show(shard, '3', 'Anime', 'Gamma', {1: []})
+    add_show(shard, '2', 'TV', 'Beta', {1: []})
+    shard.close()
+    time.sleep(0.01)
+    # Scanned here after the shard: the local row must survive the merge
+    add_show(store, '2', 'TV', 'Beta', {1: [('/TV/Beta/Season 01/b-trailer.mkv', 50)]})
+
+    store.merge_from(str(tmp_path / 'shard.db'))
+
+    rows = {(row['show'], row['season']): row for row in store.query_seasons()}
+    assert set(rows) == {('Alpha', 1), ('Beta', 1), ('Gamma', 1)}
+    assert rows[('Alpha', 1)]['trailer_bytes'] == 100
+    assert rows[('Beta', 1)]['trailer_bytes'] == 50
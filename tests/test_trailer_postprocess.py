@@ -0,0 +1,51 @@
+import os
+
+import trailer_postprocess
+from trailer_postprocess import PostProcessor
+
+GOOD_PROBE = {
+    'format': {'duration': '60'},
+    'streams': [{'codec_type': 'video', 'width': 1280, 'height': 720, 'codec_name': 'h264'},
+                {'codec_type': 'audio', 'codec_name': 'aac'}],
+}
+
+
+def make_file(directory, name):
+    path = os.path.join(directory, name)
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * 10)
+    return path
+
+
+def test_each_file_is_verified_and_published_without_waiting_for_others(tmp_path, monkeypatch):
+    probes = {}
+    monkeypatch.setattr(trailer_postprocess, 'probe_media', lambda path: probes.setdefault(path, GOOD_PROBE))
+    processor = PostProcessor(max_workers=2, verify_cfg={'enabled': True, 'quarantine_dir': str(tmp_path / 'q')})
+    published = []
+
+    staged = make_file(str(tmp_path / 'staging' / 'a'), 'a-trailer.mp4')
+    final = str(tmp_path / 'library' / 'a-trailer.mp4')
+    processor.submit(staged, on_published=published.append, publish_to=final).result()
+
+    # Published as soon as its own work finished, before shutdown
+    assert [item['file'] for item in published] == [final]
+    assert os.path.exists(final)
+    assert list(probes) == [staged]
+    processor.shutdown()
+
+
+def test_bad_file_is_quarantined_and_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(trailer_postprocess, 'probe_media', lambda path: None)
+    processor = PostProcessor(max_workers=1, verify_cfg={'enabled': True, 'quarantine_dir': str(tmp_path / 'q')})
+    rejected = []
+
+    staged = make_file(str(tmp_path / 'staging' / 'b'), 'b-trailer.mp4')
+    final = str(tmp_path / 'library' / 'b-trailer.mp4')
+    processor.submit(staged, on_rejected=rejected.append, publish_to=final).result()
+    processor.shutdown()
+
+    assert len(rejected) == 1
+    assert not os.path.exists(final)
+    assert processor.quarantined == 1
+    assert len(os.listdir(tmp_path / 'q')) == 1
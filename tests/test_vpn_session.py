@@ -0,0 +1,57 @@
+import threading
+
+from vpn_session import VPNSession
+
+
+class FakeTunnel:
+    def __init__(self):
+        self.up = False
+        self.healthy = True
+        self.connects = 0
+        self.connecting = threading.Event()
+        self.release = threading.Event()
+
+    def connect(self):
+        self.connects += 1
+        if self.connects > 1:
+            # A reconnect that is still running when the session stops
+            self.connecting.set()
+            self.release.wait(2)
+        self.up = True
+        return True
+
+    def disconnect(self):
+        self.up = False
+        return True
+
+    def probe(self):
+        return self.up and self.healthy
+
+
+def test_stop_waits_for_a_running_reconnect_before_disconnecting():
+    tunnel = FakeTunnel()
+    session = VPNSession(tunnel.connect, tunnel.disconnect, tunnel.probe, probe_interval=0.01)
+    session.start()
+
+    tunnel.healthy = False
+    session.report_failure()
+    assert tunnel.connecting.wait(2)
+
+    stopper = threading.Thread(target=session.stop)
+    stopper.start()
+    stopper.join(0.05)
+    assert stopper.is_alive()  # holding off the disconnect until the reconnect returns
+
+    tunnel.release.set()
+    stopper.join(2)
+    assert not stopper.is_alive()
+    assert not tunnel.up
+    assert not session.connected
+
+
+def test_failed_connect_does_not_hold_downloads():
+    session = VPNSession(lambda: False, lambda: True, lambda: False)
+
+    assert session.start() is False
+    assert session.wait_until_ready(0)
+    session.stop()
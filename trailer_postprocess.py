@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+import errno
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+
+############################################################
+# TRIMMING
+############################################################
+
+def trim_start(file_path, seconds, timeout=120):
+    """Cut the first N seconds off a video without re-encoding.
+
+    Uses an input-side -ss with stream copy, so ffmpeg starts at the keyframe at
+    or before the cut point and only rewrites the container. The trimmed file
+    replaces the original atomically; on failure the original is left untouched.
+    """
+    root, ext = os.path.splitext(file_path)
+    temp_path = f"{root}.trim{ext}"
+    cmd = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-ss', str(seconds),
+        '-i', file_path,
+        '-map', '0',
+        '-c', 'copy',
+        '-avoid_negative_ts', 'make_zero',
+    ]
+    if ext.lower() in ('.mp4', '.m4v', '.mov'):
+        cmd.extend(['-movflags', '+faststart'])
+    cmd.append(temp_path)
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        if result.returncode == 0 and os.path.exists(temp_path) and os.path.getsize(temp_path) > 0:
+            os.replace(temp_path, file_path)
+            log.debug(f"Trimmed first {seconds}s from: {file_path}")
+            return True
+        log.error(f"ffmpeg trim failed for {file_path}: {result.stderr.strip()[:500]}")
+    except subprocess.TimeoutExpired:
+        log.error(f"ffmpeg trim timed out for: {file_path}")
+    except Exception as e:
+        log.error(f"Error trimming {file_path}: {e}")
+
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    return False
+
+
+############################################################
+# VERIFICATION
+############################################################
+
+def probe_media(file_path, timeout=30):
+    """Run ffprobe with JSON output over a file, returns the parsed output or None"""
+    cmd = ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', file_path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        if result.returncode != 0:
+            log.debug(f"ffprobe failed for {file_path}: {result.stderr.strip()[:300]}")
+            return None
+        return json.loads(result.stdout)
+    except (subprocess.TimeoutExpired, ValueError) as e:
+        log.debug(f"ffprobe failed for {file_path}: {e}")
+        return None
+
+
+def validate_media(file_path, probe, min_duration=0, max_duration=0, require_audio=True):
+    """Check ffprobe output for a complete, playable trailer.
+
+    Returns (ok, error, summary) where summary holds duration/resolution/codecs/size.
+    """
+    summary = {'size': os.path.getsize(file_path) if os.path.exists(file_path) else 0}
+    if not probe or not probe.get('format'):
+        return False, 'container could not be parsed', summary
+
+    streams = probe.get('streams', [])
+    video = next((st for st in streams if st.get('codec_type') == 'video'), None)
+    audio = next((st for st in streams if st.get('codec_type') == 'audio'), None)
+
+    try:
+        duration = float(probe['format'].get('duration') or 0)
+    except ValueError:
+        duration = 0
+    summary.update({
+        'duration': duration,
+        'width': video.get('width') if video else None,
+        'height': video.get('height') if video else None,
+        'video_codec': video.get('codec_name') if video else None,
+        'audio_codec': audio.get('codec_name') if audio else None,
+    })
+
+    if not video or not video.get('width') or not video.get('height'):
+        return False, 'no video stream', summary
+    if require_audio and not audio:
+        return False, 'no audio stream', summary
+    if duration <= 0:
+        return False, 'unknown duration', summary
+    if min_duration and duration < min_duration:
+        return False, f'duration {duration:.1f}s below minimum {min_duration}s', summary
+    if max_duration and duration > max_duration:
+        return False, f'duration {duration:.1f}s above maximum {max_duration}s', summary
+
+    # A truncated download often still has a valid header announcing the full
+    # duration while the video stream stops early
+    try:
+        video_duration = float(video.get('duration') or duration)
+    except ValueError:
+        video_duration = duration
+    if video_duration < duration * 0.9:
+        return False, f'video stream ends at {video_duration:.1f}s of {duration:.1f}s', summary
+
+    return True, None, summary
+
+
+def quarantine_file(file_path, quarantine_dir):
+    """Move a bad file out of the library so the next run retries it"""
+    os.makedirs(quarantine_dir, exist_ok=True)
+    target = os.path.join(quarantine_dir, f"{int(time.time())}_{os.path.basename(file_path)}")
+    shutil.move(file_path, target)
+    return target
+
+
+############################################################
+# PUBLISHING
+############################################################
+
+def publish_file(staged_path, final_path):
+    """Move a finished file from staging into the library atomically.
+
+    Within one filesystem this is a single rename. Across filesystems the file is
+    first copied next to its destination under a hidden temporary name and then
+    renamed, so the library never contains a half-written trailer.
+    """
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    try:
+        os.replace(staged_path, final_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        temp_path = os.path.join(os.path.dirname(final_path), f".{os.path.basename(final_path)}.publishing")
+        try:
+            shutil.copy2(staged_path, temp_path)
+            os.replace(temp_path, final_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        os.remove(staged_path)
+
+    # Drop the per-target staging directory (and any leftovers) once published
+    shutil.rmtree(os.path.dirname(staged_path), ignore_errors=True)
+    log.debug(f"Published trailer: {final_path}")
+
+
+def link_or_copy(source_path, target_path):
+    """Put a second copy of a published trailer into place (hard link, else atomic copy)"""
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    try:
+        os.link(source_path, target_path)
+        return
+    except FileExistsError:
+        raise
+    except OSError:
+        pass
+    temp_path = os.path.join(os.path.dirname(target_path), f".{os.path.basename(target_path)}.publishing")
+    try:
+        shutil.copy2(source_path, temp_path)
+        os.replace(temp_path, target_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+############################################################
+# POST-PROCESSING POOL
+############################################################
+
+class PostProcessor:
+    """Run CPU-bound ffmpeg/ffprobe work on its own bounded pool.
+
+    Network workers hand finished downloads over with submit() and return
+    immediately, so a slow ffmpeg never holds a download slot. Each file is
+    trimmed (if requested) and then verified with ffprobe on the same worker.
+    Verified files are moved to their publish_to path and the item's
+    on_published callback is invoked.
+    Files that fail verification (or publishing) are quarantined and the item's
+    on_rejected callback is invoked so the caller can count a failure.
+    """
+
+    def __init__(self, max_workers=None, verify_cfg=None, state_store=None, max_duration=0):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        self.verify_cfg = verify_cfg or {'enabled': False}
+        self.state_store = state_store
+        self.max_duration = max_duration
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='postprocess')
+        self._lock = threading.Lock()
+        self.trimmed = 0
+        self.trim_failures = 0
+        self.verified = 0
+        self.quarantined = 0
+
+    def submit(self, file_path, trim_seconds=0, video_id=None, on_rejected=None, on_published=None, publish_to=None):
+        item = {'file': file_path, 'video_id': video_id, 'on_rejected': on_rejected, 'on_published': on_published,
+                'publish_to': publish_to}
+        return self._pool.submit(self._process, item, trim_seconds)
+
+    def _process(self, item, trim_seconds):
+        if trim_seconds > 0:
+            self._trim(item['file'], trim_seconds)
+
+        if not self.verify_cfg.get('enabled', False) or self.verify_item(item):
+            self._publish(item)
+        elif item.get('on_rejected'):
+            item['on_rejected'](item)
+
+    def _trim(self, file_path, seconds):
+        trimmed = trim_start(file_path, seconds)
+        with self._lock:
+            if trimmed:
+                self.trimmed += 1
+            else:
+                self.trim_failures += 1
+        if not trimmed:
+            print(f"    ⚠️ Could not trim {os.path.basename(file_path)} - keeping untrimmed trailer")
+        return trimmed
+
+    def _publish(self, item):
+        # Sized while the file is still in local staging, for the coverage index
+        try:
+            item['size'] = os.path.getsize(item['file'])
+        except OSError:
+            item['size'] = 0
+        if item.get('publish_to'):
+            try:
+                publish_file(item['file'], item['publish_to'])
+                item['file'] = item['publish_to']
+            except Exception as e:
+                log.error(f"Could not move {item['file']} into place at {item['publish_to']}: {e}")
+                print(f"    ❌ Could not move trailer into place: {e}")
+                if item.get('on_rejected'):
+                    item['on_rejected'](item)
+                return False
+
+        if item.get('on_published'):
+            item['on_published'](item)
+        return True
+
+    def verify_item(self, item):
+        """Probe a new file, record the result and quarantine it if it is bad"""
+        file_path = item['file']
+        # Record results under the library path, not the scratch copy
+        record_path = item.get('publish_to') or file_path
+        ok, error, summary = validate_media(
+            file_path, probe_media(file_path),
+            min_duration=self.verify_cfg.get('min_duration', 0),
+            max_duration=self.max_duration,
+            require_audio=self.verify_cfg.get('require_audio', True)
+        )
+
+        if ok:
+            with self._lock:
+                self.verified += 1
+            if self.state_store:
+                self.state_store.record_verification(record_path, 'ok', video_id=item.get('video_id'), probe=summary)
+            print(f"    🎬 Verified {os.path.basename(file_path)}: {summary['width']}x{summary['height']}, "
+                  f"{summary['duration']:.0f}s")
+            return True
+
+        quarantine_path = None
+        try:
+            if os.path.exists(file_path):
+                quarantine_path = quarantine_file(file_path, self.verify_cfg['quarantine_dir'])
+        except Exception as e:
+            log.error(f"Could not quarantine {file_path}: {e}")
+
+        with self._lock:
+            self.quarantined += 1
+        if self.state_store:
+            self.state_store.record_verification(record_path, 'quarantined', video_id=item.get('video_id'),
+                                                 probe=summary, error=error, quarantine_path=quarantine_path)
+        log.warning(f"Trailer failed verification ({error}): {file_path}")
+        print(f"    🧪 Verification failed for {os.path.basename(file_path)}: {error} - quarantined for retry")
+        return False
+
+    def shutdown(self):
+        """Wait for queued trimming, verification and publishing to finish"""
+        self._pool.shutdown(wait=True)
+        if self.trimmed or self.trim_failures or self.verified or self.quarantined:
+            log.info(f"Post-processing finished: {self.trimmed} trimmed, {self.trim_failures} trim failure(s), "
+                     f"{self.verified} verified, {self.quarantined} quarantined")
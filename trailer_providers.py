@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+
+def normalize_trailer(youtube_video_id, title, categories=None, source=None, language=None):
+    """Trailer dict in the shape the download code expects (KinoCheck's video fields)"""
+    return {
+        'youtube_video_id': youtube_video_id,
+        'title': title or 'Trailer',
+        'categories': categories or ['Trailer'],
+        'language': language,
+        'source': source,
+    }
+
+
+############################################################
+# PROVIDERS
+############################################################
+
+class TrailerProvider:
+    """A source of trailers for a show, identified by its external IDs.
+
+    Subclasses implement lookup(). find() wraps it with a per-provider cache
+    (misses are cached too, for a shorter time) and a daily lookup quota.
+    """
+
+    name = 'base'
+
+    def __init__(self, store=None, cache_ttl_hours=168, miss_ttl_hours=24, max_requests_per_day=0):
+        self.store = store
+        self.cache_ttl = cache_ttl_hours * 3600
+        self.miss_ttl = miss_ttl_hours * 3600
+        self.max_requests_per_day = max_requests_per_day
+        self._lock = threading.Lock()
+
+    def lookup(self, ids, title):
+        """Return a list of normalized trailers, [] for "no trailers", None on errors"""
+        raise NotImplementedError
+
+    def cache_key(self, ids):
+        return f"provider:{self.name}:" + ','.join(f"{key}={ids[key]}" for key in sorted(ids))
+
+    def find(self, ids, title):
+        cache_key = self.cache_key(ids)
+        if self.store is not None and self.cache_ttl:
+            cached = self.store.get_cached_response(cache_key, self.cache_ttl)
+            if cached is not None:
+                # A cached miss is only trusted for miss_ttl
+                if cached['trailers'] or time.time() - cached['time'] <= self.miss_ttl:
+                    log.debug(f"{self.name}: cache hit for {title}")
+                    return cached['trailers']
+
+        if not self._take_quota():
+            log.warning(f"{self.name}: daily quota of {self.max_requests_per_day} lookups reached")
+            return None
+
+        trailers = self.lookup(ids, title)
+        if trailers is not None and self.store is not None and self.cache_ttl:
+            self.store.store_cached_response(cache_key, {'trailers': trailers, 'time': time.time()})
+        return trailers
+
+    def _take_quota(self):
+        if not self.max_requests_per_day or self.store is None:
+            return True
+        with self._lock:
+            return self.store.increment_provider_usage(self.name, self.max_requests_per_day)
+
+
+class KinoCheckProvider(TrailerProvider):
+    """KinoCheck /shows lookups by TMDB ID, then IMDB ID"""
+
+    name = 'kinocheck'
+
+    def __init__(self, request_fn, **kwargs):
+        super().__init__(**kwargs)
+        self.request_fn = request_fn
+
+    def lookup(self, ids, title):
+        trailers = []
+        failed = False
+        for key, param in (('tmdb', 'tmdb_id'), ('imdb', 'imdb_id')):
+            if key not in ids:
+                continue
+            data = self.request_fn('/shows', {param: ids[key], 'categories': 'Trailer'})
+            if data is None:
+                failed = True
+                continue
+            for video in data.get('videos', []):
+                video = dict(video)
+                video['source'] = self.name
+                trailers.append(video)
+            if trailers:
+                break
+        # A request error without any answer means "unknown", not "no trailers"
+        if not trailers and failed:
+            return None
+        return trailers
+
+
+class TMDBProvider(TrailerProvider):
+    """TMDB /tv/{id}/videos (YouTube trailers and teasers)"""
+
+    name = 'tmdb'
+    base_url = 'https://api.themoviedb.org/3'
+
+    def __init__(self, api_key, language='de', fallback_language='en', **kwargs):
+        super().__init__(**kwargs)
+        self.api_key = api_key
+        self.language = language
+        self.fallback_language = fallback_language
+
+    def _get(self, path, params):
+        params = dict(params, api_key=self.api_key)
+        response = requests.get(f"{self.base_url}{path}", params=params, timeout=10)
+        if response.status_code == 404:
+            return {}
+        response.raise_for_status()
+        return response.json()
+
+    def lookup(self, ids, title):
+        try:
+            tmdb_id = ids.get('tmdb')
+            if not tmdb_id:
+                for key, source in (('imdb', 'imdb_id'), ('tvdb', 'tvdb_id')):
+                    if key in ids:
+                        found = self._get(f"/find/{ids[key]}", {'external_source': source}).get('tv_results', [])
+                        if found:
+                            tmdb_id = found[0]['id']
+                            break
+            if not tmdb_id:
+                return []
+
+            videos = self._get(f"/tv/{tmdb_id}/videos", {
+                'language': self.language,
+                'include_video_language': f"{self.language},{self.fallback_language},null",
+            }).get('results', [])
+        except Exception as e:
+            log.error(f"TMDB lookup failed for {title}: {e}")
+            return None
+
+        trailers = []
+        for video in videos:
+            if video.get('site') != 'YouTube' or video.get('type') not in ('Trailer', 'Teaser'):
+                continue
+            trailers.append(normalize_trailer(video['key'], video.get('name'), [video['type']], self.name,
+                                              video.get('iso_639_1')))
+        # Trailers in the preferred language first, then real trailers before teasers
+        trailers.sort(key=lambda t: (t['language'] != self.language, t['categories'] != ['Trailer']))
+        return trailers
+
+
+class FileProvider(TrailerProvider):
+    """Trailers from a local JSON file, for offline testing or manual overrides.
+
+    Format: {"imdb:tt0903747": [{"youtube_video_id": "...", "title": "..."}], "tmdb:1396": [...]}
+    """
+
+    name = 'file'
+
+    def __init__(self, path, **kwargs):
+        kwargs['store'] = None  # Reading the file is cheaper than the cache
+        super().__init__(**kwargs)
+        self.path = path
+        self._entries = None
+
+    def lookup(self, ids, title):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                log.error(f"Cannot read trailer file {self.path}: {e}")
+                self._entries = {}
+
+        for key in ('imdb', 'tmdb', 'tvdb'):
+            if key in ids and f"{key}:{ids[key]}" in self._entries:
+                return [normalize_trailer(entry['youtube_video_id'], entry.get('title'), entry.get('categories'),
+                                          self.name, entry.get('language'))
+                        for entry in self._entries[f"{key}:{ids[key]}"]]
+        return []
+
+
+############################################################
+# PROVIDER FAN-OUT
+############################################################
+
+class SingleFlight:
+    """Run concurrent calls with the same key once; the other callers wait and share the result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn(*args)
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+class ProviderChain:
+    """Query all providers concurrently; the first non-empty answer wins"""
+
+    def __init__(self, providers, max_parallel=3):
+        self.providers = providers
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix='provider')
+        self._flight = SingleFlight()
+
+    def find_trailers(self, ids, title):
+        if not self.providers or not ids:
+            return []
+        key = ','.join(f"{source}={ids[source]}" for source in sorted(ids))
+        return self._flight.do(key, self._find_trailers, ids, title)
+
+    def _find_trailers(self, ids, title):
+        futures = {self._pool.submit(provider.find, ids, title): provider for provider in self.providers}
+        try:
+            for future in as_completed(futures):
+                provider = futures[future]
+                try:
+                    trailers = future.result()
+                except Exception as e:
+                    log.error(f"{provider.name}: lookup failed for {title}: {e}")
+                    continue
+                if trailers:
+                    log.debug(f"{provider.name}: {len(trailers)} trailer(s) for {title}")
+                    return trailers
+        finally:
+            # Providers still waiting for a worker are no longer needed
+            for future in futures:
+                future.cancel()
+        return []
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+import logging
+import threading
+
+log = logging.getLogger("Plex_Trailer_Checker")
+
+
+############################################################
+# VPN SESSION MANAGER
+############################################################
+
+class VPNSession:
+    """Keep a VPN tunnel up for the lifetime of a download window.
+
+    The tunnel is brought up on enter and torn down on exit. While it is open a
+    background thread probes the tunnel and reconnects when the probe fails;
+    downloads call wait_until_ready() so they are held only while reconnecting.
+    """
+
+    def __init__(self, connect, disconnect, probe, reset=None, probe_interval=30, max_reconnect_attempts=3):
+        self._connect = connect
+        self._disconnect = disconnect
+        # Teardown used before a reconnect; defaults to the regular disconnect
+        self._reset = reset or disconnect
+        self._probe = probe
+        self.probe_interval = probe_interval
+        self.max_reconnect_attempts = max_reconnect_attempts
+
+        self.connected = False
+        self.reconnects = 0
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._probe_thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def start(self):
+        """Connect the tunnel and start the health probe"""
+        print("\n🔐 Setting up VPN connection for downloads...")
+        self.connected = bool(self._connect())
+
+        if not self.connected:
+            print("⚠️ VPN connection failed - continuing without VPN")
+            print("   (Downloads may fail due to geo-blocking)")
+            # Never hold downloads forever because the tunnel could not be established
+            self._ready.set()
+            return False
+
+        self._ready.set()
+        self._probe_thread = threading.Thread(target=self._probe_loop, name='vpn-health-probe', daemon=True)
+        self._probe_thread.start()
+        log.info("VPN session started")
+        return True
+
+    def stop(self):
+        """Stop the health probe and disconnect the tunnel"""
+        self._stop.set()
+        self._wake.set()
+        if self._probe_thread:
+            # A reconnect in progress finishes its current attempt before the tunnel is
+            # torn down, so it can't bring the tunnel back up afterwards
+            self._probe_thread.join()
+            self._probe_thread = None
+
+        if self.connected:
+            print(f"\n🔓 Cleaning up VPN connection...")
+            self._disconnect()
+            self.connected = False
+        self._ready.set()
+        log.info(f"VPN session stopped ({self.reconnects} reconnect(s))")
+
+    def wait_until_ready(self, timeout=None):
+        """Block while the tunnel is reconnecting. Returns False on timeout."""
+        return self._ready.wait(timeout)
+
+    def report_failure(self):
+        """Ask the probe to check the tunnel now (e.g. after a network error)"""
+        self._wake.set()
+
+    def _probe_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.probe_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+
+            if self._probe():
+                continue
+
+            log.warning("VPN health probe failed - reconnecting")
+            print("    ⚠️ VPN tunnel dropped - holding downloads while reconnecting...")
+            with self._lock:
+                self._ready.clear()
+                self._reconnect()
+                self._ready.set()
+
+    def _reconnect(self):
+        for attempt in range(1, self.max_reconnect_attempts + 1):
+            if self._stop.is_set():
+                return False
+
+            self._reset()
+            if self._connect() and self._probe():
+                self.reconnects += 1
+                log.info(f"VPN reconnected after {attempt} attempt(s)")
+                print(f"    ✅ VPN reconnected (attempt {attempt})")
+                return True
+
+            log.warning(f"VPN reconnect attempt {attempt} failed")
+            self._stop.wait(min(5 * attempt, self.probe_interval))
+
+        log.error("Giving up on VPN reconnect - releasing downloads without VPN")
+        print("    ❌ VPN reconnect failed - continuing without VPN")
+        self.connected = False
+        self._stop.set()
+        return False